@@ -1,4 +1,7 @@
 
+// paging
+const RUNS_PAGE_SIZE = 50
+
 // init vue
 var vm = new Vue({
   el: '#app',
@@ -7,28 +10,67 @@ var vm = new Vue({
       isLoading: false,
       channel: null,
       runs: [],
+      nextCursor: null,
       evalCriteria: defaultEvalCriteria,
+      stats: null,
     }
   },
   computed: {
+    cacheHitRate() {
+      if (this.stats == null || this.stats.runs == 0) return 'N/A'
+      return `${(this.stats.cache_hits / this.stats.runs * 100).toFixed(1)}%`
+    },
   },
   methods: {
-    loadRuns() {
-      axios.get('/runs').then(response => {
-        this.runs = response.data.runs.map(run => {
+    loadRuns(more=false) {
+      let url = `/runs?limit=${RUNS_PAGE_SIZE}`
+      if (more) url += `&cursor=${this.nextCursor}`
+      axios.get(url).then(response => {
+        let runs = response.data.runs.map(run => {
           d = new Date(0)
           d.setUTCSeconds(run.created_at/1000)
           return {
             ...run,
             'date': d.toLocaleString(),
-            'type': `${run.type} / ${run.trace.parameters.chain_type} / ${run.trace.parameters.doc_chain_type}`,
+            'type': `${run.type} / ${run.chain_type} / ${run.doc_chain_type}`,
             'total_tokens': run.input_tokens + run.output_tokens,
           }
         })
+        this.runs = more ? this.runs.concat(runs) : runs
+        this.nextCursor = response.data.next_cursor
       }).catch(_ => {
         this.showError('Error while getting runs.')
       })
     },
+    loadStats() {
+      axios.get('/runs/stats').then(response => {
+        let configurations = response.data.configurations
+        this.stats = {
+          runs: configurations.reduce((acc, c) => acc + c.runs, 0),
+          cache_hits: configurations.reduce((acc, c) => acc + c.cache_hits, 0),
+        }
+      }).catch(_ => {
+        this.showError('Error while getting statistics.')
+      })
+    },
+    loadMore() {
+      this.loadRuns(true)
+    },
+    withRun(run, callback) {
+      // full traces are only fetched when needed
+      if (run.details) {
+        callback(run.details)
+        return
+      }
+      this.isLoading = true
+      axios.get(`/runs/${run.id}`).then(response => {
+        run.details = response.data
+        this.isLoading = false
+        callback(run.details)
+      }).catch(_ => {
+        this.showError('Error while getting run.')
+      })
+    },
     timeClass(time) {
       if (time > 10000) return 'is-danger'
       else if (time > 5000) return 'is-warning'
@@ -47,41 +89,44 @@ var vm = new Vue({
       else return ''
     },
     showQA(run) {
-      ObjectViewer.show(this, 'Question/Answer', {
-        'question': run.trace.question,
-        'answer': run.trace.answer
+      this.withRun(run, details => {
+        ObjectViewer.show(this, 'Question/Answer', {
+          'question': details.trace.question,
+          'answer': details.trace.answer
+        })
       })
     },
-    showCode(trace) {
-      CodeViewer.show(this, 'Chain', trace)
+    showCode(run, key='trace') {
+      this.withRun(run, details => {
+        CodeViewer.show(this, 'Chain', details[key])
+      })
     },
-    showChain(trace) {
-      let chain = trace
-      chain.chain.prompt = chain.question
-      chain.chain.response = chain.answer
-      ChainViewer.show(this, chain)
+    showChain(run, key='trace') {
+      this.withRun(run, details => {
+        let chain = details[key]
+        chain.chain.prompt = chain.question
+        chain.chain.response = chain.answer
+        ChainViewer.show(this, chain)
+      })
     },
-    showEvalCrit(trace) {
-      EvaluationViewer.show(this, trace.evaluation)
+    showEvalCrit(run) {
+      EvaluationViewer.show(this, run.evaluation_crit)
     },
-    showEvalQa(trace) {
-      CodeViewer.show(this, 'Evaluation', trace.answer, true)
+    showEvalQa(run) {
+      this.withRun(run, details => {
+        CodeViewer.show(this, 'Evaluation', details.evaluation_qa_trace.answer, true)
+      })
     },
     getEvalCrit(run) {
-      if (run.evaluation_crit_trace == null) return 'N/A'
-      let evaluation = run.evaluation_crit_trace.evaluation
+      if (run.evaluation_crit == null) return 'N/A'
+      let evaluation = run.evaluation_crit
       let keys = Object.keys(evaluation)
       if (keys.length == 0) return 'N/A'
       let total = keys.reduce((acc, key) => acc + evaluation[key], 0)
       return (total / keys.length).toFixed(1)
     },
     getEvalQA(run) {
-      if (run.evaluation_qa_trace == null) return 'N/A'
-      let eval_qa = run.evaluation_qa_trace.answer
-      if (eval_qa == null) return 'N/A'
-      if (eval_qa.indexOf('INCORRECT') >= 0) return 'INCORRECT'
-      if (eval_qa.indexOf('CORRECT') >= 0) return 'CORRECT'
-      return 'N/A'
+      return run.evaluation_qa || 'N/A'
     },
     runEvalCrit(run) {
       this.isLoading = true
@@ -113,6 +158,7 @@ var vm = new Vue({
         onConfirm: () => {
           axios.delete(`/runs/${run.id}`).then(response => {
             this.runs = this.runs.filter(r => r.id != run.id)
+            this.loadStats()
           }).catch(_ => {
             this.showError('Error while deleting run.')
           })
@@ -130,6 +176,7 @@ var vm = new Vue({
 
     // load remote data
     this.loadRuns()
+    this.loadStats()
     axios.get('/info').then(response => {
       this.channel = response.data
     }).catch(_ => {
@@ -28,6 +28,9 @@ var vm = new Vue({
     },
   },
   methods: {
+    formatTimestamp(seconds) {
+      return formatTimestamp(seconds)
+    },
     onkey(event) {
       if (event.keyCode == 38 || event.keyCode == 40) {
         this.historyIndex = Math.max(0, Math.min(this.history.length, this.historyIndex + (39 - event.keyCode)))
@@ -60,24 +63,58 @@ var vm = new Vue({
       Configuration.show(this, this.models, this.configuration)
     },
     requestOverrides() {
-      return Object.entries(this.configuration).map(([key, value]) => `${key}=${value}`).join('&')
+      return Object.entries(this.configuration).map(([key, value]) => `${key}=${encodeURIComponent(value)}`).join('&')
     },
     ask() {
       this.isLoading = true
       this.historyIndex = 0
       this.messages.push({ role: 'user', 'text': this.question })
       this.scrollDiscussion()
-      axios.get(`/ask?question=${this.question}&${this.requestOverrides()}`).then(response => {
-        this.response = response.data
-        this.messages.push({ role: 'assistant', 'text': this.response.answer, 'response': this.response })
+      let message = null
+      let step = null
+      let source = new EventSource(`/ask/stream?question=${encodeURIComponent(this.question)}&${this.requestOverrides()}`)
+      source.addEventListener('token', event => {
+        let data = JSON.parse(event.data)
+        if (message == null) {
+          this.isLoading = false
+          this.messages.push({ role: 'assistant', 'text': '', 'response': null })
+          message = this.messages[this.messages.length - 1]
+        }
+        if (data.step != step) {
+          // intermediate llm calls (map_reduce, refine...): only show the last one
+          step = data.step
+          message.text = ''
+        }
+        message.text += data.token
+        this.scrollDiscussion()
+      })
+      source.addEventListener('done', event => {
+        source.close()
+        this.response = JSON.parse(event.data)
+        if (message == null) {
+          this.messages.push({ role: 'assistant', 'text': this.response.answer, 'response': this.response })
+        } else {
+          message.text = this.response.answer
+          message.response = this.response
+        }
         this.addHistory(this.question)
         this.question = null
         this.isLoading = false
         this.scrollDiscussion()
-      }).catch(_ => {
+      })
+      source.addEventListener('failure', _ => {
+        source.close()
         this.showError('Error while asking model.')
+        if (message != null) this.messages.pop()
         this.messages.pop()
       })
+      source.onerror = _ => {
+        if (source.readyState == EventSource.CLOSED) return
+        source.close()
+        this.showError('Error while asking model.')
+        if (message != null) this.messages.pop()
+        this.messages.pop()
+      }
     },
     scrollDiscussion() {
       this.$nextTick(() => {
@@ -12,6 +12,13 @@ const formatPerformance = function(performance, which_tokens=ALL_TOKENS) {
   return `Total time: ${performance?.total_time} ms / ${label}: ${tokens} / Time to 1st token: ${performance?.time_1st_token} ms / Tokens per sec: ${performance?.tokens_per_sec}`
 }
 
+const formatTimestamp = function(seconds) {
+  let hours = Math.floor(seconds / 3600)
+  let minutes = Math.floor(seconds % 3600 / 60).toString().padStart(hours > 0 ? 2 : 1, '0')
+  let secs = Math.floor(seconds % 60).toString().padStart(2, '0')
+  return hours > 0 ? `${hours}:${minutes}:${secs}` : `${minutes}:${secs}`
+}
+
 // vue sfc loader
 const { loadModule } = window['vue2-sfc-loader']
 const options = {
@@ -10,5 +10,94 @@ CREATE TABLE IF NOT EXISTS `runs` (
   `evaluation_qa_trace` blob NULL
 );
 
-CREATE INDEX `runs_created_at` ON `runs`(`created_at`);
-CREATE INDEX `runs_type` ON `runs`(`type`);
+CREATE INDEX IF NOT EXISTS `runs_created_at` ON `runs`(`created_at`);
+CREATE INDEX IF NOT EXISTS `runs_type` ON `runs`(`type`);
+
+CREATE TABLE IF NOT EXISTS `run_metrics` (
+  `id` varchar(32) NOT NULL PRIMARY KEY,
+  `config_key` varchar(40) NOT NULL,
+  `question` text NULL,
+  `llm` varchar(32) NULL,
+  `llm_model` varchar(128) NULL,
+  `llm_temperature` real NULL,
+  `chain_type` varchar(32) NULL,
+  `doc_chain_type` varchar(32) NULL,
+  `search_type` varchar(32) NULL,
+  `retriever_type` varchar(32) NULL,
+  `score_threshold` real NULL,
+  `document_count` int(11) NULL,
+  `fetch_k` int(11) NULL,
+  `lambda_mult` real NULL,
+  `custom_prompts` int(1) NULL,
+  `return_sources` int(1) NULL,
+  `time_1st_token` real NULL,
+  `tokens_per_sec` real NULL,
+  `cost` real NOT NULL,
+  `cache_hit` int(1) NOT NULL DEFAULT 0,
+  `eval_crit_score` real NULL,
+  `eval_crit_input_tokens` int(11) NULL,
+  `eval_crit_output_tokens` int(11) NULL,
+  `eval_crit_cost` real NULL,
+  `eval_qa_verdict` varchar(16) NULL,
+  `eval_qa_input_tokens` int(11) NULL,
+  `eval_qa_output_tokens` int(11) NULL,
+  `eval_qa_cost` real NULL
+);
+
+CREATE INDEX IF NOT EXISTS `run_metrics_config_key` ON `run_metrics`(`config_key`);
+CREATE INDEX IF NOT EXISTS `run_metrics_llm` ON `run_metrics`(`llm`, `llm_model`);
+CREATE INDEX IF NOT EXISTS `run_metrics_chain` ON `run_metrics`(`chain_type`, `doc_chain_type`, `search_type`);
+
+CREATE TABLE IF NOT EXISTS `run_criteria` (
+  `id` varchar(32) NOT NULL,
+  `criteria` varchar(128) NOT NULL,
+  `rating` int(11) NOT NULL,
+  PRIMARY KEY (`id`, `criteria`)
+);
+
+CREATE INDEX IF NOT EXISTS `run_criteria_criteria` ON `run_criteria`(`criteria`);
+
+CREATE TABLE IF NOT EXISTS `config_stats` (
+  `config_key` varchar(40) NOT NULL PRIMARY KEY,
+  `llm` varchar(32) NULL,
+  `llm_model` varchar(128) NULL,
+  `llm_temperature` real NULL,
+  `chain_type` varchar(32) NULL,
+  `doc_chain_type` varchar(32) NULL,
+  `search_type` varchar(32) NULL,
+  `retriever_type` varchar(32) NULL,
+  `score_threshold` real NULL,
+  `document_count` int(11) NULL,
+  `fetch_k` int(11) NULL,
+  `lambda_mult` real NULL,
+  `custom_prompts` int(1) NULL,
+  `return_sources` int(1) NULL,
+  `runs` int(11) NOT NULL DEFAULT 0,
+  `total_time` int(11) NOT NULL DEFAULT 0,
+  `input_tokens` int(11) NOT NULL DEFAULT 0,
+  `output_tokens` int(11) NOT NULL DEFAULT 0,
+  `cost` real NOT NULL DEFAULT 0,
+  `cache_hits` int(11) NOT NULL DEFAULT 0,
+  `time_1st_token_sum` real NOT NULL DEFAULT 0,
+  `time_1st_token_count` int(11) NOT NULL DEFAULT 0,
+  `tokens_per_sec_sum` real NOT NULL DEFAULT 0,
+  `tokens_per_sec_count` int(11) NOT NULL DEFAULT 0,
+  `eval_crit_count` int(11) NOT NULL DEFAULT 0,
+  `eval_crit_sum` real NOT NULL DEFAULT 0,
+  `eval_qa_count` int(11) NOT NULL DEFAULT 0,
+  `eval_qa_correct` int(11) NOT NULL DEFAULT 0,
+  `eval_input_tokens` int(11) NOT NULL DEFAULT 0,
+  `eval_output_tokens` int(11) NOT NULL DEFAULT 0,
+  `eval_cost` real NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS `trace_dictionaries` (
+  `id` int(11) NOT NULL PRIMARY KEY,
+  `content` blob NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS `trace_segments` (
+  `hash` varchar(40) NOT NULL PRIMARY KEY,
+  `refs` int(11) NOT NULL DEFAULT 0,
+  `content` blob NOT NULL
+);
@@ -1,15 +1,25 @@
 #!/usr/bin/env python3
+import os
 import config
+import consts
 import requests
 import langchain
+import video_catalog
+import embeddings_engine
+from llm_limiter import limiter
+from component_cache import ComponentCache
+from embeddings_cache import CachedEmbeddings
 from database import Database
 from chain_base import ChainParameters
 from langchain_community.vectorstores import Chroma
+from vectorstore_numpy import NumpyVectorStore
+from lexical_index import LexicalIndex
 from langchain_core.language_models import BaseLanguageModel
-from langchain_community.embeddings import OpenAIEmbeddings, OllamaEmbeddings, HuggingFaceEmbeddings
-from sentence_transformers import SentenceTransformer, util
+from langchain_community.embeddings import OpenAIEmbeddings
+from ollama_embeddings import OllamaEmbeddingsClient
+from ollama_llm import OllamaLLMClient
+from sentence_transformers import util
 from langchain_nomic.embeddings import NomicEmbeddings
-from langchain_community.llms import Ollama
 from langchain_openai import ChatOpenAI
 
 class AgentBase:
@@ -19,8 +29,14 @@ class AgentBase:
       langchain.verbose = True
       langchain.debug = True
     self.config = config
+    self.catalog = video_catalog.configure(config)
+    limiter.configure('ollama', config.ollama_concurrency())
+    limiter.configure('openai', config.openai_concurrency())
     self.embeddings = None
     self.vectorstore = None
+    self.collection = None
+    self.lexical = None
+    self.llms = ComponentCache(consts.COMPONENT_CACHE_SIZE)
   
   def list_ollama_models(self) -> dict:
     base_url=self.config.ollama_url()
@@ -33,17 +49,29 @@ class AgentBase:
     return { 'models': [] }
 
   def calculate_embeddings(self, text) -> dict:
-    return self.encoder.encode(text)
+    return self.embeddings.embed_query(text)
 
   def calculate_similarity(self, text1, text2) -> dict:
     model = self.config.embeddings_model()
-    e1 = self.encoder.encode(text1)
-    e2 = self.encoder.encode(text2)
+    e1 = self.embeddings.embed_query(text1)
+    e2 = self.embeddings.embed_query(text2)
     if 'paraphrase' in model:
       return util.cos_sim(e1, e2)
     else:
       return util.dot_score(e1, e2)
 
+  def embeddings_stats(self) -> dict:
+    return None if self.embeddings is None else self.embeddings.stats()
+
+  def lexical_stats(self) -> dict:
+    return None if self.lexical is None else self.lexical.stats()
+
+  def llm_stats(self) -> dict:
+    return limiter.stats()
+
+  def _llm_slot(self, parameters: ChainParameters):
+    return limiter.slot(parameters.llm)
+
   def _build_database(self):
     self.database = Database(self.config)
 
@@ -52,38 +80,72 @@ class AgentBase:
       return
     model = self.config.embeddings_model()
     print(f'[agent] building embeddings for {model}')
-    if model == 'ollama':
-      self.encoder = None
-      self.embeddings = OllamaEmbeddings(
-        base_url=config.ollama_url(),
-        model=config.ollama_model()
+    if model == 'ollama' or model.startswith('ollama:'):
+      embeddings = OllamaEmbeddingsClient(
+        base_url=self.config.ollama_url(),
+        model=model.split(':', 1)[1] if ':' in model else self.config.ollama_model(),
+        batch_size=self.config.embeddings_batch_size(),
+        concurrency=self.config.embeddings_concurrency()
       )
     elif model.startswith('openai:'):
-      self.encoder = None
-      self.embeddings = OpenAIEmbeddings(
+      embeddings = OpenAIEmbeddings(
         openai_api_key=self.config.openai_api_key(),
         model=model.split(':')[1]
       )
     elif model.startswith('nomic:'):
-      self.encoder = None
-      self.embeddings = NomicEmbeddings(
+      embeddings = NomicEmbeddings(
         model=model.split(':')[1] or 'nomic-embed-text-v1'
       )
     else:
-      self.encoder = SentenceTransformer(model)
-      self.embeddings = HuggingFaceEmbeddings(model_name=model)
+      embeddings = embeddings_engine.get_engine(model)
+
+    # cache query embeddings
+    self.embeddings = CachedEmbeddings(
+      embeddings, self.config.embeddings_key(),
+      max_size=self.config.embeddings_cache_size(),
+      path=self.config.embeddings_cache_path()
+    )
 
   def _build_vectorstore(self) -> None:
     if self.vectorstore is not None:
       return
     if self.embeddings is None:
       self._build_embedder()
-    self.vectorstore=Chroma(
-      persist_directory=self.config.db_persist_directory(),
-      embedding_function=self.embeddings
-    )
+    backend = self.config.vectorstore_backend()
+    if backend == 'chroma':
+      self.vectorstore=Chroma(
+        persist_directory=self.config.db_persist_directory(),
+        embedding_function=self.embeddings
+      )
+      self.collection = self.vectorstore._collection
+    elif backend == 'numpy':
+      self.vectorstore = NumpyVectorStore(
+        self.config.vectorstore_path(),
+        self.embeddings,
+        dtype=self.config.vectorstore_dtype(),
+        hnsw_threshold=self.config.vectorstore_hnsw_threshold(),
+        hnsw_ef=self.config.vectorstore_hnsw_ef()
+      )
+      self.collection = self.vectorstore
+    else:
+      raise Exception(f'Unknown vector store backend "{backend}"')
+
+  def _build_lexical_index(self) -> None:
+    if self.lexical is not None:
+      return
+    path = self.config.vectorstore_path()
+    if not os.path.exists(path):
+      os.makedirs(path)
+    self.lexical = LexicalIndex(os.path.join(path, consts.LEXICAL_INDEX_FILENAME))
+
+  def _llm_key(self, parameters: ChainParameters) -> tuple:
+    return (parameters.llm, parameters.llm_model(), parameters.llm_temperature)
 
   def _build_llm(self, parameters: ChainParameters) -> BaseLanguageModel:
+    # clients (and their connection pools) are reused across requests
+    return self.llms.get(self._llm_key(parameters), lambda: self.__create_llm(parameters))
+
+  def __create_llm(self, parameters: ChainParameters) -> BaseLanguageModel:
     if parameters.llm == 'openai':
       print(f'[agent] building OpenAI LLM with temperature={parameters.llm_temperature}')
       return ChatOpenAI(
@@ -95,7 +157,7 @@ class AgentBase:
       )
     elif parameters.llm == 'ollama':
       print(f'[agent] building Ollama LLM with model={parameters.ollama_model}, temperature={parameters.llm_temperature}')
-      return Ollama(
+      return OllamaLLMClient(
         base_url=self.config.ollama_url(),
         model=parameters.ollama_model,
         temperature=parameters.llm_temperature,
@@ -32,10 +32,11 @@ class Evaluator(AgentBase):
 
     # build chain
     llm = self._build_llm(parameters)
-    chain = CriteriaEvalChain(llm, criteria, callback_handler, parameters)
+    chain = CriteriaEvalChain(llm, criteria, parameters)
 
     # now query
-    chain.invoke(answer)
+    with self._llm_slot(parameters):
+      chain.invoke(answer, callback_handler)
 
     # done
     res = callback_handler.to_dict()
@@ -89,10 +90,11 @@ class Evaluator(AgentBase):
 
     # build chain
     llm = self._build_llm(parameters)
-    chain = QAEvalChain(llm, callback_handler)
+    chain = QAEvalChain(llm)
 
     # now query
-    chain.invoke(question, answer, reference)
+    with self._llm_slot(parameters):
+      chain.invoke(question, answer, reference, callback_handler)
 
     # done
     res = callback_handler.to_dict()
@@ -1,4 +1,5 @@
 #!/usr/bin/env python3
+import uuid
 from agent_base import AgentBase
 from langchain_community.vectorstores import Chroma
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -9,6 +10,7 @@ class Loader(AgentBase):
     super().__init__(config)
     self._build_embedder()
     self._build_vectorstore()
+    self._build_lexical_index()
     self.splitter = RecursiveCharacterTextSplitter(
       chunk_size=config.split_chunk_size(),
       chunk_overlap=config.split_chunk_overlap()
@@ -26,10 +28,69 @@ class Loader(AgentBase):
     
     # create embeddings
     #print('[agent] creating embeddings')
-    self.vectorstore.add_texts(all_splits, metadatas=metadatas)
+    self.add_embeddings(all_splits, self.embed_texts(all_splits), metadatas)
 
     # done
+    self.persist()
+
+  def embed_texts(self, texts) -> list:
+    return self.embeddings.embed_documents(texts)
+
+  def add_embeddings(self, texts, embeddings, metadatas, ids=None) -> list:
+    if len(texts) == 0:
+      return []
+    ids = ids or [str(uuid.uuid4()) for _ in texts]
+    self.collection.upsert(
+      ids=ids,
+      embeddings=embeddings,
+      metadatas=metadatas,
+      documents=texts
+    )
+    self.lexical.add(ids, texts)
+    return ids
+
+  def delete(self, ids=None, where=None) -> None:
+    if ids is not None and len(ids) == 0:
+      return
+
+    # resolve ids so that the lexical index is updated too
+    if where is not None:
+      ids = (ids or []) + self.collection.get(where=where, include=[])['ids']
+      if len(ids) == 0:
+        return
+    self.collection.delete(ids=ids)
+    self.lexical.delete(ids)
+
+  def update_metadata(self, ids, metadata) -> None:
+
+    # video metadata changed: chunk fields (position in video) are kept
+    if len(ids) == 0:
+      return
+    current = self.collection.get(ids=ids, include=['metadatas'])
+    self.collection.update(
+      ids=current['ids'],
+      metadatas=[{ **chunk_metadata, **metadata } for chunk_metadata in current['metadatas']]
+    )
+
+  def count(self) -> int:
+    return self.collection.count()
+
+  def persist(self) -> None:
     self.vectorstore.persist()
+    self.lexical.persist()
+
+  def sync_lexical_index(self, page_size=1000) -> None:
+
+    # databases loaded before the lexical index or interrupted loads
+    count = self.collection.count()
+    if self.lexical.count() == count:
+      return
+    print(f'[loader] building lexical index of {count} chunks')
+    self.lexical.clear()
+    for offset in range(0, count, page_size):
+      page = self.collection.get(limit=page_size, offset=offset, include=['documents'])
+      self.lexical.add(page['ids'], page['documents'])
+    self.lexical.persist()
 
   def add_documents(self, documents, metadata) -> None:
 
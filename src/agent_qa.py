@@ -2,10 +2,17 @@
 import os
 import json
 import html
+import uuid
 import utils
+import consts
+import threading
 from agent_base import AgentBase
+from answer_cache import AnswerCache
+from component_cache import ComponentCache
 from callback import CallbackHandler
-from chain_base import ChainParameters
+from retriever_scored import ScoredVectorStoreRetriever
+from retriever_hybrid import HybridRetriever
+from chain_base import ChainParameters, prompts_version
 from chain_qa_base import QAChainBase
 from chain_qa_sources import QAChainBaseWithSources
 from chain_qa_conversation import QAChainConversational
@@ -20,13 +27,33 @@ class AgentQA(AgentBase):
     super().__init__(config)
     self._build_embedder()
     self._build_vectorstore()
+    self._build_lexical_index()
     self._build_database()
     self.__build_memory()
+    self.memory_lock = threading.Lock()
+    self.retrievers = ComponentCache(consts.COMPONENT_CACHE_SIZE)
+    self.chains = ComponentCache(consts.COMPONENT_CACHE_SIZE)
+    self.answers = AnswerCache(
+      max_size=self.config.answer_cache_size(),
+      ttl=self.config.answer_cache_ttl(),
+      threshold=self.config.answer_cache_threshold()
+    )
   
   def reset(self):
-    self.memory.clear()
+    with self.memory_lock:
+      self.memory.clear()
+
+  def answer_cache_stats(self) -> dict:
+    return self.answers.stats()
 
-  def query(self, question: str, overrides: dict) -> dict:
+  def component_stats(self) -> dict:
+    return {
+      'llms': self.llms.stats(),
+      'retrievers': self.retrievers.stats(),
+      'chains': self.chains.stats(),
+    }
+
+  def query(self, question: str, overrides: dict, listener=None) -> dict:
 
     # check embeddings consistency
     self.__check_embeddings()
@@ -37,52 +64,110 @@ class AgentQA(AgentBase):
     # parse params
     parameters = ChainParameters(self.config, overrides)
 
-    # we need an llm
-    llm = self._build_llm(parameters)
-
-    # we need a retriever
-    retriever = self.__build_retriever(llm, parameters)
-    
-    # debug with similarity_search_with_score
-    docs = self.vectorstore.similarity_search_with_score(question, k=parameters.document_count)
-    utils.dumpj([ {
-      'content': d[0].page_content,
-      'source': d[0].metadata['source'],
-      'score': d[1]
-    } for d in docs], 'relevant_documents.json')
-
-    # # debug with get_relevant_documents
-    # docs = retriever.get_relevant_documents(question)
-    # print(f'[agent] found {len(docs)} relevant documents')
-    # utils.dumpj([ {
-    #   'content': d.page_content,
-    #   'source': d.metadata['source']
-    # } for d in docs], 'relevant_documents.json')
+    # same question (or close enough) already answered with these parameters
+    # conversations depend on memory so they are never cached. the loader
+    # persists the lexical index on every ingest whatever the vector store
+    cacheable = self.answers.enabled() and 'conversation' not in parameters.chain_type
+    if cacheable:
+      start = utils.now()
+      version = self.lexical.published_version()
+      embedding = self.embeddings.embed_query(question)
+      cache_key = self.__answer_cache_key(parameters)
+      cached, similarity = self.answers.get(cache_key, embedding, version)
+      if cached is not None:
+        return self.__reuse_answer(question, parameters, cached, similarity, start)
 
     # callback handler
     callback_handler = CallbackHandler(question, parameters)
+    callback_handler.listener = listener
 
-    # build chain
-    chain = self.__build_qa_chain(llm, retriever, callback_handler, parameters)
+    # get chain
+    chain = self.__get_qa_chain(parameters)
 
     # now query
     print(f'[agent] retrieving and prompting using {"custom" if parameters.custom_prompts else "default"} prompts')
-    res = chain.invoke(question)
+    with self._llm_slot(parameters):
+      if 'conversation' in parameters.chain_type:
+        # memory is shared across requests
+        with self.memory_lock:
+          res = chain.invoke(question, callback_handler)
+      else:
+        res = chain.invoke(question, callback_handler)
+
+    # documents (and scores) captured during retrieval
+    docs = callback_handler.get_documents()
+    if self.config.dump_documents():
+      utils.dumpj([ {
+        'content': d.page_content,
+        'source': d.metadata['source'],
+        'score': d.metadata.get('score')
+      } for d in docs], 'relevant_documents.json')
 
     # extract sources
     sources = self.__build_sources(res, docs)
     callback_handler.set_sources(sources)
+    result = callback_handler.to_dict()
+    result['cache_hit'] = False
 
     # save
+    self.__save_run(result)
+    if cacheable:
+      self.answers.put(cache_key, embedding, result, version)
+
+    # done
+    return result
+
+  def __answer_cache_key(self, parameters: ChainParameters) -> dict:
+    # answers built with custom prompts are outdated when a file changes
+    key = parameters.to_dict()
+    if parameters.custom_prompts:
+      key['prompts'] = prompts_version()
+    return key
+
+  def __reuse_answer(self, question: str, parameters: ChainParameters, cached: dict, similarity: float, start: int) -> dict:
+
+    # new run pointing to the one that built the answer
+    print(f'[agent] reusing answer to "{cached["question"][0:64]}" (similarity={similarity:.4f})')
+    now = utils.now()
+    result = {
+      **cached,
+      'question': question,
+      'chain': {
+        'id': uuid.uuid4().hex,
+        'type': 'cache',
+        'repr': f'AnswerCache(threshold={self.answers.threshold})',
+        'created_at': start,
+        'started_at': start,
+        'ended_at': now,
+        'elapsed': now - start,
+        'steps': [],
+        'cached_run': cached['chain']['id'],
+        'cached_question': cached['question'],
+        'similarity': round(similarity, 4),
+      },
+      'parameters': parameters.to_dict(),
+      'performance': {
+        'total_time': now - start,
+        'input_tokens': 0,
+        'output_tokens': 0,
+        'time_1st_token': None,
+        'tokens_per_sec': None,
+        'cost': 0,
+      },
+      'cache_hit': True,
+    }
+
+    # save
+    self.__save_run(result)
+    return result
+
+  def __save_run(self, result: dict) -> None:
     try:
-      self.database.add_run(callback_handler.to_dict(), 'qa')
+      self.database.add_run(result, 'qa')
     except Exception as e:
       print(f'[agent] failed to save run: {e}')
       pass
 
-    # done
-    return callback_handler.to_dict()
-
   def __build_memory(self):
     memory_type = self.config.memory_type()
     if memory_type == 'buffer':
@@ -95,13 +180,42 @@ class AgentQA(AgentBase):
     else:
       raise Exception(f'Unknown memory type "{memory_type}"')
 
-  def __build_retriever(self, llm, parameters: ChainParameters):
+  def __get_qa_chain(self, parameters: ChainParameters):
+
+    # components are built once for each subset of parameters they depend on
+    filter = self.__build_filter(parameters)
+    llm_key = self._llm_key(parameters)
+    retriever_key = (
+      llm_key if parameters.retriever_type in ['multi_query', 'compressor'] else None,
+      parameters.retriever_type, parameters.search_type, parameters.document_count,
+      parameters.score_threshold, parameters.fetch_k, parameters.lambda_mult,
+      json.dumps(filter, sort_keys=True)
+    )
+    chain_key = (
+      llm_key, retriever_key, parameters.chain_type, parameters.doc_chain_type,
+      parameters.return_sources, prompts_version() if parameters.custom_prompts else None
+    )
+
+    # build what is missing
+    def build_chain():
+      llm = self._build_llm(parameters)
+      retriever = self.retrievers.get(retriever_key, lambda: self.__build_retriever(llm, parameters, filter))
+      return self.__build_qa_chain(llm, retriever, parameters)
+    return self.chains.get(chain_key, build_chain)
+
+  def __build_retriever(self, llm, parameters: ChainParameters, filter: dict):
     
     # base retriever
     search_kwargs={ 'k': parameters.document_count }
     if parameters.search_type == 'similarity_score_threshold':
       search_kwargs['score_threshold'] = parameters.score_threshold
-    base_retriever=self.vectorstore.as_retriever(
+    elif parameters.search_type == 'mmr':
+      search_kwargs['fetch_k'] = max(parameters.fetch_k, parameters.document_count)
+      search_kwargs['lambda_mult'] = parameters.lambda_mult
+    if filter is not None:
+      search_kwargs['filter'] = filter
+    base_retriever=ScoredVectorStoreRetriever(
+      vectorstore=self.vectorstore,
       search_type=parameters.search_type,
       search_kwargs=search_kwargs
     )
@@ -116,6 +230,17 @@ class AgentQA(AgentBase):
         retriever=base_retriever,
         llm=llm
       )
+    elif parameters.retriever_type == 'hybrid':
+      print(f'[agent] building hybrid retriever')
+      return HybridRetriever(
+        vectorstore=self.vectorstore,
+        collection=self.collection,
+        lexical=self.lexical,
+        k=parameters.document_count,
+        fetch_k=max(parameters.fetch_k, parameters.document_count),
+        rrf_k=self.config.rrf_k(),
+        filter=filter
+      )
     elif parameters.retriever_type == 'compressor':
       print(f'[agent] building compressor retriever')
       compressor=LLMChainExtractor.from_llm(llm)
@@ -126,13 +251,37 @@ class AgentQA(AgentBase):
     else:
       raise Exception(f'Unknown retriever type "{self.config.retriever_type()}"')
 
-  def __build_qa_chain(self, llm, retriever, callback, parameters: ChainParameters):
+  def __build_filter(self, parameters: ChainParameters):
+
+    # evaluated by the vector store (chroma where clause)
+    conditions = []
+    if parameters.video:
+      conditions.append({ 'source': { '$in': [video.strip() for video in parameters.video.split(',')] } })
+    if parameters.title:
+      video_ids = self.catalog.find(parameters.title)
+      if len(video_ids) == 0:
+        raise Exception(f'No video title contains "{parameters.title}"')
+      conditions.append({ 'source': { '$in': video_ids } })
+    if parameters.date_from:
+      conditions.append({ 'published': { '$gte': utils.parse_date(parameters.date_from) } })
+    if parameters.date_to:
+      conditions.append({ 'published': { '$lte': utils.parse_date(parameters.date_to, end=True) } })
+
+    # chroma needs at least 2 clauses in $and
+    if len(conditions) == 0:
+      return None
+    elif len(conditions) == 1:
+      return conditions[0]
+    else:
+      return { '$and': conditions }
+
+  def __build_qa_chain(self, llm, retriever, parameters: ChainParameters):
     if parameters.chain_type == 'base':
-      return QAChainBase(llm, retriever, callback, parameters)
+      return QAChainBase(llm, retriever, parameters)
     elif 'source' in parameters.chain_type:
-      return QAChainBaseWithSources(llm, retriever, callback, parameters)
+      return QAChainBaseWithSources(llm, retriever, parameters)
     elif 'conversation' in parameters.chain_type:
-      return QAChainConversational(llm, retriever, self.memory, callback, parameters)
+      return QAChainConversational(llm, retriever, self.memory, parameters)
     else:
       raise Exception(f'Chain type "{parameters.chain_type}" not in base, base_with_sources, conversation')
 
@@ -154,39 +303,49 @@ class AgentQA(AgentBase):
       for source in result['source_documents']:
         video_ids.append(source.metadata['source'])
 
-    # now build our sources
-    sources = {}
-    relevance_score_fn = self.vectorstore._select_relevance_score_fn()
-    for video_id in video_ids:
+    # now build our sources: one per chunk when we know where it is in the video
+    sources = []
+    for video_id in dict.fromkeys(video_ids):
 
       # get video info
-      if video_id not in sources.keys():
-        video_info = utils.get_video_info(video_id)
-        if video_info is not None:
-          sources[video_id] = {
-            'id': video_id,
-            'url': utils.get_video_url(video_id),
-            'title': html.unescape(video_info['snippet']['title'])
-          }
-
-      # now get score
-      if video_id in sources.keys() and docs is not None:
-        for doc in docs:
-          if doc[0].metadata['source'] == video_id:
-            score = relevance_score_fn(doc[1])
-            if 'score' in sources[video_id].keys():
-              sources[video_id]['score'] = min(sources[video_id]['score'], score)
-            else:
-              sources[video_id]['score'] = score
-            break
-
-    return list(sources.values())
+      video_info = utils.get_video_info(video_id)
+      if video_info is None:
+        continue
+      title = html.unescape(video_info['snippet']['title'])
+
+      # chunks of this video (best score per chunk)
+      chunks = {}
+      for doc in docs or []:
+        if doc.metadata['source'] != video_id:
+          continue
+        key = (doc.metadata.get('start'), doc.metadata.get('end'))
+        score = doc.metadata.get('score')
+        if key not in chunks or (score is not None and (chunks[key] is None or score > chunks[key])):
+          chunks[key] = score
+
+      # video without chunk information
+      if len(chunks) == 0 or all(start is None for start, _ in chunks.keys()):
+        source = { 'id': video_id, 'url': utils.get_video_url(video_id), 'title': title }
+        scores = [score for score in chunks.values() if score is not None]
+        if len(scores) > 0:
+          source['score'] = max(scores)
+        sources.append(source)
+        continue
+
+      # deep links in video order
+      for (start, end), score in sorted(chunks.items(), key=lambda item: item[0][0] or 0):
+        source = { 'id': video_id, 'url': utils.get_video_url(video_id, start), 'title': title, 'start': start, 'end': end }
+        if score is not None:
+          source['score'] = score
+        sources.append(source)
+
+    return sources
 
   def __check_embeddings(self):
     if os.path.exists('db_config.json'):
       with open('db_config.json', 'r') as f:
         db_config = json.load(f)
         db_embeddings = db_config['embeddings_model']
-        cfg_embeddings = self.config.embeddings_model()
+        cfg_embeddings = self.config.embeddings_key()
         if db_embeddings != cfg_embeddings:
           raise Exception(f'Embeddings model mismatch: {db_embeddings} != {cfg_embeddings}')
@@ -0,0 +1,114 @@
+
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+
+class AnswerCache:
+
+  def __init__(self, max_size: int = 256, ttl: int = 86400, threshold: float = 0.95):
+    self.max_size = max_size
+    self.ttl = ttl
+    self.threshold = threshold
+    self.lock = threading.Lock()
+    self.entries = OrderedDict()
+    self.groups = {}
+    self.version = None
+    self.next_id = 0
+    self.hits = 0
+    self.misses = 0
+    self.invalidations = 0
+
+  def enabled(self) -> bool:
+    return self.max_size > 0
+
+  def get(self, parameters: dict, embedding: list, version) -> tuple:
+
+    # answers only stand for the documents they were built from
+    key = self.__key(parameters)
+    vector = self.__normalize(embedding)
+    with self.lock:
+      self.__check_version(version)
+
+      # expired entries of this configuration
+      now = time.time()
+      ids = [id for id in self.groups.get(key, []) if self.entries[id][3] <= now]
+      for id in ids:
+        self.__remove(id)
+
+      # most similar question
+      ids = list(self.groups.get(key, []))
+      if len(ids) > 0:
+        similarities = np.stack([self.entries[id][1] for id in ids]) @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.threshold:
+          self.entries.move_to_end(ids[best])
+          self.hits += 1
+          return self.entries[ids[best]][2], float(similarities[best])
+
+      # not found
+      self.misses += 1
+      return None, None
+
+  def put(self, parameters: dict, embedding: list, result: dict, version) -> None:
+
+    # index changed while answering
+    with self.lock:
+      if version != self.version:
+        return
+
+      # add
+      key = self.__key(parameters)
+      id = self.next_id
+      self.next_id += 1
+      self.entries[id] = (key, self.__normalize(embedding), result, time.time() + self.ttl)
+      self.groups.setdefault(key, set()).add(id)
+
+      # least recently used
+      while len(self.entries) > self.max_size:
+        self.__remove(next(iter(self.entries)))
+
+  def clear(self) -> None:
+    with self.lock:
+      self.entries.clear()
+      self.groups.clear()
+
+  def stats(self) -> dict:
+    with self.lock:
+      lookups = self.hits + self.misses
+      return {
+        'size': len(self.entries),
+        'max_size': self.max_size,
+        'ttl': self.ttl,
+        'threshold': self.threshold,
+        'hits': self.hits,
+        'misses': self.misses,
+        'hit_rate': None if lookups == 0 else round(self.hits / lookups, 4),
+        'invalidations': self.invalidations,
+      }
+
+  def __check_version(self, version) -> None:
+    if version != self.version:
+      if len(self.entries) > 0:
+        print(f'[cache] index changed: dropping {len(self.entries)} answers')
+        self.invalidations += 1
+      self.entries.clear()
+      self.groups.clear()
+      self.version = version
+
+  def __remove(self, id) -> None:
+    key = self.entries.pop(id)[0]
+    group = self.groups[key]
+    group.discard(id)
+    if len(group) == 0:
+      del self.groups[key]
+
+  def __key(self, parameters: dict) -> str:
+    return hashlib.sha1(json.dumps(parameters, sort_keys=True).encode()).hexdigest()
+
+  def __normalize(self, embedding: list) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector if norm == 0 else vector / norm
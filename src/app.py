@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import json
+import queue
+import threading
 import utils
 import consts
+import server
 from database import Database
 from agent_qa import AgentQA
 from agent_eval import Evaluator
 from config import Config
-from bottle import Bottle, request, static_file
+from bottle import Bottle, request, response, static_file
 from chain_base import ChainParameters
 
 # to avoid tokenizers parallelism issues
@@ -68,6 +72,10 @@ def embed():
   similarity = agent.calculate_similarity(text1, text2)
   return { 'text1': text1, 'text2': text2, 'similarity': float(similarity[0]) }
 
+@app.route('/stats')
+def stats():
+  return { 'embeddings': agent.embeddings_stats(), 'lexical': agent.lexical_stats(), 'answers': agent.answer_cache_stats(), 'components': agent.component_stats(), 'llm': agent.llm_stats() }
+
 @app.route('/reset')
 def reset():
   agent.reset()
@@ -93,6 +101,38 @@ def ask():
   # done
   return result
 
+@app.route('/ask/stream')
+def ask_stream():
+
+  # get data
+  question = request.query.question
+  overrides = {k:v[0] for k,v in request.query.dict.items()}
+
+  # tokens are pushed by the callback handler
+  events = queue.Queue()
+  def on_token(token, run_id):
+    events.put(('token', { 'token': token, 'step': run_id.hex }))
+
+  # run the chain in the background
+  def run():
+    try:
+      events.put(('done', agent.query(question, overrides, on_token)))
+    except Exception as e:
+      print(f'[app] error while streaming answer: {e}')
+      events.put(('failure', { 'error': str(e) }))
+  threading.Thread(target=run, daemon=True).start()
+
+  # server-sent events
+  response.content_type = 'text/event-stream'
+  response.set_header('Cache-Control', 'no-cache')
+  def stream():
+    while True:
+      event, data = events.get()
+      yield f'event: {event}\ndata: {json.dumps(data)}\n\n'
+      if event != 'token':
+        break
+  return stream()
+
 @app.route('/evaluate/<method>')
 def eval(method):
 
@@ -117,7 +157,41 @@ def eval(method):
 
 @app.route('/runs')
 def get_runs():
-  return { 'runs': database.get_runs() }
+
+  # cursors are "created_at:id" as returned by a previous page
+  cursor = request.query.cursor or None
+  if cursor is not None and re.fullmatch(r'-?\d+:.+', cursor) is None:
+    response.status = 400
+    return { 'error': f'invalid cursor "{cursor}"' }
+  for name in ['limit', 'date_from', 'date_to']:
+    if request.query.get(name) and re.fullmatch(r'-?\d+', request.query.get(name)) is None:
+      response.status = 400
+      return { 'error': f'invalid {name} "{request.query.get(name)}"' }
+
+  # now query
+  limit = max(1, min(int(request.query.limit or consts.DEFAULT_RUNS_PAGE_SIZE), consts.MAX_RUNS_PAGE_SIZE))
+  fields = request.query.fields.split(',') if request.query.fields else None
+  runs, next_cursor = database.get_runs(
+    limit=limit,
+    cursor=cursor,
+    type=request.query.type or None,
+    date_from=request.query.date_from or None,
+    date_to=request.query.date_to or None,
+    fields=fields
+  )
+  return { 'runs': runs, 'next_cursor': next_cursor }
+
+@app.route('/runs/stats')
+def get_runs_stats():
+  return { 'configurations': database.get_config_stats(), 'traces': database.get_trace_stats() }
+
+@app.route('/runs/<id>')
+def get_run(id):
+  run = database.get_run(id)
+  if run is None:
+    response.status = 404
+    return { 'error': f'run {id} not found' }
+  return run
 
 @app.delete('/runs/<id>')
 def delete_run(id):
@@ -133,4 +207,4 @@ def server_index():
   return static_file('index.html', root='./public')
 
 # run server
-app.run(host='0.0.0.0', port=5555, debug=True)
+server.run(app, app.config.get('config'))
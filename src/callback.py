@@ -3,11 +3,22 @@ import re
 import json
 import utils
 import tiktoken
+import functools
 from uuid import UUID
 from langchain.callbacks.base import BaseCallbackHandler
 
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str):
+  try:
+    return tiktoken.encoding_for_model(model)
+  except KeyError:
+    # non-openai models (ollama): best approximation
+    return tiktoken.get_encoding('cl100k_base')
+
 class ChainStep:
 
+  __slots__ = ('id', 'type', 'repr', 'args', 'created_at', 'started_at', 'ended_at', 'elapsed', 'steps', 'tokens')
+
   def __init__(self, id: UUID, type: str, serialized: dict, auto_start:bool=True, **kwargs):
     self.id = id
     self.type = type
@@ -18,6 +29,7 @@ class ChainStep:
     self.ended_at = None
     self.elapsed = None
     self.steps = []
+    self.tokens = None
 
   def start(self):
     self.started_at = utils.now()
@@ -25,6 +37,14 @@ class ChainStep:
   def end(self):
     self.ended_at = utils.now()
     self.elapsed = self.ended_at - self.created_at
+    if self.tokens is not None:
+      self.args['response'] = ''.join(self.tokens)
+
+  def add_token(self, token: str):
+    if self.tokens is None:
+      self.start()
+      self.tokens = []
+    self.tokens.append(token)
 
   def add_step(self, step):
     self.steps.append(step)
@@ -92,22 +112,29 @@ class CallbackHandler(BaseCallbackHandler):
     self.reset()
     self.question = question
     self.parameters = parameters
+    self.listener = None
 
   def reset(self):
     self.root = None
+    self.steps = {}
+    self.parents = {}
     self.outputs = None
     self.sources = None
     self.templates = None
+    self.documents = []
   
   def set_sources(self, sources: list) -> None:
     self.sources = sources
 
+  def get_documents(self) -> list:
+    return self.documents
+
   def on_chain_start(self, serialized: dict, inputs: dict, run_id: UUID, parent_run_id: UUID, **kwargs) -> None:
     if parent_run_id is None:
       self.root = ChainStep(run_id, 'chain', serialized)
+      self.steps[run_id] = self.root
     else:
-      parent = self.__get_step(parent_run_id)
-      parent.add_step(ChainStep(run_id, 'chain', serialized))
+      self.__add_step(parent_run_id, ChainStep(run_id, 'chain', serialized))
 
   def on_chain_end(self, outputs: dict, run_id: UUID, parent_run_id: UUID, **kwargs) -> None:
     if run_id == self.root.id:
@@ -124,10 +151,9 @@ class CallbackHandler(BaseCallbackHandler):
     prompt=prompts[0]
     digest=prompt.split('\n')[0][0:64].strip()
     print(f'[chain] llm starting ("{digest}...")')
-    parent = self.__get_step(parent_run_id)
-    parent.add_step(ChainStep(
+    self.__add_step(parent_run_id, ChainStep(
       run_id, 'llm', serialized, auto_start=False,
-      prompt=prompt, input_tokens=self.__count_tokens(prompt),
+      prompt=prompt, input_tokens=None,
       response=None, output_tokens=0,
       time_1st_token=None, tokens_per_sec=None
     ))
@@ -137,11 +163,10 @@ class CallbackHandler(BaseCallbackHandler):
     if run is None:
       print(f'[chain] on_llm_new_token called for unknown run id {run_id}')
       return
-    if run['response'] is None:
-      run.start()
-      run['response'] = ''
-    run['response'] += token
+    run.add_token(token)
     run['output_tokens'] += 1
+    if self.listener is not None:
+      self.listener(token, run_id)
 
   def on_llm_end(self, response: dict, run_id: UUID, **kwargs) -> None:
     run = self.__get_step(run_id)
@@ -156,13 +181,13 @@ class CallbackHandler(BaseCallbackHandler):
         run['output_tokens'] = responses[0].llm_output['token_usage']['completion_tokens']
       except:
         pass
+    self.__set_usage(run, response)
     run['time_1st_token'] = self.__time_1st_token(run)
     run['tokens_per_sec'] = self.__tokens_per_sec(run)
   
   def on_retriever_start(self, serialized: dict, query: str, run_id: UUID, parent_run_id: UUID, **kwargs) -> None:
     print(f'[chain] retriever starting ("{query[0:64]}...")')
-    parent = self.__get_step(parent_run_id)
-    parent.add_step(ChainStep(
+    self.__add_step(parent_run_id, ChainStep(
       run_id, 'retriever', serialized,
       query=query, documents=None
     ))
@@ -176,10 +201,14 @@ class CallbackHandler(BaseCallbackHandler):
     run.end()
     run['documents'] = [doc.metadata for doc in documents]
 
+    # retrievers wrapped by another one (compression, multi query...)
+    # return documents that the outer retriever already returns
+    if not self.__has_retriever_ancestor(run_id):
+      self.documents.extend(documents)
+
   def on_tool_start(self, serialized: dict, input: str, run_id: UUID, parent_run_id: UUID, **kwargs) -> None:
     print(f'[chain] tool starting ("{input_str[0:64]}...")')
-    parent = self.__get_step(parent_run_id)
-    parent.add_step(ChainStep(
+    self.__add_step(parent_run_id, ChainStep(
       run_id, 'tool', serialized,
       input=input, output=None
     ))
@@ -193,6 +222,7 @@ class CallbackHandler(BaseCallbackHandler):
     run['output'] = output
 
   def to_dict(self) -> dict:
+    self.__count_input_tokens()
     res={
       'question': self.question,
       'answer': self.__final_answer(),
@@ -228,7 +258,7 @@ class CallbackHandler(BaseCallbackHandler):
     return None if run.started_at is None else int(run.started_at - run.created_at)
 
   def __tokens_per_sec(self, run)  -> float:
-    return None if run.started_at is None else round(run['output_tokens'] / (run.ended_at - run.started_at) * 1000, 2)
+    return None if run.started_at is None or run.ended_at == run.started_at else round(run['output_tokens'] / (run.ended_at - run.started_at) * 1000, 2)
 
   def __get_sum_across_llm_runs(self, key: str) -> any:
     return sum(value for value in self.__get_not_none_across_llm_runs(key))
@@ -240,29 +270,57 @@ class CallbackHandler(BaseCallbackHandler):
   def __get_not_none_across_llm_runs(self, key: str) -> list:
     return [run[key] for run in self.__get_llm_runs() if run[key] is not None]
 
-  def __get_step(self, id: UUID, runs=None) -> dict:
-    if id is None or self.root.id == id:
+  def __get_step(self, id: UUID) -> ChainStep:
+    if id is None:
       return self.root
-    if runs is None:
-      runs = self.root.steps
-    for run in runs:
-      if run.id == id:
-        return run
-      sub_run = self.__get_step(id=id, runs=run.steps)
-      if sub_run is not None:
-        return sub_run
-    return None
+    return self.steps.get(id)
+
+  def __add_step(self, parent_id: UUID, step: ChainStep) -> None:
+    parent = self.__get_step(parent_id)
+    parent.add_step(step)
+    self.steps[step.id] = step
+    self.parents[step.id] = parent_id
+
+  def __has_retriever_ancestor(self, id: UUID) -> bool:
+    parent_id = self.parents.get(id)
+    while parent_id is not None:
+      parent = self.steps.get(parent_id)
+      if parent is not None and parent.type == 'retriever':
+        return True
+      parent_id = self.parents.get(parent_id)
+    return False
+
+  def __get_llm_runs(self) -> list:
+    return [run for run in self.steps.values() if run.type == 'llm']
+
+  def __set_usage(self, run, response) -> None:
+
+    # openai
+    try:
+      usage = response.llm_output['token_usage']
+      if 'prompt_tokens' in usage:
+        run['input_tokens'] = usage['prompt_tokens']
+      if 'completion_tokens' in usage:
+        run['output_tokens'] = usage['completion_tokens']
+    except:
+      pass
+
+    # ollama
+    try:
+      info = response.generations[0][0].generation_info
+      if 'prompt_eval_count' in info:
+        run['input_tokens'] = info['prompt_eval_count']
+      if 'eval_count' in info:
+        run['output_tokens'] = info['eval_count']
+    except:
+      pass
 
-  def __get_llm_runs(self, runs=None) -> list:
-    llm_runs = []
-    if runs is None:
-      runs = self.root.steps
-    for run in runs:
-      if run.type == 'llm':
-        llm_runs.append(run)
-      llm_runs.extend(self.__get_llm_runs(run.steps))
-    return llm_runs
+  def __count_input_tokens(self) -> None:
+    # deferred so that it is not on the critical path of the llm call
+    for run in self.__get_llm_runs():
+      if run['input_tokens'] is None and run['prompt'] is not None:
+        run['input_tokens'] = self.__count_tokens(run['prompt'])
 
   def __count_tokens(self, text: str) -> int:
-    enc = tiktoken.encoding_for_model('gpt-4')
-    return len(enc.encode(text))
\ No newline at end of file
+    enc = get_encoding(self.parameters.llm_model())
+    return len(enc.encode(text, disallowed_special=()))
\ No newline at end of file
@@ -0,0 +1,192 @@
+
+import os
+import html
+import json
+import time
+import random
+import threading
+import utils
+from concurrent.futures import ThreadPoolExecutor
+
+# journal statuses
+STATUS_DONE = 'done'
+STATUS_MISSING = 'missing'
+STATUS_FAILED = 'failed'
+
+class RateLimiter:
+
+  def __init__(self, rate):
+    # rate is in requests per second: 0 means unlimited
+    self.interval = 0 if not rate else 1.0 / rate
+    self.next = 0
+    self.lock = threading.Lock()
+
+  def wait(self):
+    if self.interval == 0:
+      return
+    with self.lock:
+      now = time.monotonic()
+      delay = self.next - now
+      self.next = max(now, self.next) + self.interval
+    if delay > 0:
+      time.sleep(delay)
+
+class DownloadJournal:
+
+  def __init__(self, path):
+    self.path = path
+    self.entries = {}
+    self.lock = threading.Lock()
+    self.truncated = False
+    self.__load()
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+      os.makedirs(folder)
+    self.file = open(path, 'a')
+
+    # do not append to a truncated last line
+    if self.truncated:
+      self.file.write('\n')
+
+  def get(self, video_id):
+    return self.entries.get(video_id)
+
+  def status(self, video_id):
+    entry = self.entries.get(video_id)
+    return None if entry is None else entry['status']
+
+  def set(self, video_id, status, attempts=0, error=None):
+    entry = {
+      'video_id': video_id,
+      'status': status,
+      'attempts': attempts,
+      'error': error,
+      'updated_at': utils.now(),
+    }
+    with self.lock:
+      self.entries[video_id] = entry
+      self.file.write(json.dumps(entry) + '\n')
+      self.file.flush()
+
+  def close(self):
+    self.file.close()
+
+  def __load(self):
+    if not os.path.exists(self.path):
+      return
+    with open(self.path) as f:
+      for line in f:
+        # last line may be truncated if we were killed while writing
+        self.truncated = not line.endswith('\n')
+        try:
+          entry = json.loads(line)
+          self.entries[entry['video_id']] = entry
+        except Exception:
+          pass
+
+class CaptionQueue:
+
+  def __init__(self, downloader, folder, journal, workers=1, rate=0, retries=0, backoff=1.0):
+    self.downloader = downloader
+    self.folder = folder
+    self.journal = journal
+    self.workers = max(1, workers)
+    self.limiter = RateLimiter(rate)
+    self.retries = retries
+    self.backoff = backoff
+    self.counts = { STATUS_DONE: 0, STATUS_MISSING: 0, STATUS_FAILED: 0, 'skipped': 0 }
+    self.counts_lock = threading.Lock()
+
+  def run(self, videos, lang=None, retry_missing=False):
+
+    # init
+    if not os.path.exists(self.folder):
+      os.mkdir(self.folder)
+    start = time.perf_counter()
+    print(f'[youtube] processing {len(videos)} videos with {self.workers} workers')
+
+    # videos without captions are not retried unless asked to
+    jobs = []
+    for video in videos:
+      id = video['id']['videoId']
+      if not retry_missing and self.journal.status(id) == STATUS_MISSING:
+        self.__count('skipped')
+        continue
+      jobs.append(video)
+
+    # now process
+    if self.workers == 1:
+      for video in jobs:
+        self.__process(video, lang)
+    else:
+      with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='captions') as executor:
+        for _ in executor.map(lambda video: self.__process(video, lang), jobs):
+          pass
+
+    # report
+    elapsed = time.perf_counter() - start
+    print(f'[youtube] done in {elapsed:.2f}s: {", ".join(f"{count} {status}" for status, count in self.counts.items())}')
+    return self.counts
+
+  def __process(self, video, lang):
+
+    # info
+    id = video['id']['videoId']
+    title = html.unescape(video['snippet']['title'])
+    original_path = f'{self.folder}/{id}.original.vtt'
+    cleaned_path = f'{self.folder}/{id}.cleaned.vtt'
+    cues_path = f'{self.folder}/{id}.cues.json'
+
+    # do not download if already downloaded
+    attempts = 0
+    if os.path.exists(original_path):
+      with open(original_path, 'r') as f:
+        original = f.read()
+    else:
+      print(f'[youtube] downloading captions for {id}: {title}...')
+      original, attempts, error = self.__download(id, lang)
+      if error is not None:
+        print(f'[youtube] failed to download captions for {id} after {attempts} attempts: {error}')
+        self.journal.set(id, STATUS_FAILED, attempts, str(error))
+        self.__count(STATUS_FAILED)
+        return
+      if original is None:
+        print(f'[youtube] no captions for {id}: {title}')
+        self.journal.set(id, STATUS_MISSING, attempts)
+        self.__count(STATUS_MISSING)
+        return
+
+      # write atomically so that an interrupted run never leaves a partial file
+      with open(f'{original_path}.tmp', 'w') as f:
+        f.write(original)
+      os.replace(f'{original_path}.tmp', original_path)
+
+    # prepare captions
+    print(f'[youtube] preparing captions for {id}: {title}...')
+    prepared, cues = self.downloader.prepare_transcript(video, original)
+    with open(cleaned_path, 'w') as f:
+      f.write(prepared)
+    with open(cues_path, 'w') as f:
+      json.dump(cues, f, separators=(',', ':'))
+
+    # done
+    self.journal.set(id, STATUS_DONE, attempts)
+    self.__count(STATUS_DONE)
+
+  def __download(self, id, lang):
+    attempts = 0
+    while True:
+      attempts += 1
+      self.limiter.wait()
+      try:
+        return self.downloader.download_captions(id, lang), attempts, None
+      except Exception as e:
+        if attempts > self.retries:
+          return None, attempts, e
+        delay = self.backoff * (2 ** (attempts - 1)) * (1 + random.random() / 2)
+        print(f'[youtube] error downloading captions for {id} (attempt {attempts}): {e}. retrying in {delay:.1f}s')
+        time.sleep(delay)
+
+  def __count(self, status):
+    with self.counts_lock:
+      self.counts[status] += 1
@@ -1,8 +1,32 @@
 
+import os
 import utils
+import threading
 from langchain.prompts import PromptTemplate
 from langchain_core.runnables import RunnableConfig
 
+# custom prompts
+PROMPT_FILES = ['prompts/base.txt', 'prompts/combine.txt', 'prompts/sourced.txt']
+
+# parsed prompt templates: read again when the file changes
+templates = {}
+templates_lock = threading.Lock()
+
+def load_prompt(path: str, input_variables: list) -> PromptTemplate:
+  mtime = os.path.getmtime(path)
+  with templates_lock:
+    if path in templates and templates[path][0] == mtime:
+      return templates[path][1]
+  with open(path, 'r') as f:
+    template = PromptTemplate(input_variables=input_variables, template=f.read())
+  with templates_lock:
+    templates[path] = (mtime, template)
+  return template
+
+def prompts_version() -> tuple:
+  # chains built with custom prompts are rebuilt when a file changes
+  return tuple(os.path.getmtime(path) if os.path.exists(path) else None for path in PROMPT_FILES)
+
 class ChainParameters:
   def __init__(self, config, overrides):
     self.llm = overrides['llm'] if 'llm' in overrides else config.llm()
@@ -15,9 +39,17 @@ class ChainParameters:
     self.retriever_type = overrides['retriever_type'] if 'retriever_type' in overrides else config.retriever_type()
     self.score_threshold = float(overrides['score_threshold']) if 'score_threshold' in overrides else config.score_threshold()
     self.document_count = int(overrides['document_count']) if 'document_count' in overrides else config.document_count()
+    self.fetch_k = int(overrides['fetch_k']) if 'fetch_k' in overrides else config.fetch_k()
+    self.lambda_mult = float(overrides['lambda_mult']) if 'lambda_mult' in overrides else config.lambda_mult()
     self.custom_prompts = utils.is_true(overrides['custom_prompts']) if 'custom_prompts' in overrides else config.custom_prompts()
     self.return_sources = utils.is_true(overrides['return_sources']) if 'return_sources' in overrides else config.return_sources()
 
+    # metadata filters: per request only
+    self.video = overrides.get('video')
+    self.title = overrides.get('title')
+    self.date_from = overrides.get('date_from')
+    self.date_to = overrides.get('date_to')
+
   def llm_model(self):
     return self.openai_model if self.llm == 'openai' else self.ollama_model
   
@@ -32,25 +64,33 @@ class ChainParameters:
       'retriever_type': self.retriever_type,
       'score_threshold': self.score_threshold,
       'document_count': self.document_count,
+      'fetch_k': self.fetch_k,
+      'lambda_mult': self.lambda_mult,
       'custom_prompts': self.custom_prompts,
       'return_sources': self.return_sources,
+      'video': self.video,
+      'title': self.title,
+      'date_from': self.date_from,
+      'date_to': self.date_to,
     }
 
 class ChainBase:
 
   def __init__(self):
     self.chain = None
-    self.callback = None
+    self.templates = None
 
-  def invoke(self, prompt: str):
+  def invoke(self, prompt: str, callback):
 
-    # get prompts
-    self.callback.templates = self._get_chain_prompt_templates()
+    # get prompts (they do not change once the chain is built)
+    if self.templates is None:
+      self.templates = self._get_chain_prompt_templates()
+    callback.templates = self.templates
     
-    # now invoke
+    # now invoke: chains are shared so callback is per call
     return self.chain.invoke(
       input={ self._get_input_key(): prompt },
-      config=RunnableConfig(callbacks=[self.callback])
+      config=RunnableConfig(callbacks=[callback])
     )
 
   def _get_input_key(self):
@@ -68,12 +108,10 @@ class ChainBase:
     return {}
   
   def __get_question_prompt(self):
-    with open('prompts/base.txt', 'r') as f:
-      return PromptTemplate(input_variables=['context', 'question'], template=f.read())
+    return load_prompt('prompts/base.txt', ['context', 'question'])
 
   def __get_combine_prompt(self):
-    with open('prompts/combine.txt', 'r') as f:
-      return PromptTemplate(input_variables=['summaries', 'question'], template=f.read())
+    return load_prompt('prompts/combine.txt', ['summaries', 'question'])
 
   def _get_chain_prompt_templates(self):
 
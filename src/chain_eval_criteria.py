@@ -23,10 +23,10 @@ RATING:"""
 
 class CriteriaEvalChain(ChainBase):
 
-  def __init__(self, llm, criteria:list, callback, parameters: ChainParameters):
+  def __init__(self, llm, criteria:list, parameters: ChainParameters):
 
-    # save stuff
-    self.callback = callback
+    # init
+    super().__init__()
     
     # build chain
     print(f'[chain] building llm evaluation chain')
@@ -10,20 +10,20 @@ from langchain_core.runnables import RunnableConfig
 
 class QAEvalChain(ChainBase):
 
-  def __init__(self, llm, callback):
+  def __init__(self, llm):
 
-    # save stuff
-    self.callback = callback
+    # init
+    super().__init__()
     
     # build chain
     print(f'[chain] building llm evaluation chain')
     self.chain = LCQAEvalChain.from_llm(llm=llm)
 
-  def invoke(self, question, answer, reference):
-    self.callback.templates = self._get_chain_prompt_templates()
+  def invoke(self, question, answer, reference, callback):
+    callback.templates = self._get_chain_prompt_templates()
     return self.chain.invoke(input={
       'query': question,
       'result': answer,
       'answer': reference,
-    }, config=RunnableConfig(callbacks=[self.callback])
+    }, config=RunnableConfig(callbacks=[callback])
 )
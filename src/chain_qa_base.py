@@ -4,10 +4,10 @@ from langchain.chains import RetrievalQA
 
 class QAChainBase(ChainBase):
 
-  def __init__(self, llm, retriever, callback, parameters: ChainParameters):
+  def __init__(self, llm, retriever, parameters: ChainParameters):
 
-    # save callback
-    self.callback = callback
+    # init
+    super().__init__()
     
     # build chain
     print(f'[chain] building basic retrieval chain of type {parameters.doc_chain_type}')
@@ -4,10 +4,10 @@ from langchain.chains import ConversationalRetrievalChain
 
 class QAChainConversational(ChainBase):
   
-  def __init__(self, llm, retriever, memory, callback, parameters: ChainParameters):
+  def __init__(self, llm, retriever, memory, parameters: ChainParameters):
   
-    # save callback
-    self.callback = callback
+    # init
+    super().__init__()
     
     # build chain
     print(f'[chain] building conversational retrieval chain of type {parameters.doc_chain_type}')
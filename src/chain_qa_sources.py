@@ -1,14 +1,13 @@
 
-from chain_base import ChainBase, ChainParameters
+from chain_base import ChainBase, ChainParameters, load_prompt
 from langchain.chains import RetrievalQAWithSourcesChain
-from langchain.prompts import PromptTemplate
 
 class QAChainBaseWithSources(ChainBase):
 
-  def __init__(self, llm, retriever, callback, parameters: ChainParameters):
+  def __init__(self, llm, retriever, parameters: ChainParameters):
 
-    # save callback
-    self.callback = callback
+    # init
+    super().__init__()
     
     # build chain
     print(f'[chain] building retrieval chain with sources of type {parameters.doc_chain_type}')
@@ -24,6 +23,4 @@ class QAChainBaseWithSources(ChainBase):
     if not parameters.custom_prompts or parameters.doc_chain_type != 'stuff':
       return super()._get_prompt_kwargs(parameters)
   
-    with open('prompts/sourced.txt', 'r') as f:
-      prompt = PromptTemplate(input_variables=['summaries', 'question'], template=f.read())
-      return { 'prompt': prompt }
+    return { 'prompt': load_prompt('prompts/sourced.txt', ['summaries', 'question']) }
@@ -0,0 +1,184 @@
+
+import re
+import math
+import bisect
+
+# sentence boundaries inside a caption line
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+SENTENCE_END_CHARS = ('.', '!', '?')
+
+def splitter_settings(config) -> dict:
+
+  # recursive settings are kept as they were so that
+  # existing manifests are still considered current
+  split_type = config.split_type()
+  if split_type == 'recursive':
+    return {
+      'chunk_size': config.split_chunk_size(),
+      'chunk_overlap': config.split_chunk_overlap(),
+    }
+  elif split_type == 'transcript':
+    return {
+      'type': split_type,
+      'max_tokens': config.split_max_tokens(),
+      'overlap_cues': config.split_overlap_cues(),
+      'tokenizer': config.embeddings_model(),
+    }
+  else:
+    raise Exception(f'Unknown splitter type "{split_type}"')
+
+def build_chunker(settings: dict):
+  split_type = settings.get('type', 'recursive')
+  if split_type == 'recursive':
+    return RecursiveChunker(settings['chunk_size'], settings['chunk_overlap'])
+  elif split_type == 'transcript':
+    return TranscriptChunker(get_token_counter(settings['tokenizer']), settings['max_tokens'], settings['overlap_cues'])
+  else:
+    raise Exception(f'Unknown splitter type "{split_type}"')
+
+def get_token_counter(model_name: str):
+
+  # hosted models: tiktoken is a good enough approximation
+  if model_name == 'ollama' or ':' in model_name:
+    import tiktoken
+    encoding = tiktoken.get_encoding('cl100k_base')
+    return lambda texts: [len(tokens) for tokens in encoding.encode_batch(texts, disallowed_special=())]
+
+  # sentence transformers: count with the model tokenizer
+  from transformers import AutoTokenizer
+  try:
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+  except Exception:
+    tokenizer = AutoTokenizer.from_pretrained(f'sentence-transformers/{model_name}')
+  return lambda texts: [len(ids) for ids in tokenizer(texts, add_special_tokens=False)['input_ids']]
+
+def locate_chunks(content, texts, cues):
+
+  # chunks are found in order in the content (they may overlap)
+  # then mapped to the cues they span. timings are whole seconds
+  offsets = cues['offsets']
+  position = 0
+  timings = []
+  for text in texts:
+    index = content.find(text, position)
+    if index == -1:
+      index = content.find(text)
+    if index == -1:
+      timings.append((None, None))
+      continue
+    position = index + 1
+    first = max(0, bisect.bisect_right(offsets, index) - 1)
+    last = max(0, bisect.bisect_right(offsets, index + len(text) - 1) - 1)
+    timings.append((int(cues['starts'][first]), math.ceil(cues['ends'][last])))
+  return timings
+
+class RecursiveChunker:
+
+  def __init__(self, chunk_size, chunk_overlap):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    self.splitter = RecursiveCharacterTextSplitter(
+      chunk_size=chunk_size,
+      chunk_overlap=chunk_overlap
+    )
+
+  def split(self, content, cues=None) -> list:
+    texts = self.splitter.split_text(content)
+    chunks = [ { 'text': text, 'chunk': i } for i, text in enumerate(texts) ]
+    if cues is not None and len(cues['offsets']) > 0:
+      for chunk, (start, end) in zip(chunks, locate_chunks(content, texts, cues)):
+        chunk['start'] = start
+        chunk['end'] = end
+    return chunks
+
+class TranscriptChunker:
+
+  def __init__(self, count_tokens, max_tokens, overlap_cues):
+    self.count_tokens = count_tokens
+    self.max_tokens = max_tokens
+    self.overlap_cues = overlap_cues
+
+  def split(self, content, cues=None) -> list:
+
+    # units are caption lines (or sentences without cues) that are never split
+    # unless they are longer than a chunk: they are then split on sentences
+    units = self.__units(content, cues)
+    if len(units) == 0:
+      return []
+    tokens = self.count_tokens([unit[0] for unit in units])
+    units, tokens = self.__cap_units(units, tokens)
+
+    # pack units
+    chunks = []
+    first = 0
+    while first < len(units):
+
+      # as many units as possible
+      last = first
+      total = 0
+      sentence_end = None
+      while last < len(units) and (last == first or total + tokens[last] <= self.max_tokens):
+        total += tokens[last]
+        last += 1
+        if units[last - 1][0].endswith(SENTENCE_END_CHARS):
+          sentence_end = (last, total)
+
+      # end on a sentence boundary if that does not make the chunk too small
+      if last < len(units) and sentence_end is not None and sentence_end[1] >= self.max_tokens / 2:
+        last = sentence_end[0]
+
+      # add it
+      chunks.append(self.__chunk(len(chunks), units[first:last]))
+      if last >= len(units):
+        break
+
+      # overlap is expressed in units
+      first = max(first + 1, last - self.overlap_cues)
+
+    # done
+    return chunks
+
+  def __units(self, content, cues):
+
+    # without cues: sentences without timings
+    if cues is None or len(cues['offsets']) == 0:
+      return [ (text, None, None) for text in SENTENCE_END.split(content.strip()) if text != '' ]
+
+    # caption lines split on sentence boundaries
+    units = []
+    offsets = cues['offsets']
+    for i, offset in enumerate(offsets):
+      line = content[offset:offsets[i + 1] if i + 1 < len(offsets) else len(content)].strip()
+      for text in SENTENCE_END.split(line):
+        if text != '':
+          units.append((text, cues['starts'][i], cues['ends'][i]))
+    return units
+
+  def __cap_units(self, units, tokens):
+
+    # split oversized units on words (tokens are estimated)
+    if max(tokens) <= self.max_tokens:
+      return units, tokens
+    capped_units = []
+    capped_tokens = []
+    for unit, count in zip(units, tokens):
+      if count <= self.max_tokens:
+        capped_units.append(unit)
+        capped_tokens.append(count)
+        continue
+      words = unit[0].split(' ')
+      parts = math.ceil(count / self.max_tokens)
+      size = math.ceil(len(words) / parts)
+      for i in range(0, len(words), size):
+        capped_units.append((' '.join(words[i:i+size]), unit[1], unit[2]))
+        capped_tokens.append(math.ceil(count / parts))
+    return capped_units, capped_tokens
+
+  def __chunk(self, index, units):
+    chunk = {
+      'text': ' '.join(unit[0] for unit in units),
+      'chunk': index,
+    }
+    if units[0][1] is not None:
+      chunk['start'] = int(units[0][1])
+      chunk['end'] = math.ceil(units[-1][2])
+    return chunk
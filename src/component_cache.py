@@ -0,0 +1,44 @@
+
+import threading
+from collections import OrderedDict
+
+class ComponentCache:
+
+  def __init__(self, max_size: int = 32):
+    self.max_size = max_size
+    self.cache = OrderedDict()
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key, build):
+
+    # built already
+    with self.lock:
+      if key in self.cache:
+        self.cache.move_to_end(key)
+        self.hits += 1
+        return self.cache[key]
+
+    # build outside of the lock: concurrent builds of the same
+    # component are harmless, the last one wins
+    component = build()
+    with self.lock:
+      self.misses += 1
+      self.cache[key] = component
+      while len(self.cache) > self.max_size:
+        self.cache.popitem(last=False)
+    return component
+
+  def clear(self) -> None:
+    with self.lock:
+      self.cache.clear()
+
+  def stats(self) -> dict:
+    with self.lock:
+      return {
+        'size': len(self.cache),
+        'max_size': self.max_size,
+        'hits': self.hits,
+        'misses': self.misses,
+      }
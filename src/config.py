@@ -1,13 +1,19 @@
 
+import os
 import utils
 import consts
 import configparser
 
 # config
 CONFIG_SECTION_GENERAL = 'General'
+CONFIG_SECTION_SERVER = 'Server'
 CONFIG_SECTION_EMBEDDINGS = 'Embeddings'
 CONFIG_SECTION_SPLITTER = 'Splitter'
+CONFIG_SECTION_LOADER = 'Loader'
+CONFIG_SECTION_DOWNLOADER = 'Downloader'
 CONFIG_SECTION_SEARCH = 'Search'
+CONFIG_SECTION_VECTORSTORE = 'VectorStore'
+CONFIG_SECTION_ANSWER_CACHE = 'AnswerCache'
 
 class Config:
 
@@ -21,9 +27,39 @@ class Config:
     value = self.__get_value(CONFIG_SECTION_GENERAL, 'debug') or consts.DEFAULT_DEBUG
     return utils.is_true(value)
 
+  # threaded or any bottle server adapter (wsgiref, waitress, cheroot...)
+  def server(self):
+    return self.__get_value(CONFIG_SECTION_SERVER, 'server') or consts.DEFAULT_SERVER
+
+  def server_host(self):
+    return self.__get_value(CONFIG_SECTION_SERVER, 'host') or consts.DEFAULT_SERVER_HOST
+
+  def server_port(self):
+    return int(self.__get_value(CONFIG_SECTION_SERVER, 'port') or consts.DEFAULT_SERVER_PORT)
+
+  def server_threads(self):
+    return int(self.__get_value(CONFIG_SECTION_SERVER, 'threads') or consts.DEFAULT_SERVER_THREADS)
+
+  # 0 means unlimited
+  def ollama_concurrency(self):
+    return int(self.__get_value(CONFIG_SECTION_SERVER, 'ollama_concurrency') or consts.DEFAULT_OLLAMA_CONCURRENCY)
+
+  def openai_concurrency(self):
+    return int(self.__get_value(CONFIG_SECTION_SERVER, 'openai_concurrency') or consts.DEFAULT_OPENAI_CONCURRENCY)
+
+  def dump_documents(self):
+    value = self.__get_value(CONFIG_SECTION_GENERAL, 'dump_documents') or consts.DEFAULT_DUMP_DOCUMENTS
+    return utils.is_true(value)
+
   def database_path(self):
     return self.__get_value(CONFIG_SECTION_GENERAL, 'database_path') or consts.DEFAULT_DATABASE_PATH
 
+  def videos_path(self):
+    return self.__get_value(CONFIG_SECTION_GENERAL, 'videos_path') or consts.DEFAULT_VIDEOS_PATH
+
+  def videos_cache_path(self):
+    return self.__get_value(CONFIG_SECTION_GENERAL, 'videos_cache_path') or consts.DEFAULT_VIDEOS_CACHE_PATH or None
+
   def langchain_api_key(self):
     return self.__get_value(CONFIG_SECTION_GENERAL, 'langchain_api_key') or None
 
@@ -55,15 +91,107 @@ class Config:
   def db_persist_directory(self):
     return self.__get_value(CONFIG_SECTION_GENERAL, 'db_persist_dir') or consts.DEFAULT_DB_PERSIST_DIR
 
+  # chroma or numpy
+  def vectorstore_backend(self):
+    return self.__get_value(CONFIG_SECTION_VECTORSTORE, 'backend') or consts.DEFAULT_VECTORSTORE_BACKEND
+
+  def vectorstore_path(self):
+    if self.vectorstore_backend() == 'chroma':
+      return self.db_persist_directory()
+    return self.__get_value(CONFIG_SECTION_VECTORSTORE, 'path') or os.path.join(self.db_persist_directory(), 'numpy')
+
+  # float32, float16 or int8
+  def vectorstore_dtype(self):
+    return self.__get_value(CONFIG_SECTION_VECTORSTORE, 'dtype') or consts.DEFAULT_VECTORSTORE_DTYPE
+
+  # approximate search (hnswlib) above this number of chunks
+  def vectorstore_hnsw_threshold(self):
+    return int(self.__get_value(CONFIG_SECTION_VECTORSTORE, 'hnsw_threshold') or consts.DEFAULT_VECTORSTORE_HNSW_THRESHOLD)
+
+  # hnsw search breadth: higher is slower with better recall
+  def vectorstore_hnsw_ef(self):
+    return int(self.__get_value(CONFIG_SECTION_VECTORSTORE, 'hnsw_ef') or consts.DEFAULT_VECTORSTORE_HNSW_EF)
+
   def embeddings_model(self):
     return self.__get_value(CONFIG_SECTION_EMBEDDINGS, 'model') or consts.DEFAULT_EMBEDDINGS_MODEL
 
+  # identifies stored vectors: ollama ones are normalized since the batch
+  # client so databases built with raw vectors are loaded again
+  def embeddings_key(self):
+    model = self.embeddings_model()
+    if model == 'ollama' or model.startswith('ollama:'):
+      return f'{model}#normalized'
+    return model
+
+  # ollama embeddings: texts per request and requests in flight
+  def embeddings_batch_size(self):
+    return int(self.__get_value(CONFIG_SECTION_EMBEDDINGS, 'batch_size') or consts.DEFAULT_EMBEDDINGS_BATCH_SIZE)
+
+  def embeddings_concurrency(self):
+    return int(self.__get_value(CONFIG_SECTION_EMBEDDINGS, 'concurrency') or consts.DEFAULT_EMBEDDINGS_CONCURRENCY)
+
+  def embeddings_cache_size(self):
+    return int(self.__get_value(CONFIG_SECTION_EMBEDDINGS, 'cache_size') or consts.DEFAULT_EMBEDDINGS_CACHE_SIZE)
+
+  def embeddings_cache_path(self):
+    return self.__get_value(CONFIG_SECTION_EMBEDDINGS, 'cache_path') or consts.DEFAULT_EMBEDDINGS_CACHE_PATH or None
+
+  # 0 disables the answer cache, ttl is in seconds
+  def answer_cache_size(self):
+    return int(self.__get_value(CONFIG_SECTION_ANSWER_CACHE, 'size') or consts.DEFAULT_ANSWER_CACHE_SIZE)
+
+  def answer_cache_ttl(self):
+    return int(self.__get_value(CONFIG_SECTION_ANSWER_CACHE, 'ttl') or consts.DEFAULT_ANSWER_CACHE_TTL)
+
+  # cosine similarity of questions above which an answer is reused
+  def answer_cache_threshold(self):
+    return float(self.__get_value(CONFIG_SECTION_ANSWER_CACHE, 'threshold') or consts.DEFAULT_ANSWER_CACHE_THRESHOLD)
+
+  # recursive (characters) or transcript (cues and sentences, tokens)
+  def split_type(self):
+    return self.__get_value(CONFIG_SECTION_SPLITTER, 'type') or consts.DEFAULT_SPLIT_TYPE
+
   def split_chunk_size(self):
     return int(self.__get_value(CONFIG_SECTION_SPLITTER, 'split_chunk_size') or consts.DEFAULT_SPLIT_CHUNK_SIZE)
 
   def split_chunk_overlap(self):
     return int(self.__get_value(CONFIG_SECTION_SPLITTER, 'split_chunk_overlap') or consts.DEFAULT_SPLIT_CHUNK_OVERLAP)
 
+  # embeddings model tokens
+  def split_max_tokens(self):
+    return int(self.__get_value(CONFIG_SECTION_SPLITTER, 'max_tokens') or consts.DEFAULT_SPLIT_MAX_TOKENS)
+
+  def split_overlap_cues(self):
+    return int(self.__get_value(CONFIG_SECTION_SPLITTER, 'overlap_cues') or consts.DEFAULT_SPLIT_OVERLAP_CUES)
+
+  def loader_batch_size(self):
+    return int(self.__get_value(CONFIG_SECTION_LOADER, 'batch_size') or consts.DEFAULT_LOADER_BATCH_SIZE)
+
+  # 0 means one per cpu
+  def loader_workers(self):
+    return int(self.__get_value(CONFIG_SECTION_LOADER, 'workers') or consts.DEFAULT_LOADER_WORKERS)
+
+  # 0 means only at the end
+  def loader_persist_every(self):
+    return int(self.__get_value(CONFIG_SECTION_LOADER, 'persist_every') or consts.DEFAULT_LOADER_PERSIST_EVERY)
+
+  def downloader_workers(self):
+    return int(self.__get_value(CONFIG_SECTION_DOWNLOADER, 'workers') or consts.DEFAULT_DOWNLOADER_WORKERS)
+
+  # requests per second, 0 means unlimited
+  def downloader_rate(self):
+    return float(self.__get_value(CONFIG_SECTION_DOWNLOADER, 'rate') or consts.DEFAULT_DOWNLOADER_RATE)
+
+  def downloader_retries(self):
+    return int(self.__get_value(CONFIG_SECTION_DOWNLOADER, 'retries') or consts.DEFAULT_DOWNLOADER_RETRIES)
+
+  # seconds, doubled at each retry
+  def downloader_backoff(self):
+    return float(self.__get_value(CONFIG_SECTION_DOWNLOADER, 'backoff') or consts.DEFAULT_DOWNLOADER_BACKOFF)
+
+  def downloader_journal_path(self):
+    return self.__get_value(CONFIG_SECTION_DOWNLOADER, 'journal_path') or consts.DEFAULT_DOWNLOADER_JOURNAL_PATH
+
   # base, sources, conversation
   def chain_type(self):
     return self.__get_value(CONFIG_SECTION_SEARCH, 'chain_type') or consts.DEFAULT_CHAIN_TYPE
@@ -86,6 +214,17 @@ class Config:
   def score_threshold(self):
     return float(self.__get_value(CONFIG_SECTION_SEARCH, 'score_threshold') or consts.DEFAULT_SCORE_THRESHOLD)
 
+  # mmr: number of candidates and relevance/diversity balance (1 = relevance only)
+  def fetch_k(self):
+    return int(self.__get_value(CONFIG_SECTION_SEARCH, 'fetch_k') or consts.DEFAULT_FETCH_K)
+
+  def lambda_mult(self):
+    return float(self.__get_value(CONFIG_SECTION_SEARCH, 'lambda_mult') or consts.DEFAULT_LAMBDA_MULT)
+
+  # hybrid: reciprocal rank fusion constant (higher flattens rank differences)
+  def rrf_k(self):
+    return int(self.__get_value(CONFIG_SECTION_SEARCH, 'rrf_k') or consts.DEFAULT_RRF_K)
+
   def custom_prompts(self):
     value = self.__get_value(CONFIG_SECTION_SEARCH, 'custom_prompts') or consts.DEFAULT_CUSTOM_PROMPTS
     return utils.is_true(value)
@@ -106,8 +245,14 @@ class Config:
       'retriever_type': self.retriever_type(),
       'score_threshold': self.score_threshold(),
       'document_count': self.document_count(),
+      'fetch_k': self.fetch_k(),
+      'lambda_mult': self.lambda_mult(),
       'custom_prompts': self.custom_prompts(),
       'return_sources': self.return_sources(),
+      'video': '',
+      'title': '',
+      'date_from': '',
+      'date_to': '',
     }
     
   def __get_value(self, section, option):
@@ -1,19 +1,50 @@
 
 # paths
 CONFIG_PATH = './rag-youtube.conf'
+MANIFEST_FILENAME = 'manifest.db'
+LEXICAL_INDEX_FILENAME = 'lexical.db'
+SCHEMA_PATH = 'schema.sql'
 
 # defaults
+DEFAULT_SERVER = 'threaded'
+DEFAULT_SERVER_HOST = '0.0.0.0'
+DEFAULT_SERVER_PORT = 5555
+DEFAULT_SERVER_THREADS = 8
+DEFAULT_OLLAMA_CONCURRENCY = 1
+DEFAULT_OPENAI_CONCURRENCY = 8
 DEFAULT_DEBUG = 'false'
+DEFAULT_DUMP_DOCUMENTS = 'false'
 DEFAULT_DATABASE_PATH = 'rag-youtube.db'
+DEFAULT_VIDEOS_PATH = 'videos.json'
+DEFAULT_VIDEOS_CACHE_PATH = ''
 DEFAULT_LLM = 'ollama'
 DEFAULT_OLLAMA_URL = 'http://localhost:11434'
 DEFAULT_OLLAMA_MODEL = 'mistral:latest'
 DEFAULT_OPENAI_MODEL = 'gpt-3.5-turbo-1106'
 DEFAULT_LLM_TEMPERATURE = 0.8
 DEFAULT_DB_PERSIST_DIR = 'db'
+DEFAULT_VECTORSTORE_BACKEND = 'chroma'
+DEFAULT_VECTORSTORE_DTYPE = 'float32'
+DEFAULT_VECTORSTORE_HNSW_THRESHOLD = 50000
+DEFAULT_VECTORSTORE_HNSW_EF = 128
 DEFAULT_EMBEDDINGS_MODEL = 'all-mpnet-base-v2'
+DEFAULT_EMBEDDINGS_BATCH_SIZE = 64
+DEFAULT_EMBEDDINGS_CONCURRENCY = 4
+DEFAULT_EMBEDDINGS_CACHE_SIZE = 1024
+DEFAULT_EMBEDDINGS_CACHE_PATH = ''
 DEFAULT_SPLIT_CHUNK_SIZE = 2500
 DEFAULT_SPLIT_CHUNK_OVERLAP = 500
+DEFAULT_SPLIT_TYPE = 'recursive'
+DEFAULT_SPLIT_MAX_TOKENS = 256
+DEFAULT_SPLIT_OVERLAP_CUES = 1
+DEFAULT_LOADER_BATCH_SIZE = 256
+DEFAULT_LOADER_WORKERS = 0
+DEFAULT_LOADER_PERSIST_EVERY = 0
+DEFAULT_DOWNLOADER_WORKERS = 4
+DEFAULT_DOWNLOADER_RATE = 2.0
+DEFAULT_DOWNLOADER_RETRIES = 3
+DEFAULT_DOWNLOADER_BACKOFF = 2.0
+DEFAULT_DOWNLOADER_JOURNAL_PATH = 'captions/journal.jsonl'
 DEFAULT_CHAIN_TYPE = 'base'
 DEFAULT_DOC_CHAIN_TYPE = 'stuff'
 DEFAULT_RETRIEVER_TYPE = 'base'
@@ -23,6 +54,25 @@ DEFAULT_CUSTOM_PROMPTS = 'false'
 DEFAULT_RETURN_SOURCES = 'false'
 DEFAULT_SCORE_THRESHOLD = 0.25
 DEFAULT_DOCUMENT_COUNT = 4
+DEFAULT_FETCH_K = 20
+DEFAULT_LAMBDA_MULT = 0.5
+DEFAULT_RRF_K = 60
+DEFAULT_ANSWER_CACHE_SIZE = 256
+DEFAULT_ANSWER_CACHE_TTL = 86400
+DEFAULT_ANSWER_CACHE_THRESHOLD = 0.95
+
+# llms, retrievers and chains kept per agent
+COMPONENT_CACHE_SIZE = 32
+
+# database
+DEFAULT_RUNS_PAGE_SIZE = 50
+MAX_RUNS_PAGE_SIZE = 500
+DATABASE_BUSY_TIMEOUT_MS = 5000
+DATABASE_WRITE_BATCH_SIZE = 64
+DATABASE_WRITE_TIMEOUT_MS = 60000
+TRACE_DICTIONARY_SAMPLES = 50
+TRACE_DICTIONARY_MIN_SAMPLES = 10
+TRACE_CONVERT_BATCH_SIZE = 100
 
 # costing
 # https://openai.com/pricing
@@ -1,6 +1,13 @@
 
+import os
 import json
+import queue
+import hashlib
 import sqlite3
+import threading
+import consts
+from trace_store import TraceStore
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 # CREATE TABLE IF NOT EXISTS `runs` (
 #   `id` varchar(32) NOT NULL PRIMARY KEY,
@@ -14,24 +21,220 @@ import sqlite3
 #   `evaluation_qa_trace` blob NOT NULL
 # );
 
+# columns returned when listing runs
+RUN_SUMMARY_FIELDS = {
+  'id': 'runs.id',
+  'type': 'runs.type',
+  'created_at': 'runs.created_at',
+  'total_time': 'runs.total_time',
+  'input_tokens': 'runs.input_tokens',
+  'output_tokens': 'runs.output_tokens',
+  'question': 'm.question',
+  'llm': 'm.llm',
+  'llm_model': 'm.llm_model',
+  'chain_type': 'm.chain_type',
+  'doc_chain_type': 'm.doc_chain_type',
+  'search_type': 'm.search_type',
+  'cost': 'm.cost',
+  'cache_hit': 'm.cache_hit',
+  'evaluation_crit': 'CASE WHEN runs.evaluation_crit_trace IS NULL THEN NULL ELSE (SELECT json_group_object(c.criteria, c.rating) FROM run_criteria c WHERE c.id=runs.id) END',
+  'evaluation_qa': "CASE WHEN runs.evaluation_qa_trace IS NULL THEN NULL ELSE IFNULL(m.eval_qa_verdict, 'N/A') END",
+}
+
+# parameters identifying a configuration (metadata filters restrict the
+# videos searched for one question: they are not part of a configuration)
+RUN_PARAMETERS = [
+  'llm', 'llm_model', 'llm_temperature', 'chain_type', 'doc_chain_type', 'search_type',
+  'retriever_type', 'score_threshold', 'document_count', 'fetch_k', 'lambda_mult',
+  'custom_prompts', 'return_sources'
+]
+
+class ConnectionPool:
+
+  def __init__(self, path):
+    self.path = path
+    self.local = threading.local()
+    self.writes = queue.Queue()
+    self.migrated = False
+    self.error = None
+    self.traces = TraceStore()
+    self.writer = threading.Thread(target=self.__write_loop, name='database-writer', daemon=True)
+    self.writer.start()
+
+  def reader(self) -> sqlite3.Connection:
+    # one connection per thread: readers never wait for writers in wal mode
+    con = getattr(self.local, 'con', None)
+    if con is None:
+      con = self.__connect()
+      self.local.con = con
+    return con
+
+  def write(self, fn) -> any:
+    # writes are serialized and committed in batches by the writer thread
+    if self.error is not None:
+      raise Exception(f'Database writer unavailable: {self.error}')
+    future = Future()
+    self.writes.put((fn, future))
+    try:
+      return future.result(timeout=consts.DATABASE_WRITE_TIMEOUT_MS / 1000)
+    except FutureTimeoutError:
+      # the write may still be committed later on
+      raise Exception(f'Database write not done after {consts.DATABASE_WRITE_TIMEOUT_MS}ms')
+
+  def __connect(self) -> sqlite3.Connection:
+    con = sqlite3.connect(self.path, timeout=consts.DATABASE_BUSY_TIMEOUT_MS / 1000)
+    con.execute(f'PRAGMA busy_timeout={consts.DATABASE_BUSY_TIMEOUT_MS}')
+    return con
+
+  def __write_loop(self):
+
+    # writer connection
+    try:
+      con = self.__connect()
+      con.execute('PRAGMA journal_mode=WAL')
+      con.execute('PRAGMA synchronous=NORMAL')
+      con.isolation_level = None
+    except Exception as e:
+      print(f'[database] failed to open {self.path}: {e}')
+      self.error = e
+
+      # fail pending and late writes instead of leaving them waiting
+      while True:
+        _, future = self.writes.get()
+        future.set_exception(Exception(f'Database writer unavailable: {e}'))
+
+    while True:
+
+      # wait for work and grab whatever else is pending
+      batch = [self.writes.get()]
+      while len(batch) < consts.DATABASE_WRITE_BATCH_SIZE:
+        try:
+          batch.append(self.writes.get_nowait())
+        except queue.Empty:
+          break
+
+      # one transaction, one savepoint per write
+      results = []
+      try:
+        con.execute('BEGIN IMMEDIATE')
+        for fn, future in batch:
+          cursor = con.cursor()
+          cursor.execute('SAVEPOINT write')
+          try:
+            results.append((future, fn(cursor), None))
+            cursor.execute('RELEASE write')
+          except Exception as e:
+            cursor.execute('ROLLBACK TO write')
+            cursor.execute('RELEASE write')
+            results.append((future, None, e))
+        con.execute('COMMIT')
+      except Exception as e:
+        print(f'[database] failed to commit {len(batch)} writes: {e}')
+        try:
+          con.execute('ROLLBACK')
+        except Exception:
+          pass
+        results = [(future, None, e) for _, future in batch]
+
+      # notify
+      for future, result, error in results:
+        if error is None:
+          future.set_result(result)
+        else:
+          future.set_exception(error)
+
+# one pool per database file
+pools = {}
+pools_lock = threading.Lock()
+
+def get_pool(path) -> ConnectionPool:
+  with pools_lock:
+    if path not in pools:
+      pools[path] = ConnectionPool(path)
+    return pools[path]
+
 class Database:
 
   def __init__(self, config):
     self.config = config
-    self.con = sqlite3.connect(config.database_path())
+    self.pool = get_pool(config.database_path())
+    if not self.pool.migrated:
+      self.pool.migrated = True
+      self.__migrate()
 
-  def get_runs(self):
-    cursor = self.con.cursor()
-    cursor.execute("SELECT * FROM runs ORDER BY created_at DESC")
-    return [ self.__row_to_run(row) for row in cursor.fetchall() ]
+  def get_runs(self, limit=50, cursor=None, type=None, date_from=None, date_to=None, fields=None):
+
+    # projection
+    fields = [f for f in (fields or RUN_SUMMARY_FIELDS.keys()) if f in RUN_SUMMARY_FIELDS]
+    columns = ['id', 'created_at'] + [f for f in fields if f not in ['id', 'created_at']]
+
+    # filters
+    where = []
+    params = []
+    if type:
+      where.append('runs.type=?')
+      params.append(type)
+    if date_from:
+      where.append('runs.created_at>=?')
+      params.append(int(date_from))
+    if date_to:
+      where.append('runs.created_at<?')
+      params.append(int(date_to))
+
+    # keyset pagination on (created_at, id)
+    if cursor:
+      created_at, id = cursor.split(':', 1)
+      where.append('(runs.created_at<? OR (runs.created_at=? AND runs.id<?))')
+      params.extend([int(created_at), int(created_at), id])
+
+    # query one more row to know if there is a next page
+    sql = f"SELECT {', '.join(RUN_SUMMARY_FIELDS[c] for c in columns)} FROM runs LEFT JOIN run_metrics m ON m.id=runs.id"
+    if len(where) > 0:
+      sql += f" WHERE {' AND '.join(where)}"
+    sql += " ORDER BY runs.created_at DESC, runs.id DESC LIMIT ?"
+    params.append(limit + 1)
+    db_cursor = self.pool.reader().cursor()
+    db_cursor.execute(sql, params)
+    rows = db_cursor.fetchall()
+
+    # next cursor
+    next_cursor = None
+    if len(rows) > limit:
+      rows = rows[:limit]
+      next_cursor = f'{rows[-1][1]}:{rows[-1][0]}'
+
+    # done
+    runs = [ self.__row_to_summary(columns, row) for row in rows ]
+    return [ { k: v for k, v in run.items() if k in fields } for run in runs ], next_cursor
 
   def get_run(self, id):
-    cursor = self.con.cursor()
+    cursor = self.pool.reader().cursor()
     cursor.execute("SELECT * FROM runs WHERE id=?", (id,))
     return self.__row_to_run(cursor.fetchone())
 
+  def get_trace_stats(self):
+    cursor = self.pool.reader().cursor()
+    cursor.execute("SELECT COUNT(*), IFNULL(SUM(LENGTH(trace)), 0), IFNULL(SUM(LENGTH(evaluation_crit_trace)), 0), IFNULL(SUM(LENGTH(evaluation_qa_trace)), 0) FROM runs")
+    runs = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*), IFNULL(SUM(refs), 0), IFNULL(SUM(LENGTH(content)), 0) FROM trace_segments")
+    segments = cursor.fetchone()
+    return {
+      'runs': runs[0],
+      'traces_size': runs[1] + runs[2] + runs[3],
+      'segments': segments[0],
+      'segments_refs': segments[1],
+      'segments_size': segments[2],
+      'dictionary': self.pool.traces.current,
+    }
+
+  def get_config_stats(self):
+    cursor = self.pool.reader().cursor()
+    cursor.execute("SELECT * FROM config_stats WHERE runs>0 ORDER BY runs DESC")
+    columns = [d[0] for d in cursor.description]
+    return [ self.__row_to_stats(dict(zip(columns, row))) for row in cursor.fetchall() ]
+
   def add_run(self, run, type):
-    cursor = self.con.cursor()
+    trace, segments = self.pool.traces.pack(run)
     row=(
       run['chain']['id'],
       type,
@@ -39,28 +242,337 @@ class Database:
       run['performance']['total_time'],
       run['performance']['input_tokens'],
       run['performance']['output_tokens'],
-      json.dumps(run),
+      trace,
       None,
       None
     )
-    cursor.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
-    self.con.commit()
+    def write(cursor):
+      cursor.execute("INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+      self.__add_segments(cursor, segments)
+      self.__add_metrics(cursor, run)
+    self.pool.write(write)
 
   def set_run_eval_crit(self, id, trace):
-    cursor = self.con.cursor()
-    cursor.execute("UPDATE runs SET evaluation_crit_trace=? WHERE id=?", (json.dumps(trace), id))
-    self.con.commit()
+    value, segments = self.pool.traces.pack(trace)
+    def write(cursor):
+      cursor.execute("SELECT evaluation_crit_trace FROM runs WHERE id=?", (id,))
+      old = cursor.fetchone()
+      if old is not None:
+        self.__release_segments(cursor, old[0])
+      cursor.execute("UPDATE runs SET evaluation_crit_trace=? WHERE id=?", (value, id))
+      self.__add_segments(cursor, segments)
+      self.__set_eval_crit_metrics(cursor, id, trace)
+    self.pool.write(write)
 
   def set_run_eval_qa(self, id, trace):
-    cursor = self.con.cursor()
-    cursor.execute("UPDATE runs SET evaluation_qa_trace=? WHERE id=?", (json.dumps(trace), id))
-    self.con.commit()
-  
+    value, segments = self.pool.traces.pack(trace)
+    def write(cursor):
+      cursor.execute("SELECT evaluation_qa_trace FROM runs WHERE id=?", (id,))
+      old = cursor.fetchone()
+      if old is not None:
+        self.__release_segments(cursor, old[0])
+      cursor.execute("UPDATE runs SET evaluation_qa_trace=? WHERE id=?", (value, id))
+      self.__add_segments(cursor, segments)
+      self.__set_eval_qa_metrics(cursor, id, trace)
+    self.pool.write(write)
+
   def delete_run(self, id):
-    cursor = self.con.cursor()
-    cursor.execute("DELETE FROM runs WHERE id=?", (id,))
-    self.con.commit()
-  
+    def write(cursor):
+      self.__delete_metrics(cursor, id)
+      cursor.execute("SELECT trace, evaluation_crit_trace, evaluation_qa_trace FROM runs WHERE id=?", (id,))
+      row = cursor.fetchone()
+      if row is not None:
+        for blob in row:
+          self.__release_segments(cursor, blob)
+      cursor.execute("DELETE FROM runs WHERE id=?", (id,))
+    self.pool.write(write)
+
+  def __migrate(self):
+
+    # schema is idempotent
+    if not os.path.exists(consts.SCHEMA_PATH):
+      print(f'[database] {consts.SCHEMA_PATH} not found: skipping migration')
+      return
+    with open(consts.SCHEMA_PATH) as f:
+      statements = [s.strip() for s in f.read().split(';') if s.strip()]
+    def write(cursor):
+      for statement in statements:
+        cursor.execute(statement)
+    self.pool.write(write)
+
+    # columns added after tables were created
+    self.__add_missing_columns()
+
+    # traces and metrics of runs created before
+    self.__load_trace_dictionaries()
+    self.__backfill_metrics()
+    self.__convert_traces()
+
+  def __add_missing_columns(self):
+    columns = {
+      'run_metrics': [('fetch_k', 'int(11) NULL'), ('lambda_mult', 'real NULL'), ('cache_hit', 'int(1) NOT NULL DEFAULT 0')],
+      'config_stats': [('fetch_k', 'int(11) NULL'), ('lambda_mult', 'real NULL'), ('cache_hits', 'int(11) NOT NULL DEFAULT 0')],
+    }
+    cursor = self.pool.reader().cursor()
+    for table, definitions in columns.items():
+      existing = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()]
+      for name, definition in definitions:
+        if name not in existing:
+          self.pool.write(lambda cursor: cursor.execute(f"ALTER TABLE {table} ADD COLUMN `{name}` {definition}"))
+
+  def __backfill_metrics(self):
+    cursor = self.pool.reader().cursor()
+    cursor.execute("SELECT id FROM runs WHERE id NOT IN (SELECT id FROM run_metrics)")
+    ids = [row[0] for row in cursor.fetchall()]
+    if len(ids) == 0:
+      return
+    print(f'[database] building metrics for {len(ids)} runs')
+    for id in ids:
+      run = self.get_run(id)
+      def write(cursor):
+        self.__add_metrics(cursor, run['trace'])
+        if run['evaluation_crit_trace'] is not None:
+          self.__set_eval_crit_metrics(cursor, id, run['evaluation_crit_trace'])
+        if run['evaluation_qa_trace'] is not None:
+          self.__set_eval_qa_metrics(cursor, id, run['evaluation_qa_trace'])
+      self.pool.write(write)
+
+  def __load_trace_dictionaries(self):
+
+    # existing dictionaries
+    traces = self.pool.traces
+    cursor = self.pool.reader().cursor()
+    cursor.execute("SELECT id, content FROM trace_dictionaries ORDER BY id")
+    for id, content in cursor.fetchall():
+      traces.add_dictionary(id, content)
+    if traces.current is not None:
+      return
+
+    # train one on most recent traces if we have enough of them
+    cursor.execute("SELECT id FROM runs ORDER BY created_at DESC LIMIT ?", (consts.TRACE_DICTIONARY_SAMPLES,))
+    ids = [row[0] for row in cursor.fetchall()]
+    if len(ids) < consts.TRACE_DICTIONARY_MIN_SAMPLES:
+      return
+    content = traces.train([self.get_run(id)['trace'] for id in ids])
+    print(f'[database] trained trace dictionary of {len(content)} bytes on {len(ids)} runs')
+    self.pool.write(lambda cursor: cursor.execute("INSERT INTO trace_dictionaries VALUES (?, ?)", (1, content)))
+    traces.add_dictionary(1, content)
+
+  def __convert_traces(self):
+
+    # runs with at least one trace stored as plain json
+    keys = ['trace', 'evaluation_crit_trace', 'evaluation_qa_trace']
+    cursor = self.pool.reader().cursor()
+    cursor.execute("SELECT id, typeof(trace)='text', typeof(evaluation_crit_trace)='text', typeof(evaluation_qa_trace)='text' FROM runs WHERE typeof(trace)='text' OR typeof(evaluation_crit_trace)='text' OR typeof(evaluation_qa_trace)='text'")
+    runs = [(row[0], [key for key, text in zip(keys, row[1:]) if text]) for row in cursor.fetchall()]
+    if len(runs) == 0:
+      return
+
+    # convert in batches: packed traces already hold references to their segments
+    print(f'[database] compressing traces of {len(runs)} runs')
+    traces = self.pool.traces
+    for i in range(0, len(runs), consts.TRACE_CONVERT_BATCH_SIZE):
+      updates = []
+      for id, text_keys in runs[i:i+consts.TRACE_CONVERT_BATCH_SIZE]:
+        run = self.get_run(id)
+        updates.append((id, { key: traces.pack(run[key]) for key in text_keys }))
+      def write(cursor):
+        for id, packed in updates:
+          for blob, segments in packed.values():
+            self.__add_segments(cursor, segments)
+          cursor.execute(f"UPDATE runs SET {', '.join(f'{key}=?' for key in packed.keys())} WHERE id=?", [
+            blob for blob, _ in packed.values()
+          ] + [id])
+      self.pool.write(write)
+    print(f'[database] traces compressed: run VACUUM to reclaim disk space')
+
+  def __add_segments(self, cursor, segments):
+    cursor.executemany(
+      "INSERT INTO trace_segments VALUES (?, 1, ?) ON CONFLICT(hash) DO UPDATE SET refs=refs+1",
+      list(segments.items())
+    )
+
+  def __release_segments(self, cursor, blob):
+    hashes = set(self.pool.traces.refs(blob))
+    cursor.executemany("UPDATE trace_segments SET refs=refs-1 WHERE hash=?", [(hash,) for hash in hashes])
+    cursor.executemany("DELETE FROM trace_segments WHERE hash=? AND refs<=0", [(hash,) for hash in hashes])
+
+  def __get_segments(self, hashes):
+    cursor = self.pool.reader().cursor()
+    segments = {}
+    for i in range(0, len(hashes), 500):
+      chunk = hashes[i:i+500]
+      cursor.execute(f"SELECT hash, content FROM trace_segments WHERE hash IN ({', '.join(['?'] * len(chunk))})", chunk)
+      segments.update({ row[0]: row[1] for row in cursor.fetchall() })
+    return segments
+
+  def __add_metrics(self, cursor, run):
+
+    # parameters
+    parameters = run.get('parameters') or {}
+    values = { key: parameters.get(key) for key in RUN_PARAMETERS }
+    for key in ['custom_prompts', 'return_sources']:
+      values[key] = None if values[key] is None else int(values[key])
+    config_key = hashlib.sha1(json.dumps(values, sort_keys=True).encode()).hexdigest()
+
+    # metrics
+    performance = run['performance']
+    metrics = {
+      'id': run['chain']['id'],
+      'config_key': config_key,
+      'question': run.get('question'),
+      **values,
+      'time_1st_token': performance.get('time_1st_token'),
+      'tokens_per_sec': performance.get('tokens_per_sec'),
+      'cost': performance.get('cost') or 0,
+      'cache_hit': int(bool(run.get('cache_hit'))),
+    }
+    cursor.execute(f"INSERT INTO run_metrics ({', '.join(metrics.keys())}) VALUES ({', '.join(['?'] * len(metrics))})", list(metrics.values()))
+
+    # aggregates
+    cursor.execute(f"INSERT OR IGNORE INTO config_stats (config_key, {', '.join(values.keys())}) VALUES (?, {', '.join(['?'] * len(values))})", [config_key] + list(values.values()))
+    self.__update_stats(cursor, config_key, {
+      'runs': 1,
+      'total_time': performance['total_time'],
+      'input_tokens': performance['input_tokens'],
+      'output_tokens': performance['output_tokens'],
+      'cost': metrics['cost'],
+      'cache_hits': metrics['cache_hit'],
+      'time_1st_token_sum': metrics['time_1st_token'] or 0,
+      'time_1st_token_count': 0 if metrics['time_1st_token'] is None else 1,
+      'tokens_per_sec_sum': metrics['tokens_per_sec'] or 0,
+      'tokens_per_sec_count': 0 if metrics['tokens_per_sec'] is None else 1,
+    })
+
+  def __set_eval_crit_metrics(self, cursor, id, trace):
+
+    # previous evaluation
+    cursor.execute("SELECT config_key, eval_crit_score, eval_crit_input_tokens, eval_crit_output_tokens, eval_crit_cost FROM run_metrics WHERE id=?", (id,))
+    old = cursor.fetchone()
+    if old is None:
+      return
+
+    # new evaluation
+    ratings = trace.get('evaluation') or {}
+    score = None if len(ratings) == 0 else sum(ratings.values()) / len(ratings)
+    performance = trace['performance']
+    cursor.execute("UPDATE run_metrics SET eval_crit_score=?, eval_crit_input_tokens=?, eval_crit_output_tokens=?, eval_crit_cost=? WHERE id=?", (
+      score, performance['input_tokens'], performance['output_tokens'], performance['cost'], id
+    ))
+    cursor.execute("DELETE FROM run_criteria WHERE id=?", (id,))
+    cursor.executemany("INSERT INTO run_criteria VALUES (?, ?, ?)", [(id, criteria, rating) for criteria, rating in ratings.items()])
+
+    # aggregates
+    self.__update_stats(cursor, old[0], {
+      'eval_crit_count': (score is not None) - (old[1] is not None),
+      'eval_crit_sum': (score or 0) - (old[1] or 0),
+      'eval_input_tokens': performance['input_tokens'] - (old[2] or 0),
+      'eval_output_tokens': performance['output_tokens'] - (old[3] or 0),
+      'eval_cost': performance['cost'] - (old[4] or 0),
+    })
+
+  def __set_eval_qa_metrics(self, cursor, id, trace):
+
+    # previous evaluation
+    cursor.execute("SELECT config_key, eval_qa_verdict, eval_qa_input_tokens, eval_qa_output_tokens, eval_qa_cost FROM run_metrics WHERE id=?", (id,))
+    old = cursor.fetchone()
+    if old is None:
+      return
+
+    # new evaluation
+    verdict = self.__qa_verdict(trace.get('answer'))
+    performance = trace['performance']
+    cursor.execute("UPDATE run_metrics SET eval_qa_verdict=?, eval_qa_input_tokens=?, eval_qa_output_tokens=?, eval_qa_cost=? WHERE id=?", (
+      verdict, performance['input_tokens'], performance['output_tokens'], performance['cost'], id
+    ))
+
+    # aggregates
+    self.__update_stats(cursor, old[0], {
+      'eval_qa_count': (verdict in ['CORRECT', 'INCORRECT']) - (old[1] in ['CORRECT', 'INCORRECT']),
+      'eval_qa_correct': (verdict == 'CORRECT') - (old[1] == 'CORRECT'),
+      'eval_input_tokens': performance['input_tokens'] - (old[2] or 0),
+      'eval_output_tokens': performance['output_tokens'] - (old[3] or 0),
+      'eval_cost': performance['cost'] - (old[4] or 0),
+    })
+
+  def __delete_metrics(self, cursor, id):
+
+    # metrics and run
+    cursor.execute("SELECT m.config_key, m.cost, m.time_1st_token, m.tokens_per_sec, m.eval_crit_score, m.eval_crit_input_tokens, m.eval_crit_output_tokens, m.eval_crit_cost, m.eval_qa_verdict, m.eval_qa_input_tokens, m.eval_qa_output_tokens, m.eval_qa_cost, r.total_time, r.input_tokens, r.output_tokens, m.cache_hit FROM run_metrics m JOIN runs r ON r.id=m.id WHERE m.id=?", (id,))
+    row = cursor.fetchone()
+    if row is None:
+      return
+
+    # aggregates
+    self.__update_stats(cursor, row[0], {
+      'runs': -1,
+      'total_time': -row[12],
+      'input_tokens': -row[13],
+      'output_tokens': -row[14],
+      'cost': -row[1],
+      'cache_hits': -row[15],
+      'time_1st_token_sum': -(row[2] or 0),
+      'time_1st_token_count': -(row[2] is not None),
+      'tokens_per_sec_sum': -(row[3] or 0),
+      'tokens_per_sec_count': -(row[3] is not None),
+      'eval_crit_count': -(row[4] is not None),
+      'eval_crit_sum': -(row[4] or 0),
+      'eval_qa_count': -(row[8] in ['CORRECT', 'INCORRECT']),
+      'eval_qa_correct': -(row[8] == 'CORRECT'),
+      'eval_input_tokens': -((row[5] or 0) + (row[9] or 0)),
+      'eval_output_tokens': -((row[6] or 0) + (row[10] or 0)),
+      'eval_cost': -((row[7] or 0) + (row[11] or 0)),
+    })
+
+    # now delete
+    cursor.execute("DELETE FROM run_criteria WHERE id=?", (id,))
+    cursor.execute("DELETE FROM run_metrics WHERE id=?", (id,))
+
+  def __update_stats(self, cursor, config_key, deltas):
+    cursor.execute(
+      f"UPDATE config_stats SET {', '.join(f'{key}={key}+?' for key in deltas.keys())} WHERE config_key=?",
+      list(deltas.values()) + [config_key]
+    )
+
+  def __row_to_stats(self, row):
+    runs = row['runs']
+    return {
+      'config_key': row['config_key'],
+      'parameters': { key: row[key] for key in RUN_PARAMETERS },
+      'runs': runs,
+      'avg_total_time': round(row['total_time'] / runs, 2),
+      'avg_input_tokens': round(row['input_tokens'] / runs, 2),
+      'avg_output_tokens': round(row['output_tokens'] / runs, 2),
+      'avg_time_1st_token': None if row['time_1st_token_count'] == 0 else round(row['time_1st_token_sum'] / row['time_1st_token_count'], 2),
+      'avg_tokens_per_sec': None if row['tokens_per_sec_count'] == 0 else round(row['tokens_per_sec_sum'] / row['tokens_per_sec_count'], 2),
+      'cost': row['cost'],
+      'cache_hits': row['cache_hits'],
+      'cache_hit_rate': round(row['cache_hits'] / runs, 4),
+      'eval_crit_count': row['eval_crit_count'],
+      'avg_eval_crit': None if row['eval_crit_count'] == 0 else round(row['eval_crit_sum'] / row['eval_crit_count'], 2),
+      'eval_qa_count': row['eval_qa_count'],
+      'eval_qa_correct_rate': None if row['eval_qa_count'] == 0 else round(row['eval_qa_correct'] / row['eval_qa_count'], 4),
+      'eval_input_tokens': row['eval_input_tokens'],
+      'eval_output_tokens': row['eval_output_tokens'],
+      'eval_cost': row['eval_cost'],
+      'total_cost': row['cost'] + row['eval_cost'],
+    }
+
+  def __row_to_summary(self, columns, row):
+    run = dict(zip(columns, row))
+    if 'evaluation_crit' in run:
+      run['evaluation_crit'] = json.loads(run['evaluation_crit']) if run['evaluation_crit'] else None
+    return run
+
+  def __qa_verdict(self, answer):
+    if answer is None:
+      return None
+    if 'INCORRECT' in answer:
+      return 'INCORRECT'
+    if 'CORRECT' in answer:
+      return 'CORRECT'
+    return 'N/A'
+
   def __row_to_run(self, row):
     return None if row is None else {
       'id': row[0],
@@ -69,7 +581,7 @@ class Database:
       'total_time': row[3],
       'input_tokens': row[4],
       'output_tokens': row[5],
-      'trace': json.loads(row[6]),
-      'evaluation_crit_trace': json.loads(row[7]) if row[7] else None,
-      'evaluation_qa_trace': json.loads(row[8]) if row[8] else None
-    }
\ No newline at end of file
+      'trace': self.pool.traces.unpack(row[6], self.__get_segments),
+      'evaluation_crit_trace': self.pool.traces.unpack(row[7], self.__get_segments) if row[7] else None,
+      'evaluation_qa_trace': self.pool.traces.unpack(row[8], self.__get_segments) if row[8] else None
+    }
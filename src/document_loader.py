@@ -5,6 +5,9 @@ import consts
 import utils
 from config import Config
 from agent_load import Loader
+from manifest import IngestManifest, hash_file, hash_metadata
+from ingest_pipeline import IngestPipeline
+from chunker import splitter_settings
 from langchain_community.document_loaders import DirectoryLoader, TextLoader
 
 def main():
@@ -20,32 +23,45 @@ def main():
 
   # print config
   print(f'[loader] embeddings model = {config.embeddings_model()}')
-  print(f'[loader] splitter size/overlap = {config.split_chunk_size()}/{config.split_chunk_overlap()}')
+  settings = splitter_settings(config)
+  print(f'[loader] splitter = {settings}')
   utils.dumpj({
-    'embeddings_model': config.embeddings_model(),
-    'split_chunk_size': config.split_chunk_size(),
-    'split_chunk_overlap': config.split_chunk_overlap(),
+    'embeddings_model': config.embeddings_key(),
+    'splitter': settings,
   }, 'db_config.json')
 
-  # track loaded
-  loaded = []
-  if os.path.exists(config.db_persist_directory()) and os.path.exists('loaded.json'):
-    loaded = json.load(open('loaded.json'))
+  # what is already loaded
+  manifest = IngestManifest(os.path.join(config.vectorstore_path(), consts.MANIFEST_FILENAME))
+  entries = manifest.get_all()
+  if manifest.is_new and loader.count() > 0:
+    manifest.set_migration_pending(True)
+  purge = manifest.migration_pending()
+  if purge:
+    print(f'[loader] no manifest found for existing database: videos will be replaced')
+
+  # chunks written before the lexical index
+  loader.sync_lexical_index()
+
+  # settings that invalidate existing chunks
+  embeddings_model = config.embeddings_key()
+  splitter = json.dumps(settings, sort_keys=True)
 
   # iterate on captions files
   subset_only=False
-  all_files = [f for f in os.listdir('captions') if 'cleaned' in f and f not in loaded and (not subset_only or f.startswith('_'))]
+  all_files = [f for f in os.listdir('captions') if 'cleaned' in f and (not subset_only or f.startswith('_'))]
   all_files.sort()
 
-  # load
-  index = 0
+  # build jobs
+  jobs = []
+  updates = []
+  video_ids = set()
   for filename in all_files:
     
     # init
-    index += 1
     video_id = filename.split('.')[0]
+    video_ids.add(video_id)
 
-    # find title
+    # video metadata (published is a unix timestamp so that it can be filtered on)
     metadata = {
       'title': 'Unknown',
       'description': 'Unknown',
@@ -56,22 +72,74 @@ def main():
     if video is not None:
       metadata['title'] = video['snippet']['title']
       metadata['description'] = video['snippet']['description']
+      if video['snippet'].get('publishedAt'):
+        metadata['published'] = utils.parse_date(video['snippet']['publishedAt'])
+    metadata_hash = hash_metadata(metadata)
 
-    # load
-    try:
-    
-      # do it
-      print(f'[loader][{index}/{len(all_files)}] adding {video_id} to database...')
-      with open(f'captions/{filename}') as f:
-        loader.add_text(f.read(), metadata)
-    
-      # update index
-      loaded.append(filename)
-      json.dump(loaded, open('loaded.json', 'w'), indent=2)
-    
-    except Exception as e:
-      print(f'[loader] error adding {video_id} to database: {e}')
+    # check if changed: only metadata is updated if captions did not change
+    cues_path = f'captions/{video_id}.cues.json'
+    hash = hash_file(f'captions/{filename}', cues_path)
+    entry = entries.get(video_id)
+    if manifest.is_current(entry, hash, splitter, embeddings_model):
+      if entry['metadata'] != metadata_hash:
+        updates.append({ **entry, 'metadata': metadata_hash, 'video_metadata': metadata })
       continue
 
+    # add
+    jobs.append({
+      'video_id': video_id,
+      'filename': filename,
+      'path': f'captions/{filename}',
+      'cues_path': cues_path,
+      'hash': hash,
+      'metadata': metadata,
+      'metadata_hash': metadata_hash,
+      'stale_ids': entry['chunk_ids'] if entry is not None else [],
+      'purge': purge and entry is None,
+    })
+
+  # captions that disappeared
+  removed = [entry for video_id, entry in entries.items() if video_id not in video_ids]
+  if len(removed) > 0:
+    print(f'[loader] removing {len(removed)} videos from database')
+    loader.delete(ids=[id for entry in removed for id in entry['chunk_ids']])
+    manifest.delete_many([entry['video_id'] for entry in removed])
+
+  # metadata changes do not need new embeddings
+  if len(updates) > 0:
+    print(f'[loader] updating metadata of {len(updates)} videos')
+    for entry in updates:
+      loader.update_metadata(entry['chunk_ids'], entry['video_metadata'])
+    manifest.set_many(updates)
+
+  # nothing to do
+  print(f'[loader] {len(jobs)} new or changed videos, {len(all_files) - len(jobs)} unchanged')
+  if len(jobs) == 0:
+    loader.persist()
+    manifest.set_migration_pending(False)
+    return
+
+  # update manifest after each batch
+  def on_batch(done):
+    manifest.set_many([{
+      'video_id': job['video_id'],
+      'filename': job['filename'],
+      'hash': job['hash'],
+      'splitter': splitter,
+      'embeddings_model': embeddings_model,
+      'chunk_ids': job['chunk_ids'],
+      'metadata': job['metadata_hash'],
+    } for job in done])
+
+  # now run
+  pipeline = IngestPipeline(loader, config)
+  pipeline.on_batch = on_batch
+  pipeline.run(jobs)
+
+  # all videos are now in the manifest (failed ones are retried next run)
+  if pipeline.errors == 0:
+    manifest.set_migration_pending(False)
+  manifest.close()
+
 if __name__ == '__main__':
   main()
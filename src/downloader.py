@@ -1,10 +1,14 @@
-import os
-import re
-import tempfile
+import threading
+import vtt_parser
 from yt_dlp import YoutubeDL
 
 class Downloader:
 
+  def __init__(self, ydl_factory=YoutubeDL):
+    # one extractor per thread: YoutubeDL instances are expensive and not thread-safe
+    self.ydl_factory = ydl_factory
+    self.local = threading.local()
+
   def get_info(self, url):
     ydl_opts = {
       'verbose': False,
@@ -14,75 +18,47 @@ class Downloader:
       return ydl.extract_info(url, download=False)
 
   def download_captions(self, url, lang=None):
-    captions_filename = self._download_captions(url, lang)
-    if os.path.exists(captions_filename):
-      original_captions = open(captions_filename, 'r').read()
-      os.remove(captions_filename)
-      return original_captions
-    return None
-
-  def prepare_captions(self, info, original_captions):
-    captions = self._cleanup_captions(original_captions)
-    # captions = f'{info["snippet"]["title"]} {captions}'
-    return captions
-
-  def _download_captions(self, url, lang=None):
-
-    # get temp directory with system call
-    tmp_dir = tempfile.gettempdir()
 
     # default lang
     if lang is None or lang == '':
       lang = 'en'
 
-    # basic options
-    ydl_opts = {
-      'verbose': False,
-      'skip_download': True,
-      'writesubtitles': True,
-      'writeautomaticsub': True,
-      'subtitleslangs': [lang],
-      'outtmpl': f'{tmp_dir}/%(id)s.%(ext)s',
-    }
+    # subtitles are resolved by the extractor and fetched in memory
+    ydl = self.__get_ydl(lang)
+    info = ydl.extract_info(url, download=False)
+    subtitles = (info or {}).get('requested_subtitles') or {}
+    subtitle = subtitles.get(lang)
+    if subtitle is None:
+      return None
+    if subtitle.get('data') is not None:
+      return subtitle['data']
+    with ydl.urlopen(subtitle['url']) as response:
+      return response.read().decode('utf-8')
 
-    # extract video id
-    video_id = url if '=' not in url else url.split('=')[1]
+  def prepare_captions(self, info, original_captions):
+    captions = self._cleanup_captions(original_captions)
+    # captions = f'{info["snippet"]["title"]} {captions}'
+    return captions
 
-    # download captions
-    with YoutubeDL(ydl_opts) as ydl:
-      ydl.download(url)
-      return f'{tmp_dir}/{video_id}.{lang}.vtt'
+  def prepare_transcript(self, info, original_captions):
+    return vtt_parser.transcript(original_captions)
+
+  def __get_ydl(self, lang):
+    ydls = getattr(self.local, 'ydls', None)
+    if ydls is None:
+      ydls = {}
+      self.local.ydls = ydls
+    if lang not in ydls:
+      ydls[lang] = self.ydl_factory({
+        'verbose': False,
+        'quiet': True,
+        'skip_download': True,
+        'writesubtitles': True,
+        'writeautomaticsub': True,
+        'subtitleslangs': [lang],
+        'subtitlesformat': 'vtt',
+      })
+    return ydls[lang]
 
   def _cleanup_captions(self, original_captions):
-
-    # copy
-    contents = original_captions
-
-    # remove header lines
-    contents = re.sub(r'WEBVTT\n', '', contents)
-    contents = re.sub(r'Kind: captions\n', '', contents)
-    contents = re.sub(r'Language: .*?\n', '', contents)
-
-    # remove timestamp lines
-    contents = re.sub(r'\d\d:\d\d:\d\d\.\d\d\d --> .*\n', '', contents)
-    
-    # now remove timestamps like <00:20:03.039><c>
-    contents = re.sub(r'<\d\d:\d\d:\d\d\.\d\d\d><c>', '', contents)
-    contents = re.sub(r'</c>', '', contents)
-    contents = re.sub(r'\n+', '\n', contents)
-
-    # now remove music
-    contents = re.sub(r'\[Music\]', '', contents)
-
-    # now combine lines
-    captions = ''
-    previous_line = ''
-    for line in contents.split('\n'):
-      line = line.strip()
-      if line != '' and previous_line != line:
-        captions += line + ' '
-        previous_line = line
-    
-    # done
-    return captions
-
+    return vtt_parser.to_text(original_captions)
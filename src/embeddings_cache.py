@@ -0,0 +1,98 @@
+
+import re
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+
+class CachedEmbeddings(Embeddings):
+
+  def __init__(self, embeddings: Embeddings, model_name: str, max_size: int = 1024, path: str = None):
+    self.embeddings = embeddings
+    self.model_name = model_name
+    self.max_size = max_size
+    self.cache = OrderedDict()
+    self.lock = threading.Lock()
+    self.hits = 0
+    self.disk_hits = 0
+    self.misses = 0
+    self.con = None
+    if path:
+      self.con = sqlite3.connect(path, check_same_thread=False)
+      self.con.execute("""CREATE TABLE IF NOT EXISTS `embeddings` (
+        `model` varchar(256) NOT NULL,
+        `text` text NOT NULL,
+        `vector` blob NOT NULL,
+        PRIMARY KEY (`model`, `text`)
+      )""")
+      self.con.commit()
+
+  def embed_documents(self, texts: list) -> list:
+    # documents are embedded once at ingestion: no point in caching them
+    return self.embeddings.embed_documents(texts)
+
+  def embed_query(self, text: str) -> list:
+
+    # memory
+    key = self.__normalize(text)
+    with self.lock:
+      if key in self.cache:
+        self.cache.move_to_end(key)
+        self.hits += 1
+        return self.cache[key]
+
+    # disk
+    vector = self.__disk_get(key)
+    if vector is not None:
+      with self.lock:
+        self.disk_hits += 1
+    else:
+      vector = self.embeddings.embed_query(text)
+      self.__disk_set(key, vector)
+      with self.lock:
+        self.misses += 1
+
+    # done
+    self.__add(key, vector)
+    return vector
+
+  def stats(self) -> dict:
+    with self.lock:
+      lookups = self.hits + self.disk_hits + self.misses
+      return {
+        'model': self.model_name,
+        'size': len(self.cache),
+        'max_size': self.max_size,
+        'hits': self.hits,
+        'disk_hits': self.disk_hits,
+        'misses': self.misses,
+        'hit_rate': None if lookups == 0 else round((self.hits + self.disk_hits) / lookups, 4),
+        'backend': self.embeddings.stats() if hasattr(self.embeddings, 'stats') else None,
+      }
+
+  def __add(self, key, vector):
+    with self.lock:
+      self.cache[key] = vector
+      self.cache.move_to_end(key)
+      while len(self.cache) > self.max_size:
+        self.cache.popitem(last=False)
+
+  def __disk_get(self, key):
+    if self.con is None:
+      return None
+    with self.lock:
+      row = self.con.execute("SELECT vector FROM embeddings WHERE model=? AND text=?", (self.model_name, key)).fetchone()
+    if row is None:
+      return None
+    return array('f', row[0]).tolist()
+
+  def __disk_set(self, key, vector):
+    if self.con is None:
+      return
+    with self.lock:
+      self.con.execute("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", (self.model_name, key, array('f', vector).tobytes()))
+      self.con.commit()
+
+  def __normalize(self, text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip()
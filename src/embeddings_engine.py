@@ -0,0 +1,32 @@
+
+import threading
+from langchain_core.embeddings import Embeddings
+from sentence_transformers import SentenceTransformer
+
+class EmbeddingsEngine(Embeddings):
+
+  def __init__(self, model_name: str, batch_size: int = 32):
+    print(f'[embeddings] loading {model_name}')
+    self.model_name = model_name
+    self.batch_size = batch_size
+    self.model = SentenceTransformer(model_name)
+
+  def encode(self, texts, batch_size: int = None):
+    return self.model.encode(texts, batch_size=batch_size or self.batch_size, show_progress_bar=False)
+
+  def embed_documents(self, texts: list) -> list:
+    texts = [text.replace('\n', ' ') for text in texts]
+    return self.encode(texts).tolist()
+
+  def embed_query(self, text: str) -> list:
+    return self.embed_documents([text])[0]
+
+# process-wide registry
+engines = {}
+engines_lock = threading.Lock()
+
+def get_engine(model_name: str) -> EmbeddingsEngine:
+  with engines_lock:
+    if model_name not in engines:
+      engines[model_name] = EmbeddingsEngine(model_name)
+    return engines[model_name]
@@ -0,0 +1,187 @@
+
+import os
+import json
+import time
+import multiprocessing
+from chunker import build_chunker, splitter_settings
+
+# one chunker per worker process
+chunker = None
+
+def split_file(job):
+
+  # init
+  global chunker
+  if chunker is None:
+    chunker = build_chunker(job['splitter'])
+
+  # read
+  start = time.perf_counter()
+  try:
+    with open(job['path']) as f:
+      content = f.read()
+    cues = None
+    if job.get('cues_path') and os.path.exists(job['cues_path']):
+      with open(job['cues_path']) as f:
+        cues = json.load(f)
+  except Exception as e:
+    return job, None, 0, 0, e
+  read_time = time.perf_counter() - start
+
+  # split
+  start = time.perf_counter()
+  try:
+    chunks = chunker.split(content, cues)
+  except Exception as e:
+    return job, None, read_time, 0, e
+  split_time = time.perf_counter() - start
+
+  # done
+  return job, chunks, read_time, split_time, None
+
+class StageStats:
+
+  def __init__(self, name):
+    self.name = name
+    self.items = 0
+    self.chunks = 0
+    self.elapsed = 0.0
+
+  def add(self, items, chunks, elapsed):
+    self.items += items
+    self.chunks += chunks
+    self.elapsed += elapsed
+
+  def chunks_per_sec(self):
+    return None if self.elapsed == 0 else round(self.chunks / self.elapsed, 2)
+
+  def __str__(self):
+    return f'{self.name}: {self.items} items, {self.chunks} chunks in {self.elapsed:.2f}s ({self.chunks_per_sec()} chunks/sec)'
+
+class IngestPipeline:
+
+  def __init__(self, loader, config):
+    self.loader = loader
+    self.splitter = splitter_settings(config)
+    self.batch_size = config.loader_batch_size()
+    self.workers = config.loader_workers() or os.cpu_count() or 1
+    self.persist_every = config.loader_persist_every()
+    self.on_batch = None
+    self.reset()
+
+  def reset(self):
+    self.stats = { name: StageStats(name) for name in ['read', 'split', 'embed', 'insert'] }
+    self.batches = 0
+    self.errors = 0
+    self.elapsed = 0
+
+  def run(self, jobs) -> None:
+
+    # init
+    self.reset()
+    start = time.perf_counter()
+    print(f'[loader] processing {len(jobs)} files with {self.workers} workers and batch size {self.batch_size}')
+    for job in jobs:
+      job['splitter'] = self.splitter
+
+    # batch accumulator
+    batch = []
+    batch_chunks = 0
+
+    # split in workers: batches always contain complete videos
+    index = 0
+    for job, chunks, read_time, split_time, error in self.__split(jobs):
+      index += 1
+      if error is not None:
+        print(f'[loader][{index}/{len(jobs)}] error processing {job["video_id"]}: {error}')
+        self.errors += 1
+        continue
+      self.stats['read'].add(1, len(chunks), read_time)
+      self.stats['split'].add(1, len(chunks), split_time)
+      batch.append((job, chunks))
+      batch_chunks += len(chunks)
+      if batch_chunks >= self.batch_size:
+        print(f'[loader][{index}/{len(jobs)}] adding batch of {batch_chunks} chunks from {len(batch)} videos...')
+        self.__flush(batch)
+        batch = []
+        batch_chunks = 0
+
+    # last batch
+    if len(batch) > 0:
+      print(f'[loader][{index}/{len(jobs)}] adding batch of {batch_chunks} chunks from {len(batch)} videos...')
+      self.__flush(batch)
+
+    # final persist
+    self.loader.persist()
+
+    # report
+    self.elapsed = time.perf_counter() - start
+    for stats in self.stats.values():
+      print(f'[loader] {stats}')
+    total_chunks = self.stats['insert'].chunks
+    print(f'[loader] total: {total_chunks} chunks in {self.elapsed:.2f}s ({round(total_chunks / self.elapsed, 2) if self.elapsed else None} chunks/sec), {self.batches} batches, {self.errors} errors')
+
+  def __split(self, jobs):
+    if self.workers <= 1 or len(jobs) <= 1:
+      for job in jobs:
+        yield split_file(job)
+      return
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(self.workers) as pool:
+      for result in pool.imap(split_file, jobs, chunksize=4):
+        yield result
+
+  def __flush(self, batch) -> None:
+
+    # flatten: chunk ids are stable across runs
+    ids = []
+    texts = []
+    metadatas = []
+    for job, chunks in batch:
+      job['chunk_ids'] = [f'{job["video_id"]}-{i}' for i in range(len(chunks))]
+      ids.extend(job['chunk_ids'])
+      texts.extend([chunk['text'] for chunk in chunks])
+      metadatas.extend([self.__chunk_metadata(job['metadata'], chunk) for chunk in chunks])
+
+    # embed
+    try:
+      start = time.perf_counter()
+      embeddings = self.loader.embed_texts(texts)
+      self.stats['embed'].add(len(batch), len(texts), time.perf_counter() - start)
+
+      # videos previously loaded without known chunk ids
+      start = time.perf_counter()
+      purge = [job['video_id'] for job, _ in batch if job.get('purge')]
+      if len(purge) > 0:
+        self.loader.delete(where={'source': {'$in': purge}})
+
+      # insert
+      self.loader.add_embeddings(texts, embeddings, metadatas, ids)
+
+      # chunks not overwritten by this run
+      stale = []
+      for job, _ in batch:
+        chunk_ids = set(job['chunk_ids'])
+        stale.extend([id for id in job.get('stale_ids', []) if id not in chunk_ids])
+      if len(stale) > 0:
+        self.loader.delete(ids=stale)
+      self.stats['insert'].add(len(batch), len(texts), time.perf_counter() - start)
+
+    except Exception as e:
+      print(f'[loader] error adding batch of {len(batch)} videos: {e}')
+      self.errors += len(batch)
+      return
+
+    # persist
+    self.batches += 1
+    if self.persist_every > 0 and self.batches % self.persist_every == 0:
+      self.loader.persist()
+
+    # notify
+    if self.on_batch is not None:
+      self.on_batch([job for job, _ in batch])
+
+  def __chunk_metadata(self, metadata, chunk):
+    # integers are stored as such by the vector store (no text columns)
+    extra = { key: chunk[key] for key in ['chunk', 'start', 'end'] if chunk.get(key) is not None }
+    return { **metadata, **extra }
@@ -0,0 +1,339 @@
+
+import re
+import json
+import math
+import time
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+
+# words: transcripts are matched case-insensitively without stemming
+TOKEN = re.compile(r'\w+')
+
+# bm25
+K1 = 1.2
+B = 0.75
+
+# postings: each add writes a segment per term (doc numbers only grow so
+# segments are sorted), segments are merged into one when persisting
+DOC_TYPE = np.uint32
+FREQ_TYPE = np.uint16
+MAX_FREQ = np.iinfo(FREQ_TYPE).max
+
+# scored postings kept in memory
+CACHE_TERMS = 20000
+
+# masks of allowed documents kept in memory (one per search filter)
+CACHE_MASKS = 32
+
+# terms found in more than this ratio of documents (mostly stop words)
+# only score documents found with rarer terms (when results stay exact)
+FREQUENT_TERM_RATIO = 0.05
+
+# rewrite postings when that many documents are deleted
+COMPACT_RATIO = 0.25
+COMPACT_MIN_DOCS = 1024
+
+def tokenize(text: str) -> list:
+  return TOKEN.findall(text.lower())
+
+class LexicalIndex:
+
+  def __init__(self, path: str):
+
+    # documents, postings and index metadata
+    self.path = path
+    self.lock = threading.RLock()
+    self.con = sqlite3.connect(path, check_same_thread=False)
+    self.con.execute('PRAGMA journal_mode=WAL')
+    self.con.execute('PRAGMA synchronous=NORMAL')
+    self.con.execute("""CREATE TABLE IF NOT EXISTS `docs` (
+      `doc` integer PRIMARY KEY,
+      `id` varchar(256) NOT NULL UNIQUE,
+      `length` int(11) NOT NULL
+    )""")
+    self.con.execute("""CREATE TABLE IF NOT EXISTS `postings` (
+      `term` varchar(256) NOT NULL,
+      `segment` int(11) NOT NULL,
+      `docs` blob NOT NULL,
+      `freqs` blob NOT NULL
+    )""")
+    self.con.execute("CREATE INDEX IF NOT EXISTS `postings_term` ON `postings` (`term`, `segment`)")
+    self.con.execute("""CREATE TABLE IF NOT EXISTS `meta` (
+      `key` varchar(32) NOT NULL PRIMARY KEY,
+      `value` text NOT NULL
+    )""")
+    self.con.commit()
+
+    # metrics
+    self.lookups = 0
+    self.elapsed = 0.0
+
+    # now load
+    self.version = None
+    self.__load()
+
+  def add(self, ids: list, texts: list) -> None:
+    if len(ids) == 0:
+      return
+    with self.lock:
+
+      # replaced chunks get a new doc number
+      self.__delete(ids)
+
+      # documents
+      tokens = [tokenize(text) for text in texts]
+      lengths = [len(words) for words in tokens]
+      first = self.__meta('next_doc', 1, int)
+      self.con.executemany("INSERT INTO docs (doc, id, length) VALUES (?, ?, ?)", zip(range(first, first + len(ids)), ids, lengths))
+      self.__set_meta('next_doc', first + len(ids))
+
+      # term frequencies of the batch: sorting by (term, doc) groups
+      # postings by term with doc numbers sorted inside each group
+      terms, term_ids = np.unique(np.array([word for words in tokens for word in words], dtype=str), return_inverse=True)
+      doc_ids = np.repeat(np.arange(first, first + len(ids), dtype=np.int64), lengths)
+      keys, freqs = np.unique(term_ids.astype(np.int64) * (first + len(ids)) + doc_ids, return_counts=True)
+      docs = (keys % (first + len(ids))).astype(DOC_TYPE)
+      freqs = np.minimum(freqs, MAX_FREQ).astype(FREQ_TYPE)
+      bounds = np.searchsorted(keys // (first + len(ids)), np.arange(len(terms) + 1))
+
+      # new segment: existing postings are not read
+      segment = self.__meta('segment', 0, int) + 1
+      self.con.executemany("INSERT INTO postings VALUES (?, ?, ?, ?)", [(
+        term, segment,
+        docs[bounds[i]:bounds[i + 1]].tobytes(),
+        freqs[bounds[i]:bounds[i + 1]].tobytes(),
+      ) for i, term in enumerate(terms.tolist())])
+      self.__set_meta('segment', segment)
+      self.con.commit()
+
+  def delete(self, ids: list) -> None:
+
+    if len(ids) == 0:
+      return
+    with self.lock:
+      self.__delete(ids)
+      self.con.commit()
+
+  def clear(self) -> None:
+    with self.lock:
+      self.con.execute("DELETE FROM docs")
+      self.con.execute("DELETE FROM postings")
+      self.__set_meta('deleted', 0)
+      self.con.commit()
+
+  def count(self) -> int:
+    with self.lock:
+      return self.con.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+  def persist(self) -> None:
+    with self.lock:
+
+      # merge segments and drop deleted documents if there are many
+      deleted = self.__meta('deleted', 0, int)
+      self.__merge(deleted >= COMPACT_MIN_DOCS and deleted >= (self.count() + deleted) * COMPACT_RATIO)
+
+      # publish new version to readers (including this one)
+      self.__set_meta('version', self.__meta('version', 0, int) + 1)
+      self.con.commit()
+
+  # ids restrict the search to some chunks: when ids_key is given, the mask
+  # built from them is cached until a new version is loaded and ids can be
+  # a function only called when the mask is not cached
+  def search(self, query: str, k: int = 4, ids: list = None, ids_key: str = None) -> list:
+
+    # readers pick up new versions published by the loader
+    start = time.perf_counter()
+    self.__check_reload()
+
+    with self.lock:
+
+      # scored postings of each query term
+      matches = [self.__postings(term) for term in set(tokenize(query))]
+      matches = [match for match in matches if match is not None]
+
+      # restricted to some chunks: filter postings before scoring
+      if ids is not None:
+        allowed = self.__allowed(ids, ids_key)
+        matches = [(docs[allowed[docs]], scores[allowed[docs]], upper) for docs, scores, upper in matches]
+        matches = [match for match in matches if len(match[0]) > 0]
+
+      # nothing found
+      if len(matches) == 0:
+        return self.__done(start, [])
+
+      # rare terms first
+      matches.sort(key=lambda match: len(match[0]))
+      frequent = self.documents * FREQUENT_TERM_RATIO
+      rare = max(1, sum(1 for docs, _, _ in matches if len(docs) <= frequent))
+
+      # candidates from rare terms, then scored with frequent terms. documents
+      # only containing frequent terms cannot score more than the sum of their
+      # upper bounds: if the k-th candidate does, results are exact
+      docs, scores = self.__accumulate(matches[:rare])
+      if rare < len(matches):
+        for term_docs, term_scores, _ in matches[rare:]:
+          positions = np.minimum(np.searchsorted(term_docs, docs), len(term_docs) - 1)
+          found = term_docs[positions] == docs
+          scores[found] += term_scores[positions[found]]
+        bound = sum(upper for _, _, upper in matches[rare:])
+        if len(docs) < k or np.partition(scores, len(docs) - k)[len(docs) - k] < bound:
+          docs, scores = self.__accumulate(matches)
+
+      # top k
+      k = min(k, len(docs))
+      top = np.argpartition(-scores, k - 1)[:k] if k < len(docs) else np.arange(len(docs))
+      top = top[np.argsort(-scores[top])]
+      return self.__done(start, [(self.ids[docs[i]], float(scores[i])) for i in top])
+
+  def stats(self) -> dict:
+    with self.lock:
+      return {
+        'documents': self.documents,
+        'version': self.version,
+        'cached_terms': len(self.cache),
+        'cached_filters': len(self.masks),
+        'lookups': self.lookups,
+        'avg_lookup_us': None if self.lookups == 0 else round(self.elapsed / self.lookups * 1e6, 1),
+      }
+
+  def published_version(self) -> int:
+    # last version persisted by the loader (not necessarily loaded yet)
+    with self.lock:
+      return self.__meta('version', None, int)
+
+  def __allowed(self, ids, ids_key) -> np.ndarray:
+
+    # cached
+    if ids_key is not None and ids_key in self.masks:
+      self.masks.move_to_end(ids_key)
+      return self.masks[ids_key]
+
+    # build
+    allowed = np.zeros(len(self.lengths), dtype=bool)
+    allowed[[self.doc_of[id] for id in (ids() if callable(ids) else ids) if id in self.doc_of]] = True
+    if ids_key is not None:
+      self.masks[ids_key] = allowed
+      while len(self.masks) > CACHE_MASKS:
+        self.masks.popitem(last=False)
+    return allowed
+
+  def __accumulate(self, matches) -> tuple:
+
+    # sum scores per document in reusable buffers
+    if len(matches) == 1:
+      return matches[0][0], matches[0][1].copy()
+    for docs, scores, _ in matches:
+      self.scores[docs] += scores
+      self.touched[docs] = True
+    docs = np.flatnonzero(self.touched)
+    scores = self.scores[docs]
+    self.scores[docs] = 0
+    self.touched[docs] = False
+    return docs, scores
+
+  def __done(self, start, results) -> list:
+    self.lookups += 1
+    self.elapsed += time.perf_counter() - start
+    return results
+
+  def __delete(self, ids: list) -> None:
+    # postings are cleaned up at compaction
+    deleted = self.con.execute("DELETE FROM docs WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(list(ids)),)).rowcount
+    if deleted > 0:
+      self.__set_meta('deleted', self.__meta('deleted', 0, int) + deleted)
+
+  def __postings(self, term):
+
+    # cached
+    if term in self.cache:
+      self.cache.move_to_end(term)
+      return self.cache[term]
+
+    # read and drop deleted documents (or added after last load)
+    rows = self.con.execute("SELECT docs, freqs FROM postings WHERE term=? ORDER BY segment", (term,)).fetchall()
+    result = None
+    if len(rows) > 0:
+      docs = np.frombuffer(b''.join(row[0] for row in rows), dtype=DOC_TYPE)
+      freqs = np.frombuffer(b''.join(row[1] for row in rows), dtype=FREQ_TYPE).astype(np.float32)
+      keep = docs < len(self.lengths)
+      docs, freqs = docs[keep], freqs[keep]
+      keep = self.lengths[docs] > 0
+      docs, freqs = docs[keep], freqs[keep]
+
+      # bm25 contribution of this term to each document
+      if len(docs) > 0:
+        idf = math.log(1 + (self.documents - len(docs) + 0.5) / (len(docs) + 0.5))
+        norms = K1 * (1 - B + B * self.lengths[docs] / self.average_length)
+        scores = idf * freqs * (K1 + 1) / (freqs + norms)
+        result = (docs, scores, float(scores.max()))
+
+    # cache (misses too)
+    self.cache[term] = result
+    if len(self.cache) > CACHE_TERMS:
+      self.cache.popitem(last=False)
+    return result
+
+  def __merge(self, compact: bool) -> None:
+
+    # terms with several segments (all terms when compacting)
+    if compact:
+      print(f'[lexical] compacting postings of {self.count()} documents')
+      terms = [term for term, in self.con.execute("SELECT DISTINCT term FROM postings")]
+      alive = self.__alive_docs()
+    else:
+      terms = [term for term, in self.con.execute("SELECT term FROM postings GROUP BY term HAVING COUNT(*) > 1")]
+
+    # rewrite as a single segment
+    for term in terms:
+      rows = self.con.execute("SELECT docs, freqs FROM postings WHERE term=? ORDER BY segment", (term,)).fetchall()
+      docs = np.frombuffer(b''.join(row[0] for row in rows), dtype=DOC_TYPE)
+      freqs = np.frombuffer(b''.join(row[1] for row in rows), dtype=FREQ_TYPE)
+      if compact:
+        keep = alive[docs]
+        docs, freqs = docs[keep], freqs[keep]
+      self.con.execute("DELETE FROM postings WHERE term=?", (term,))
+      if len(docs) > 0:
+        self.con.execute("INSERT INTO postings VALUES (?, 0, ?, ?)", (term, docs.tobytes(), freqs.tobytes()))
+    if compact:
+      self.__set_meta('deleted', 0)
+
+  def __alive_docs(self) -> np.ndarray:
+    alive = np.zeros(self.__meta('next_doc', 1, int), dtype=bool)
+    for doc, in self.con.execute("SELECT doc FROM docs"):
+      alive[doc] = True
+    return alive
+
+  def __check_reload(self) -> None:
+    with self.lock:
+      version = self.__meta('version')
+      if version is not None and int(version) != self.version:
+        self.__load()
+
+  def __load(self) -> None:
+
+    # documents: lengths (0 when deleted) and ids indexed by doc number
+    self.version = self.__meta('version', None, int)
+    rows = self.con.execute("SELECT doc, id, length FROM docs").fetchall()
+    size = max((doc for doc, _, _ in rows), default=0) + 1
+    self.lengths = np.zeros(size, dtype=np.float32)
+    self.ids = [None] * size
+    self.doc_of = {}
+    for doc, id, length in rows:
+      self.lengths[doc] = max(length, 1)
+      self.ids[doc] = id
+      self.doc_of[id] = doc
+    self.documents = len(rows)
+    self.average_length = float(self.lengths.sum()) / max(self.documents, 1)
+    self.scores = np.zeros(size, dtype=np.float32)
+    self.touched = np.zeros(size, dtype=bool)
+    self.cache = OrderedDict()
+    self.masks = OrderedDict()
+
+  def __meta(self, key, default=None, cast=str):
+    row = self.con.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+    return default if row is None else cast(row[0])
+
+  def __set_meta(self, key, value) -> None:
+    self.con.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
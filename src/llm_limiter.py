@@ -0,0 +1,59 @@
+
+import threading
+from contextlib import contextmanager
+
+class LLMLimiter:
+
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.semaphores = {}
+    self.limits = {}
+    self.active = {}
+    self.waiting = {}
+
+  def configure(self, backend: str, limit: int) -> None:
+    with self.lock:
+      if self.limits.get(backend) == limit:
+        return
+      self.limits[backend] = limit
+      self.semaphores[backend] = threading.BoundedSemaphore(limit) if limit > 0 else None
+      self.active.setdefault(backend, 0)
+      self.waiting.setdefault(backend, 0)
+
+  @contextmanager
+  def slot(self, backend: str):
+
+    # unlimited
+    semaphore = self.semaphores.get(backend)
+    if semaphore is None:
+      yield
+      return
+
+    # queue
+    with self.lock:
+      self.waiting[backend] += 1
+      if self.active[backend] >= self.limits[backend]:
+        print(f'[limiter] waiting for {backend} slot ({self.waiting[backend]} waiting)')
+    semaphore.acquire()
+    with self.lock:
+      self.waiting[backend] -= 1
+      self.active[backend] += 1
+
+    # run
+    try:
+      yield
+    finally:
+      with self.lock:
+        self.active[backend] -= 1
+      semaphore.release()
+
+  def stats(self) -> dict:
+    with self.lock:
+      return { backend: {
+        'limit': self.limits[backend],
+        'active': self.active[backend],
+        'waiting': self.waiting[backend],
+      } for backend in self.limits }
+
+# process-wide limiter
+limiter = LLMLimiter()
@@ -0,0 +1,107 @@
+
+import os
+import json
+import sqlite3
+import hashlib
+import utils
+
+class IngestManifest:
+
+  def __init__(self, path):
+    self.path = path
+    self.is_new = not os.path.exists(path)
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+      os.makedirs(folder)
+    self.con = sqlite3.connect(path)
+    self.con.execute("""CREATE TABLE IF NOT EXISTS `videos` (
+      `video_id` varchar(32) NOT NULL PRIMARY KEY,
+      `filename` varchar(256) NOT NULL,
+      `hash` varchar(64) NOT NULL,
+      `splitter` text NOT NULL,
+      `embeddings_model` varchar(256) NOT NULL,
+      `chunk_ids` text NOT NULL,
+      `updated_at` datetime NOT NULL,
+      `metadata` varchar(64) NOT NULL DEFAULT ''
+    )""")
+
+    self.con.execute("""CREATE TABLE IF NOT EXISTS `meta` (
+      `key` varchar(32) NOT NULL PRIMARY KEY,
+      `value` text NOT NULL
+    )""")
+
+    # manifests created before video metadata was tracked
+    columns = [row[1] for row in self.con.execute("PRAGMA table_info(videos)")]
+    if 'metadata' not in columns:
+      self.con.execute("ALTER TABLE videos ADD COLUMN `metadata` varchar(64) NOT NULL DEFAULT ''")
+    self.con.commit()
+
+  def get(self, video_id):
+    cursor = self.con.cursor()
+    cursor.execute("SELECT * FROM videos WHERE video_id=?", (video_id,))
+    return self.__row_to_entry(cursor.fetchone())
+
+  def get_all(self):
+    cursor = self.con.cursor()
+    cursor.execute("SELECT * FROM videos")
+    return { row[0]: self.__row_to_entry(row) for row in cursor.fetchall() }
+
+  def set_many(self, entries):
+    rows = [(
+      entry['video_id'],
+      entry['filename'],
+      entry['hash'],
+      entry['splitter'],
+      entry['embeddings_model'],
+      json.dumps(entry['chunk_ids']),
+      utils.now(),
+      entry['metadata'],
+    ) for entry in entries ]
+    self.con.executemany("INSERT OR REPLACE INTO videos VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    self.con.commit()
+
+  def delete_many(self, video_ids):
+    self.con.executemany("DELETE FROM videos WHERE video_id=?", [(video_id,) for video_id in video_ids])
+    self.con.commit()
+
+  def is_current(self, entry, hash, splitter, embeddings_model):
+    return entry is not None and entry['hash'] == hash and entry['splitter'] == splitter and entry['embeddings_model'] == embeddings_model
+
+  # set when the manifest is created on top of an existing database: videos
+  # not found in the manifest may have legacy chunks until a full load completes
+  def migration_pending(self):
+    row = self.con.execute("SELECT value FROM meta WHERE key='migration_pending'").fetchone()
+    return row is not None and row[0] == '1'
+
+  def set_migration_pending(self, pending):
+    self.con.execute("INSERT OR REPLACE INTO meta VALUES ('migration_pending', ?)", ('1' if pending else '0',))
+    self.con.commit()
+
+  def close(self):
+    self.con.close()
+
+  def __row_to_entry(self, row):
+    return None if row is None else {
+      'video_id': row[0],
+      'filename': row[1],
+      'hash': row[2],
+      'splitter': row[3],
+      'embeddings_model': row[4],
+      'chunk_ids': json.loads(row[5]),
+      'updated_at': row[6],
+      'metadata': row[7],
+    }
+
+def hash_metadata(metadata):
+  return hashlib.sha1(json.dumps(metadata, sort_keys=True).encode()).hexdigest()
+
+def hash_file(path, *extra_paths):
+  # extra files are optional (derived data like cue timings)
+  hash = hashlib.sha1()
+  with open(path, 'rb') as f:
+    hash.update(f.read())
+  for extra_path in extra_paths:
+    if os.path.exists(extra_path):
+      with open(extra_path, 'rb') as f:
+        hash.update(f.read())
+  return hash.hexdigest()
@@ -0,0 +1,40 @@
+
+import numpy as np
+
+def maximal_marginal_relevance(query_embedding, embeddings, k: int = 4, lambda_mult: float = 0.5) -> list:
+
+  # nothing to select
+  embeddings = np.asarray(embeddings, dtype=np.float32)
+  count = len(embeddings)
+  k = min(k, count)
+  if k <= 0:
+    return []
+
+  # cosine similarities: to the query and between candidates (computed once)
+  norms = np.linalg.norm(embeddings, axis=1)
+  norms[norms == 0] = 1
+  embeddings = embeddings / norms[:, None]
+  query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+  query = query / (np.linalg.norm(query) or 1)
+  relevance = lambda_mult * (embeddings @ query)
+  similarities = embeddings @ embeddings.T
+
+  # most relevant first
+  best = int(np.argmax(relevance))
+  selected = [best]
+
+  # then trade relevance for diversity: redundancy of each candidate
+  # is its max similarity to the selected ones, updated incrementally
+  redundancy = similarities[best].copy()
+  available = np.ones(count, dtype=bool)
+  available[best] = False
+  while len(selected) < k:
+    scores = relevance - (1 - lambda_mult) * redundancy
+    scores[~available] = -np.inf
+    best = int(np.argmax(scores))
+    selected.append(best)
+    available[best] = False
+    np.maximum(redundancy, similarities[best], out=redundancy)
+
+  # done
+  return selected
@@ -0,0 +1,122 @@
+
+import time
+import threading
+import requests
+import numpy as np
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+
+class OllamaEmbeddingsClient(Embeddings):
+
+  def __init__(self, base_url: str, model: str, batch_size: int = 64, concurrency: int = 4, timeout: float = 300):
+    self.base_url = base_url.rstrip('/')
+    self.model = model
+    self.batch_size = max(1, batch_size)
+    self.concurrency = max(1, concurrency)
+    self.timeout = timeout
+
+    # keep-alive connections: as many as in-flight requests
+    self.session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+    self.session.mount('http://', adapter)
+    self.session.mount('https://', adapter)
+    self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ollama-embed')
+
+    # /api/embed (batch) appeared in ollama 0.2: older servers only have /api/embeddings
+    self.batch_supported = None
+
+    # metrics
+    self.lock = threading.Lock()
+    self.requests = 0
+    self.texts = 0
+    self.errors = 0
+    self.elapsed = 0.0
+
+  def embed_documents(self, texts: list) -> list:
+    if len(texts) == 0:
+      return []
+
+    # until we know if batch endpoint is available, first batch is sent alone
+    start = time.perf_counter()
+    batches = [texts[i:i+self.batch_size] for i in range(0, len(texts), self.batch_size)]
+    embeddings = []
+    if self.batch_supported is None:
+      embeddings.extend(self.__embed_batch(batches.pop(0)))
+    for result in self.executor.map(self.__embed_batch, batches):
+      embeddings.extend(result)
+
+    # done
+    with self.lock:
+      self.texts += len(texts)
+      self.elapsed += time.perf_counter() - start
+    return embeddings
+
+  def embed_query(self, text: str) -> list:
+    return self.embed_documents([text])[0]
+
+  def stats(self) -> dict:
+    with self.lock:
+      return {
+        'model': self.model,
+        'batch_supported': self.batch_supported,
+        'requests': self.requests,
+        'texts': self.texts,
+        'errors': self.errors,
+        'elapsed': round(self.elapsed, 3),
+        'texts_per_sec': None if self.elapsed == 0 else round(self.texts / self.elapsed, 2),
+      }
+
+  def close(self) -> None:
+    self.executor.shutdown(wait=False)
+    self.session.close()
+
+  def __embed_batch(self, texts: list) -> list:
+
+    # batch endpoint: unknown routes get a plain text 404 while a missing
+    # model gets a json error (and must not disable the endpoint)
+    if self.batch_supported is not False:
+      response = self.__post('/api/embed', { 'model': self.model, 'input': texts })
+      if response.status_code == 404 and self.batch_supported is None and not self.__is_api_error(response):
+        print(f'[embeddings] {self.base_url} does not support /api/embed: embedding one text per request')
+        self.batch_supported = False
+      else:
+        self.__check(response)
+        self.batch_supported = True
+        return self.__normalize(response.json()['embeddings'])
+
+    # one request per text: still concurrent when called from the executor
+    embeddings = []
+    for text in texts:
+      response = self.__post('/api/embeddings', { 'model': self.model, 'prompt': text })
+      self.__check(response)
+      embeddings.append(response.json()['embedding'])
+    return self.__normalize(embeddings)
+
+  def __normalize(self, embeddings: list) -> list:
+    # /api/embed returns unit vectors, /api/embeddings does not: same vectors whatever the server
+    vectors = np.asarray(embeddings, dtype=np.float64)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1, norms)).tolist()
+
+  def __is_api_error(self, response: requests.Response) -> bool:
+    try:
+      return 'error' in response.json()
+    except ValueError:
+      return False
+
+  def __post(self, path: str, payload: dict) -> requests.Response:
+    with self.lock:
+      self.requests += 1
+    try:
+      return self.session.post(f'{self.base_url}{path}', json=payload, timeout=self.timeout)
+    except Exception:
+      with self.lock:
+        self.errors += 1
+      raise
+
+  def __check(self, response: requests.Response) -> None:
+    if response.status_code != 200:
+      with self.lock:
+        self.errors += 1
+      raise Exception(f'Ollama embeddings failed with status {response.status_code}: {response.text}')
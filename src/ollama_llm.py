@@ -0,0 +1,63 @@
+
+import requests
+from typing import Any, Iterator, List, Optional
+from requests.adapters import HTTPAdapter
+from langchain_community.llms import Ollama
+from langchain_community.llms.ollama import OllamaEndpointNotFoundError
+
+# keep-alive connections shared by all clients (extra concurrent
+# requests still work but their connections are not kept)
+POOL_SIZE = 16
+
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+session.mount('http://', adapter)
+session.mount('https://', adapter)
+
+class OllamaLLMClient(Ollama):
+
+  # same as langchain_community Ollama but with a shared session
+  # instead of a new connection for each generation
+  def _create_stream(self, api_url: str, payload: Any, stop: Optional[List[str]] = None, **kwargs: Any) -> Iterator[str]:
+
+    # stop words
+    if self.stop is not None and stop is not None:
+      raise ValueError('`stop` found in both the input and default params.')
+    elif self.stop is not None:
+      stop = self.stop
+
+    # options
+    params = self._default_params
+    for key in self._default_params:
+      if key in kwargs:
+        params[key] = kwargs[key]
+    if 'options' in kwargs:
+      params['options'] = kwargs['options']
+    else:
+      params['options'] = {
+        **params['options'],
+        'stop': stop,
+        **{ k: v for k, v in kwargs.items() if k not in self._default_params },
+      }
+
+    # payload
+    if payload.get('messages'):
+      request_payload = { 'messages': payload.get('messages', []), **params }
+    else:
+      request_payload = { 'prompt': payload.get('prompt'), 'images': payload.get('images', []), **params }
+
+    # now post
+    response = session.post(
+      url=api_url,
+      headers={ 'Content-Type': 'application/json', **(self.headers if isinstance(self.headers, dict) else {}) },
+      auth=getattr(self, 'auth', None),
+      json=request_payload,
+      stream=True,
+      timeout=self.timeout,
+    )
+    response.encoding = 'utf-8'
+    if response.status_code == 404:
+      raise OllamaEndpointNotFoundError(f'Ollama call failed with status code 404. Maybe your model is not found and you should pull the model with `ollama pull {self.model}`.')
+    elif response.status_code != 200:
+      raise ValueError(f'Ollama call failed with status code {response.status_code}. Details: {response.text}')
+    return response.iter_lines(decode_unicode=True)
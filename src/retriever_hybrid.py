@@ -0,0 +1,56 @@
+
+import json
+from typing import Any, Optional
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+
+class HybridRetriever(BaseRetriever):
+
+  vectorstore: Any
+  collection: Any
+  lexical: Any
+  k: int = 4
+  fetch_k: int = 20
+  rrf_k: int = 60
+  filter: Optional[dict] = None
+
+  def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list:
+
+    # both rankings (lexical search is restricted to the chunks matching the
+    # filter: they are only listed when the index does not know the filter yet)
+    if self.filter is None:
+      dense = self.vectorstore.similarity_search_with_relevance_scores(query, k=self.fetch_k)
+      lexical = self.__get_documents(self.lexical.search(query, self.fetch_k))
+    else:
+      dense = self.vectorstore.similarity_search_with_relevance_scores(query, k=self.fetch_k, filter=self.filter)
+      ids = lambda: self.collection.get(where=self.filter, include=[])['ids']
+      lexical = self.__get_documents(self.lexical.search(query, self.fetch_k, ids, json.dumps(self.filter, sort_keys=True)))
+
+    # dense results keep their relevance score
+    for doc, score in dense:
+      doc.metadata['score'] = score
+    dense = [doc for doc, _ in dense]
+
+    # reciprocal rank fusion: chunks are identified by video and content
+    # as dense results do not carry the chunk id
+    fused = {}
+    for ranking in [dense, lexical]:
+      for rank, doc in enumerate(ranking):
+        key = (doc.metadata.get('source'), doc.page_content)
+        entry = fused.setdefault(key, [doc, 0.0])
+        entry[1] += 1.0 / (self.rrf_k + rank + 1)
+
+    # keep fused score with document so that it ends up in traces
+    # (not as score: it is not comparable with relevance scores)
+    results = sorted(fused.values(), key=lambda entry: entry[1], reverse=True)[:self.k]
+    for doc, rrf in results:
+      doc.metadata['rrf'] = rrf
+    return [doc for doc, _ in results]
+
+  def __get_documents(self, hits: list) -> list:
+    if len(hits) == 0:
+      return []
+    results = self.collection.get(ids=[id for id, _ in hits], include=['documents', 'metadatas'])
+    found = { id: (document, metadata) for id, document, metadata in zip(results['ids'], results['documents'], results['metadatas']) }
+    return [Document(page_content=found[id][0], metadata={ **(found[id][1] or {}), 'bm25': score }) for id, score in hits if id in found]
@@ -0,0 +1,53 @@
+
+from mmr import maximal_marginal_relevance
+from vectorstore_numpy import NumpyVectorStore
+from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStoreRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+
+class ScoredVectorStoreRetriever(VectorStoreRetriever):
+
+  def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list:
+
+    # mmr
+    if self.search_type == 'mmr':
+      docs_and_scores = self.__mmr_search(query, **self.search_kwargs)
+      if docs_and_scores is None:
+        return super()._get_relevant_documents(query, run_manager=run_manager)
+
+    # similarity and similarity_score_threshold
+    else:
+      docs_and_scores = self.vectorstore.similarity_search_with_relevance_scores(query, **self.search_kwargs)
+
+    # keep score with document so that it ends up in traces
+    for doc, score in docs_and_scores:
+      doc.metadata['score'] = score
+    return [doc for doc, _ in docs_and_scores]
+
+  def __mmr_search(self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, filter: dict = None, **kwargs) -> list:
+
+    # candidates with their embeddings and relevance to the query
+    embedding = self.vectorstore.embeddings.embed_query(query)
+    if isinstance(self.vectorstore, NumpyVectorStore):
+      documents, vectors, scores = self.vectorstore.mmr_candidates(embedding, fetch_k, filter)
+    elif isinstance(self.vectorstore, Chroma):
+      documents, vectors, scores = self.__chroma_candidates(embedding, fetch_k, filter)
+    else:
+      return None
+
+    # now select
+    selected = maximal_marginal_relevance(embedding, vectors, k=k, lambda_mult=lambda_mult)
+    return [(documents[i], scores[i]) for i in selected]
+
+  def __chroma_candidates(self, embedding: list, fetch_k: int, filter: dict) -> tuple:
+    results = self.vectorstore._collection.query(
+      query_embeddings=[embedding],
+      n_results=fetch_k,
+      where=filter or None,
+      include=['documents', 'metadatas', 'distances', 'embeddings'],
+    )
+    relevance_score_fn = self.vectorstore._select_relevance_score_fn()
+    documents = [Document(page_content=document, metadata=metadata or {}) for document, metadata in zip(results['documents'][0], results['metadatas'][0])]
+    scores = [relevance_score_fn(distance) for distance in results['distances'][0]]
+    return documents, results['embeddings'][0], scores
@@ -0,0 +1,62 @@
+
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler, make_server
+from bottle import ServerAdapter
+
+# how bottle server adapters name their thread count option
+THREADS_OPTION = {
+  'waitress': 'threads',
+  'cheroot': 'numthreads',
+  'paste': 'threadpool_workers',
+}
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+
+  daemon_threads = True
+  pool = None
+
+  def process_request(self, request, client_address):
+    self.pool.submit(self.process_request_thread, request, client_address)
+
+class ThreadedServer(ServerAdapter):
+
+  def run(self, app):
+
+    # bounded pool of request threads
+    threads = self.options.get('threads', 8)
+    quiet = self.quiet
+    class Server(PooledWSGIServer):
+      pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+
+    class Handler(WSGIRequestHandler):
+      def address_string(self):
+        return self.client_address[0]
+      def log_request(self, *args, **kwargs):
+        if not quiet:
+          return WSGIRequestHandler.log_request(self, *args, **kwargs)
+
+    # now serve
+    print(f'[server] serving on {self.host}:{self.port} with {threads} threads')
+    self.srv = make_server(self.host, self.port, app, Server, Handler)
+    try:
+      self.srv.serve_forever()
+    finally:
+      self.srv.server_close()
+      Server.pool.shutdown(wait=False)
+
+def run(app, config):
+  server = config.server()
+  options = {}
+  if server == 'threaded':
+    server = ThreadedServer
+    options['threads'] = config.server_threads()
+  elif server in THREADS_OPTION:
+    options[THREADS_OPTION[server]] = config.server_threads()
+  app.run(
+    server=server,
+    host=config.server_host(),
+    port=config.server_port(),
+    debug=config.debug() or server == 'wsgiref',
+    **options
+  )
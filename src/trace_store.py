@@ -0,0 +1,135 @@
+
+import json
+import zlib
+import struct
+import hashlib
+
+# header: magic, format version, dictionary id
+MAGIC = b'RYT'
+VERSION = 1
+HEADER = struct.Struct('>3sBI')
+
+# long strings are split in paragraphs (stuffed prompts are context
+# documents joined by blank lines) and long paragraphs are stored once
+SEGMENT_SEPARATOR = '\n\n'
+SEGMENT_MIN_LENGTH = 256
+SEGMENTS_KEY = '$segments'
+REF_KEY = '$ref'
+
+# zlib preset dictionaries are limited to 32KB
+DICTIONARY_SIZE = 32 * 1024
+
+class TraceStore:
+
+  def __init__(self):
+    self.dictionaries = {}
+    self.current = None
+
+  def add_dictionary(self, id: int, content: bytes) -> None:
+    self.dictionaries[id] = content
+    if self.current is None or id > self.current:
+      self.current = id
+
+  def train(self, samples: list) -> bytes:
+
+    # skeletons of existing traces are very repetitive (keys, reprs, parameters)
+    content = b''
+    for sample in samples:
+      skeleton, _ = self.__split(sample)
+      content += json.dumps(skeleton, separators=(',', ':')).encode()
+      if len(content) >= DICTIONARY_SIZE:
+        break
+
+    # most useful content should be at the end
+    return content[-DICTIONARY_SIZE:]
+
+  def is_packed(self, blob) -> bool:
+    return isinstance(blob, bytes) and blob[:len(MAGIC)] == MAGIC
+
+  def pack(self, trace) -> tuple:
+    skeleton, segments = self.__split(trace)
+    data = json.dumps(skeleton, separators=(',', ':')).encode()
+    dictionary_id = self.current or 0
+    blob = HEADER.pack(MAGIC, VERSION, dictionary_id) + self.__compress(data, self.dictionaries.get(dictionary_id))
+    return blob, { hash: self.__compress(text.encode()) for hash, text in segments.items() }
+
+  def refs(self, blob) -> list:
+    if not self.is_packed(blob):
+      return []
+    refs = []
+    self.__collect_refs(self.__load_skeleton(blob), refs)
+    return refs
+
+  def unpack(self, blob, get_segments):
+
+    # legacy json
+    if blob is None:
+      return None
+    if not self.is_packed(blob):
+      return json.loads(blob)
+
+    # skeleton and segments
+    skeleton = self.__load_skeleton(blob)
+    refs = []
+    self.__collect_refs(skeleton, refs)
+    segments = get_segments(list(set(refs))) if len(refs) > 0 else {}
+    segments = { hash: self.__decompress(content).decode() for hash, content in segments.items() }
+    return self.__join(skeleton, segments)
+
+  def __load_skeleton(self, blob):
+    _, version, dictionary_id = HEADER.unpack(blob[:HEADER.size])
+    if version != VERSION:
+      raise Exception(f'Unknown trace format version {version}')
+    if dictionary_id != 0 and dictionary_id not in self.dictionaries:
+      raise Exception(f'Unknown trace dictionary {dictionary_id}')
+    return json.loads(self.__decompress(blob[HEADER.size:], self.dictionaries.get(dictionary_id)))
+
+  # segments are plain text (captions): they are compressed without dictionary
+  def __compress(self, data: bytes, dictionary: bytes = None) -> bytes:
+    compressor = zlib.compressobj(level=9, zdict=dictionary) if dictionary else zlib.compressobj(level=9)
+    return compressor.compress(data) + compressor.flush()
+
+  def __decompress(self, data: bytes, dictionary: bytes = None) -> bytes:
+    decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+    return decompressor.decompress(data) + decompressor.flush()
+
+  def __split(self, value, segments=None):
+    if segments is None:
+      segments = {}
+    if isinstance(value, dict):
+      return { k: self.__split(v, segments)[0] for k, v in value.items() }, segments
+    if isinstance(value, (list, tuple)):
+      return [ self.__split(v, segments)[0] for v in value ], segments
+    if isinstance(value, str) and len(value) >= SEGMENT_MIN_LENGTH:
+      parts = []
+      for part in value.split(SEGMENT_SEPARATOR):
+        if len(part) >= SEGMENT_MIN_LENGTH:
+          hash = hashlib.sha1(part.encode()).hexdigest()
+          segments[hash] = part
+          parts.append({ REF_KEY: hash })
+        else:
+          parts.append(part)
+      return { SEGMENTS_KEY: parts }, segments
+    return value, segments
+
+  def __collect_refs(self, value, refs):
+    if isinstance(value, dict):
+      if REF_KEY in value:
+        refs.append(value[REF_KEY])
+      for v in value.values():
+        self.__collect_refs(v, refs)
+    elif isinstance(value, list):
+      for v in value:
+        self.__collect_refs(v, refs)
+
+  def __join(self, value, segments):
+    if isinstance(value, dict):
+      if SEGMENTS_KEY in value and len(value) == 1:
+        return SEGMENT_SEPARATOR.join(
+          segments[part[REF_KEY]] if isinstance(part, dict) else part
+          for part in value[SEGMENTS_KEY]
+        )
+      return { k: self.__join(v, segments) for k, v in value.items() }
+    if isinstance(value, list):
+      return [ self.__join(v, segments) for v in value ]
+    return value
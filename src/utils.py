@@ -1,21 +1,37 @@
 
 import time
 import json
+import datetime
 import consts
+import video_catalog
 
 def now():
   return int(time.time() * 1000)
   
 def get_video_info(video_id):
-  with open('videos.json') as f:
-    videos = json.load(f)
-    for video in videos:
-      if video['id']['videoId'] == video_id:
-        return video
-    return None
-
-def get_video_url(video_id):
-  return f'https://www.youtube.com/watch?v={video_id}'
+  return video_catalog.get_catalog().get(video_id)
+
+def parse_date(value, end=False):
+
+  # youtube timestamps or partial dates (start or end of the period) to unix time
+  for format, period in [('%Y-%m-%dT%H:%M:%SZ', None), ('%Y-%m-%d', 'day'), ('%Y-%m', 'month'), ('%Y', 'year')]:
+    try:
+      date = datetime.datetime.strptime(value, format).replace(tzinfo=datetime.timezone.utc)
+    except ValueError:
+      continue
+    if end and period == 'day':
+      date += datetime.timedelta(days=1)
+    elif end and period == 'month':
+      date = date.replace(year=date.year + date.month // 12, month=date.month % 12 + 1)
+    elif end and period == 'year':
+      date = date.replace(year=date.year + 1)
+    return int(date.timestamp()) - (1 if end and period is not None else 0)
+  raise Exception(f'Invalid date "{value}"')
+
+def get_video_url(video_id, start=None):
+  if start is None:
+    return f'https://www.youtube.com/watch?v={video_id}'
+  return f'https://www.youtube.com/watch?v={video_id}&t={int(start)}s'
 
 def dumpj(data, filename):
   with open(filename, 'w') as f:
@@ -0,0 +1,558 @@
+
+import os
+import json
+import math
+import uuid
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from mmr import maximal_marginal_relevance
+
+# hnswlib is optional: exact search is used without it
+try:
+  import hnswlib
+except ImportError:
+  hnswlib = None
+
+# storage types: int8 rows are scaled individually
+DTYPES = {
+  'float32': np.float32,
+  'float16': np.float16,
+  'int8': np.int8,
+}
+
+# rows scanned at once: small enough for float16/int8 conversions to stay in cache
+BLOCK_ROWS = 4096
+INITIAL_CAPACITY = 1024
+
+# where clause operators evaluated on numeric columns
+RANGE_OPERATORS = {
+  '$gt': np.greater,
+  '$gte': np.greater_equal,
+  '$lt': np.less,
+  '$lte': np.less_equal,
+}
+
+# compact the matrix when that many rows are deleted
+COMPACT_RATIO = 0.25
+COMPACT_MIN_ROWS = 1024
+
+class NumpyVectorStore(VectorStore):
+
+  def __init__(self, path: str, embedding_function: Embeddings, dtype: str = 'float32', hnsw_threshold: int = 50000, hnsw_ef: int = 128):
+
+    # check
+    if dtype not in DTYPES:
+      raise Exception(f'Unknown vector store dtype "{dtype}" not in {", ".join(DTYPES.keys())}')
+
+    # init
+    self.path = path
+    self.embedding_function = embedding_function
+    self.dtype = dtype
+    self.hnsw_threshold = hnsw_threshold
+    self.hnsw_ef = hnsw_ef
+    self.lock = threading.RLock()
+    self.stale_paths = []
+    if not os.path.exists(path):
+      os.makedirs(path)
+
+    # chunks and store metadata
+    self.con = sqlite3.connect(os.path.join(path, 'store.db'), check_same_thread=False)
+    self.con.execute("""CREATE TABLE IF NOT EXISTS `chunks` (
+      `row` int(11) NOT NULL PRIMARY KEY,
+      `id` varchar(256) NOT NULL UNIQUE,
+      `document` text NOT NULL,
+      `metadata` text NOT NULL
+    )""")
+    self.con.execute("""CREATE TABLE IF NOT EXISTS `meta` (
+      `key` varchar(32) NOT NULL PRIMARY KEY,
+      `value` text NOT NULL
+    )""")
+    self.con.commit()
+
+    # now load
+    self.version = None
+    self.__load()
+
+  @property
+  def embeddings(self) -> Embeddings:
+    return self.embedding_function
+
+  @classmethod
+  def from_texts(cls, texts, embedding, metadatas=None, ids=None, path=None, **kwargs):
+    store = cls(path, embedding, **kwargs)
+    store.add_texts(texts, metadatas, ids)
+    return store
+
+  def add_texts(self, texts, metadatas=None, ids=None, **kwargs) -> list:
+    texts = list(texts)
+    ids = ids or [str(uuid.uuid4()) for _ in texts]
+    metadatas = metadatas or [{} for _ in texts]
+    self.upsert(ids=ids, embeddings=self.embedding_function.embed_documents(texts), metadatas=metadatas, documents=texts)
+    return ids
+
+  def upsert(self, ids, embeddings, metadatas, documents) -> None:
+
+    # normalized once: search is then a dot product
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if len(vectors) == 0:
+      return
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+
+    with self.lock:
+
+      # first vectors give dimension
+      if self.dim is None:
+        self.dim = vectors.shape[1]
+        self.__set_meta('dim', self.dim)
+        self.__set_meta('dtype', self.dtype)
+        self.__open(INITIAL_CAPACITY)
+      elif vectors.shape[1] != self.dim:
+        raise Exception(f'Embeddings dimension mismatch: {vectors.shape[1]} != {self.dim}')
+
+      # existing ids are overwritten in place
+      rows = []
+      for id in ids:
+        row = self.row_of.get(id)
+        if row is None:
+          row = self.rows
+          self.rows += 1
+          self.ids.append(None)
+          self.metadatas.append(None)
+        rows.append(row)
+      self.__ensure_capacity(self.rows)
+
+      # write
+      self.__write_vectors(np.array(rows), vectors)
+      for row, id, metadata in zip(rows, ids, metadatas):
+        self.ids[row] = id
+        self.metadatas[row] = metadata
+        self.row_of[id] = row
+        self.alive[row] = True
+      self.con.execute("DELETE FROM chunks WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(list(ids)),))
+      self.con.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", [
+        (row, id, document, json.dumps(metadata)) for row, id, document, metadata in zip(rows, ids, documents, metadatas)
+      ])
+      self.__set_meta('rows', self.rows)
+      self.con.commit()
+
+      # new and overwritten rows are added to the index, columns are rebuilt when needed
+      if self.index is not None:
+        if self.capacity > self.index.get_max_elements():
+          self.index.resize_index(self.capacity)
+        rows = np.unique(rows)
+        self.index.add_items(self.__read_vectors(rows), rows)
+      self.columns = {}
+
+  def delete(self, ids=None, where=None, **kwargs) -> None:
+    with self.lock:
+      rows = set(self.row_of[id] for id in ids or [] if id in self.row_of)
+      if where is not None:
+        rows.update(np.nonzero(self.alive[:self.rows] & self.__filter_mask(where))[0].tolist())
+      if len(rows) == 0:
+        return
+      for row in rows:
+        del self.row_of[self.ids[row]]
+        self.ids[row] = None
+        self.metadatas[row] = None
+        self.alive[row] = False
+        if self.index is not None:
+          self.index.mark_deleted(row)
+      self.con.executemany("DELETE FROM chunks WHERE row=?", [(row,) for row in rows])
+      self.con.commit()
+      self.columns = {}
+
+  # same as chroma collection update (metadata only)
+  def update(self, ids, metadatas=None, **kwargs) -> None:
+    if metadatas is None:
+      return
+    with self.lock:
+      updates = [(row, metadata) for row, metadata in ((self.row_of.get(id), metadata) for id, metadata in zip(ids, metadatas)) if row is not None]
+      for row, metadata in updates:
+        self.metadatas[row] = metadata
+      self.con.executemany("UPDATE chunks SET metadata=? WHERE row=?", [(json.dumps(metadata), row) for row, metadata in updates])
+      self.con.commit()
+      self.columns = {}
+
+  def count(self) -> int:
+    return len(self.row_of)
+
+  # same as chroma collection get: ids, documents and metadatas in row order
+  def get(self, ids=None, where=None, limit=None, offset=None, include=None) -> dict:
+    include = ['documents', 'metadatas'] if include is None else include
+    with self.lock:
+      if ids is not None:
+        rows = sorted(self.row_of[id] for id in ids if id in self.row_of)
+      else:
+        mask = self.alive[:self.rows] if where is None else self.alive[:self.rows] & self.__filter_mask(where)
+        rows = np.nonzero(mask)[0].tolist()
+      rows = rows[offset or 0:None if limit is None else (offset or 0) + limit]
+      documents = self.__get_documents(rows) if 'documents' in include or 'metadatas' in include else []
+    return {
+      'ids': [self.ids[row] for row in rows],
+      'documents': [doc.page_content for doc in documents] if 'documents' in include else None,
+      'metadatas': [doc.metadata for doc in documents] if 'metadatas' in include else None,
+    }
+
+  def persist(self) -> None:
+    with self.lock:
+      if self.vectors is None:
+        return
+
+      # compact if many rows were deleted
+      dead = self.rows - len(self.row_of)
+      if dead >= COMPACT_MIN_ROWS and dead >= self.rows * COMPACT_RATIO:
+        self.__compact()
+
+      # flush and publish new version to readers
+      self.vectors.flush()
+      if self.scales is not None:
+        self.scales.flush()
+      self.version = (self.version or 0) + 1
+      self.__build_index()
+      if self.index is not None:
+        self.index.save_index(os.path.join(self.path, 'index.hnsw'))
+        self.__set_meta('index_version', self.version)
+      self.__set_meta('version', self.version)
+      self.con.commit()
+
+      # files replaced by compaction: readers switch with the version
+      for path in self.stale_paths:
+        try:
+          os.remove(path)
+        except OSError:
+          pass
+      self.stale_paths = []
+
+  def similarity_search(self, query: str, k: int = 4, filter: dict = None, **kwargs) -> list:
+    return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+  def similarity_search_by_vector(self, embedding: list, k: int = 4, filter: dict = None, **kwargs) -> list:
+    return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+  def similarity_search_with_score(self, query: str, k: int = 4, filter: dict = None, **kwargs) -> list:
+    return self.similarity_search_by_vector_with_score(self.embedding_function.embed_query(query), k, filter)
+
+  # scores are cosine similarities
+  def similarity_search_by_vector_with_score(self, embedding: list, k: int = 4, filter: dict = None) -> list:
+    rows, scores = self.__search(embedding, k, filter)
+    return list(zip(self.__get_documents(rows), scores.tolist()))
+
+  def _similarity_search_with_relevance_scores(self, query: str, k: int = 4, filter: dict = None, **kwargs) -> list:
+    docs_and_scores = self.similarity_search_with_score(query, k, filter)
+    return [(doc, relevance_score(score)) for doc, score in docs_and_scores]
+
+  def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, filter: dict = None, **kwargs) -> list:
+    embedding = self.embedding_function.embed_query(query)
+    return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, filter)
+
+  def max_marginal_relevance_search_by_vector(self, embedding: list, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, filter: dict = None, **kwargs) -> list:
+    documents, vectors, _ = self.mmr_candidates(embedding, fetch_k, filter)
+    selected = maximal_marginal_relevance(embedding, vectors, k=k, lambda_mult=lambda_mult)
+    return [documents[i] for i in selected]
+
+  # documents, vectors and relevance scores of the fetch_k nearest chunks
+  def mmr_candidates(self, embedding: list, fetch_k: int, filter: dict = None) -> tuple:
+    rows, scores = self.__search(embedding, fetch_k, filter)
+    if len(rows) == 0:
+      return [], np.empty((0, self.dim or 0), dtype=np.float32), []
+    with self.lock:
+      return self.__get_documents(rows), self.__read_vectors(rows), [relevance_score(score) for score in scores.tolist()]
+
+  def stats(self) -> dict:
+    with self.lock:
+      return {
+        'backend': 'numpy',
+        'dtype': self.dtype,
+        'dim': self.dim,
+        'rows': self.rows,
+        'count': len(self.row_of),
+        'version': self.version,
+        'index': None if self.index is None else 'hnsw',
+      }
+
+  def __search(self, embedding, k, filter=None) -> tuple:
+
+    # readers pick up new versions published by the loader
+    self.__check_reload()
+    query = np.asarray(embedding, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1)
+
+    with self.lock:
+      rows = self.rows
+      if rows == 0 or len(self.row_of) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+      k = min(k, len(self.row_of))
+      mask = self.alive[:rows] if filter is None else self.alive[:rows] & self.__filter_mask(filter)
+
+      # approximate when indexed (filtered searches stay exact)
+      if filter is None and self.__build_index() is not None:
+        self.index.set_ef(max(self.hnsw_ef, k))
+        labels, distances = self.index.knn_query(query, k=k)
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+      # exact: scan in blocks and mask deleted/filtered rows
+      scores = np.empty(rows, dtype=np.float32)
+      for start in range(0, rows, BLOCK_ROWS):
+        end = min(rows, start + BLOCK_ROWS)
+        block = self.vectors[start:end]
+        if self.dtype == 'float32':
+          scores[start:end] = block @ query
+        else:
+          scores[start:end] = block.astype(np.float32) @ query
+          if self.scales is not None:
+            scores[start:end] *= self.scales[start:end]
+      scores[~mask] = -np.inf
+
+    # top k
+    k = min(k, int(mask.sum()))
+    if k == 0:
+      return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+    top = np.argpartition(-scores, k - 1)[:k] if k < rows else np.arange(rows)
+    top = top[np.argsort(-scores[top])]
+    top = top[np.isfinite(scores[top])]
+    return top, scores[top]
+
+  def __filter_mask(self, where) -> np.ndarray:
+
+    # combinations
+    mask = np.ones(self.rows, dtype=bool)
+    for key, condition in where.items():
+      if key == '$and':
+        for clause in condition:
+          mask &= self.__filter_mask(clause)
+      elif key == '$or':
+        mask &= np.logical_or.reduce([self.__filter_mask(clause) for clause in condition] or [np.zeros(self.rows, dtype=bool)])
+      else:
+        mask &= self.__field_mask(key, condition if isinstance(condition, dict) else { '$eq': condition })
+    return mask
+
+  def __field_mask(self, field, condition) -> np.ndarray:
+
+    # vectorized on the column of the field
+    codes, categories, numbers, numeric = self.__column(field)
+    mask = np.ones(self.rows, dtype=bool)
+    for operator, operand in condition.items():
+      if operator in ['$eq', '$ne']:
+        found = codes == categories.get(operand, -2)
+        mask &= found if operator == '$eq' else ~found
+      elif operator in ['$in', '$nin']:
+        found = np.isin(codes, [categories[value] for value in operand if value in categories])
+        mask &= found if operator == '$in' else ~found
+      elif operator in RANGE_OPERATORS and numeric and isinstance(operand, (int, float)):
+        with np.errstate(invalid='ignore'):
+          mask &= RANGE_OPERATORS[operator](numbers, operand)
+      else:
+        mask &= np.fromiter((metadata is not None and matches(metadata, { field: { operator: operand } }) for metadata in self.metadatas[:self.rows]), dtype=bool, count=self.rows)
+    return mask
+
+  def __column(self, field) -> tuple:
+
+    # values as category codes (-1 when missing) and as numbers (nan when missing)
+    if field in self.columns:
+      return self.columns[field]
+    values = [None if metadata is None else metadata.get(field) for metadata in self.metadatas[:self.rows]]
+    categories = {}
+    codes = np.fromiter((-1 if value is None else categories.setdefault(value, len(categories)) for value in values), dtype=np.int32, count=self.rows)
+    numeric = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in categories)
+    numbers = np.array([np.nan if value is None else value for value in values], dtype=np.float64) if numeric else None
+    self.columns[field] = (codes, categories, numbers, numeric)
+    return self.columns[field]
+
+  def __get_documents(self, rows) -> list:
+    if len(rows) == 0:
+      return []
+    rows = [int(row) for row in rows]
+    with self.lock:
+      cursor = self.con.execute("SELECT row, document, metadata FROM chunks WHERE row IN (SELECT value FROM json_each(?))", (json.dumps(rows),))
+      found = { row: (document, metadata) for row, document, metadata in cursor.fetchall() }
+    return [Document(page_content=found[row][0], metadata=json.loads(found[row][1])) for row in rows if row in found]
+
+  def __read_vectors(self, rows) -> np.ndarray:
+    vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+    if self.scales is not None:
+      vectors *= self.scales[rows][:, None]
+    return vectors
+
+  def __write_vectors(self, rows, vectors) -> None:
+    if self.dtype == 'int8':
+      scales = np.abs(vectors).max(axis=1) / 127
+      scales[scales == 0] = 1
+      self.vectors[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+      self.scales[rows] = scales
+    else:
+      self.vectors[rows] = vectors.astype(DTYPES[self.dtype])
+
+  def __build_index(self):
+
+    # only above threshold and if hnswlib is available
+    if self.index is not None:
+      return self.index
+    if hnswlib is None or len(self.row_of) < self.hnsw_threshold:
+      return None
+
+    # saved by the loader for this version
+    path = os.path.join(self.path, 'index.hnsw')
+    index = hnswlib.Index(space='ip', dim=self.dim)
+    if self.version is not None and str(self.version) == self.__meta('index_version') and os.path.exists(path):
+      index.load_index(path, max_elements=self.capacity)
+    else:
+      print(f'[vectorstore] building hnsw index of {len(self.row_of)} vectors')
+      index.init_index(max_elements=self.capacity, ef_construction=200, M=16)
+      alive = np.nonzero(self.alive[:self.rows])[0]
+      for start in range(0, len(alive), BLOCK_ROWS):
+        rows = alive[start:start + BLOCK_ROWS]
+        index.add_items(self.__read_vectors(rows), rows)
+    self.index = index
+    return index
+
+  def __check_reload(self) -> None:
+    with self.lock:
+      version = self.__meta('version')
+      if version is not None and int(version) != self.version:
+        self.__load()
+
+  def __load(self) -> None:
+
+    # store metadata
+    self.dim = self.__meta('dim', None, int)
+    self.rows = self.__meta('rows', 0, int)
+    self.generation = self.__meta('generation', 0, int)
+    self.version = self.__meta('version', None, int)
+    stored_dtype = self.__meta('dtype')
+    if stored_dtype is not None and stored_dtype != self.dtype:
+      print(f'[vectorstore] store uses {stored_dtype} instead of {self.dtype}: reload to change it')
+      self.dtype = stored_dtype
+
+    # chunks
+    self.ids = [None] * self.rows
+    self.metadatas = [None] * self.rows
+    self.row_of = {}
+    for row, id, metadata in self.con.execute("SELECT row, id, metadata FROM chunks"):
+      if row < self.rows:
+        self.ids[row] = id
+        self.metadatas[row] = json.loads(metadata)
+        self.row_of[id] = row
+
+    # vectors
+    self.vectors = None
+    self.scales = None
+    self.index = None
+    self.columns = {}
+    self.capacity = 0
+    self.alive = np.zeros(0, dtype=bool)
+    if self.dim is not None:
+      self.__open(max(self.rows, INITIAL_CAPACITY))
+      for row in self.row_of.values():
+        self.alive[row] = True
+
+  def __open(self, capacity) -> None:
+
+    # files grow by doubling
+    itemsize = np.dtype(DTYPES[self.dtype]).itemsize
+    vectors_path, scales_path = self.__paths(self.generation)
+    if os.path.exists(vectors_path):
+      capacity = max(capacity, os.path.getsize(vectors_path) // (self.dim * itemsize))
+    self.__resize(vectors_path, capacity * self.dim * itemsize)
+    self.vectors = np.memmap(vectors_path, dtype=DTYPES[self.dtype], mode='r+', shape=(capacity, self.dim))
+    if self.dtype == 'int8':
+      self.__resize(scales_path, capacity * 4)
+      self.scales = np.memmap(scales_path, dtype=np.float32, mode='r+', shape=(capacity,))
+    alive = np.zeros(capacity, dtype=bool)
+    alive[:min(len(self.alive), capacity)] = self.alive[:capacity]
+    self.alive = alive
+    self.capacity = capacity
+
+  def __resize(self, path, size) -> None:
+    with open(path, 'ab') as f:
+      if f.tell() < size:
+        f.truncate(size)
+
+  def __ensure_capacity(self, rows) -> None:
+    if rows <= self.capacity:
+      return
+    capacity = self.capacity
+    while capacity < rows:
+      capacity *= 2
+    self.vectors.flush()
+    self.__open(capacity)
+
+  def __compact(self) -> None:
+
+    # alive rows are copied to new files: readers keep
+    # using the current ones until the version is published
+    alive = np.nonzero(self.alive[:self.rows])[0]
+    print(f'[vectorstore] compacting {self.rows} rows to {len(alive)}')
+    vectors, scales = self.vectors, self.scales
+    self.stale_paths.extend(path for path in self.__paths(self.generation) if os.path.exists(path))
+    self.generation += 1
+    for path in self.__paths(self.generation):
+      if os.path.exists(path):
+        os.remove(path)
+    self.alive = np.zeros(0, dtype=bool)
+    self.__open(max(len(alive), INITIAL_CAPACITY))
+    for start in range(0, len(alive), BLOCK_ROWS):
+      rows = alive[start:start + BLOCK_ROWS]
+      self.vectors[start:start + len(rows)] = vectors[rows]
+      if scales is not None:
+        self.scales[start:start + len(rows)] = scales[rows]
+
+    # rows only move down
+    for new_row, old_row in enumerate(alive.tolist()):
+      if new_row != old_row:
+        self.con.execute("UPDATE chunks SET row=? WHERE row=?", (new_row, old_row))
+    self.ids = [self.ids[row] for row in alive]
+    self.metadatas = [self.metadatas[row] for row in alive]
+    self.row_of = { id: row for row, id in enumerate(self.ids) }
+
+    # done
+    self.rows = len(alive)
+    self.alive[:self.rows] = True
+    self.index = None
+    self.columns = {}
+    self.__set_meta('rows', self.rows)
+    self.__set_meta('generation', self.generation)
+
+  def __paths(self, generation) -> tuple:
+    suffix = '' if generation == 0 else f'.{generation}'
+    return os.path.join(self.path, f'vectors{suffix}.{self.dtype}'), os.path.join(self.path, f'scales{suffix}.float32')
+
+  def __meta(self, key, default=None, cast=str):
+    row = self.con.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+    return default if row is None else cast(row[0])
+
+  def __set_meta(self, key, value) -> None:
+    self.con.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value)))
+
+# same relevance as chroma (squared l2 on normalized vectors) so that score thresholds do not change
+def relevance_score(similarity: float) -> float:
+  return 1.0 - (2.0 - 2.0 * similarity) / math.sqrt(2)
+
+def matches(metadata: dict, where: dict) -> bool:
+
+  # subset of chroma where clauses
+  for key, condition in where.items():
+    if key == '$and':
+      if not all(matches(metadata, clause) for clause in condition):
+        return False
+    elif key == '$or':
+      if not any(matches(metadata, clause) for clause in condition):
+        return False
+    elif isinstance(condition, dict):
+      value = metadata.get(key)
+      for operator, operand in condition.items():
+        if operator == '$eq' and value != operand: return False
+        elif operator == '$ne' and value == operand: return False
+        elif operator == '$in' and value not in operand: return False
+        elif operator == '$nin' and value in operand: return False
+        elif operator == '$gt' and (value is None or value <= operand): return False
+        elif operator == '$gte' and (value is None or value < operand): return False
+        elif operator == '$lt' and (value is None or value >= operand): return False
+        elif operator == '$lte' and (value is None or value > operand): return False
+    elif metadata.get(key) != condition:
+      return False
+  return True
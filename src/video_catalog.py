@@ -0,0 +1,137 @@
+
+import os
+import html
+import json
+import sqlite3
+import threading
+import consts
+
+class VideoCatalog:
+
+  def __init__(self, path=consts.DEFAULT_VIDEOS_PATH, cache_path=None):
+    self.path = path
+    self.cache_path = cache_path
+    self.videos = {}
+    self.mtime = None
+    self.lock = threading.Lock()
+
+  def get(self, video_id):
+    self.__check_reload()
+    return self.videos.get(video_id)
+
+  def all(self):
+    self.__check_reload()
+    return list(self.videos.values())
+
+  def ids(self):
+    self.__check_reload()
+    return list(self.videos.keys())
+
+  def find(self, title):
+    # videos whose title contains text (case insensitive)
+    self.__check_reload()
+    text = title.lower()
+    return [video_id for video_id, video in self.videos.items() if text in html.unescape(video['snippet']['title']).lower()]
+
+  def save(self, cache_path=None):
+    cache_path = cache_path or self.cache_path
+    if cache_path is None:
+      return
+    self.__check_reload()
+    self.__save(cache_path)
+
+  def __save(self, cache_path):
+    # no reload check: also called by __load with the lock held
+    tmp_path = f'{cache_path}.tmp'
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+    con = sqlite3.connect(tmp_path)
+    con.execute('CREATE TABLE videos (id TEXT NOT NULL PRIMARY KEY, info BLOB NOT NULL)')
+    con.execute('CREATE TABLE meta (key TEXT NOT NULL PRIMARY KEY, value TEXT NOT NULL)')
+    con.executemany('INSERT INTO videos VALUES (?, ?)', [
+      (video_id, json.dumps(video, separators=(',', ':'))) for video_id, video in self.videos.items()
+    ])
+    con.execute('INSERT INTO meta VALUES (?, ?)', ('mtime', repr(self.mtime)))
+    con.commit()
+    con.close()
+    os.replace(tmp_path, cache_path)
+
+  def __check_reload(self):
+    try:
+      mtime = os.path.getmtime(self.path)
+    except OSError:
+      mtime = None
+    if mtime == self.mtime:
+      return
+    with self.lock:
+      if mtime != self.mtime:
+        self.__load(mtime)
+
+  def __load(self, mtime):
+
+    # no source: empty catalog
+    if mtime is None:
+      self.videos = {}
+      self.mtime = None
+      return
+
+    # compact cache first
+    videos = self.__load_cache(mtime)
+    if videos is None:
+      print(f'[catalog] loading {self.path}')
+      with open(self.path) as f:
+        videos = { video['id']['videoId']: video for video in json.load(f) }
+
+    # done
+    self.videos = videos
+    self.mtime = mtime
+
+    # refresh cache
+    if self.cache_path is not None and not self.__cache_valid(mtime):
+      try:
+        self.__save(self.cache_path)
+      except Exception as e:
+        print(f'[catalog] failed to save {self.cache_path}: {e}')
+
+  def __load_cache(self, mtime):
+    if not self.__cache_valid(mtime):
+      return None
+    try:
+      con = sqlite3.connect(self.cache_path)
+      rows = con.execute('SELECT id, info FROM videos').fetchall()
+      con.close()
+      return { row[0]: json.loads(row[1]) for row in rows }
+    except Exception as e:
+      print(f'[catalog] failed to read {self.cache_path}: {e}')
+      return None
+
+  def __cache_valid(self, mtime):
+    if self.cache_path is None or not os.path.exists(self.cache_path):
+      return False
+    try:
+      con = sqlite3.connect(self.cache_path)
+      row = con.execute('SELECT value FROM meta WHERE key=?', ('mtime',)).fetchone()
+      con.close()
+      return row is not None and row[0] == repr(mtime)
+    except Exception:
+      return False
+
+# process-wide catalog
+catalog = None
+catalog_lock = threading.Lock()
+
+def configure(config) -> VideoCatalog:
+  global catalog
+  with catalog_lock:
+    path = config.videos_path()
+    cache_path = config.videos_cache_path()
+    if catalog is None or catalog.path != path or catalog.cache_path != cache_path:
+      catalog = VideoCatalog(path, cache_path)
+    return catalog
+
+def get_catalog() -> VideoCatalog:
+  global catalog
+  with catalog_lock:
+    if catalog is None:
+      catalog = VideoCatalog()
+    return catalog
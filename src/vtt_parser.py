@@ -0,0 +1,101 @@
+
+import re
+from collections import namedtuple
+
+# a line of text and the timestamps (in seconds) of the cue it first appeared in
+Segment = namedtuple('Segment', ['start', 'end', 'text'])
+
+# cue: timings line (00:00:01.234 --> 00:00:02.345 align:start position:0%)
+# followed by payload lines up to the next blank line. everything else
+# (header, NOTE/STYLE/REGION blocks, cue identifiers) does not match
+CUE = re.compile(
+  r'^[ \t]*(?:(\d+):)?(\d\d):(\d\d\.\d\d\d)[ \t]+-->[ \t]+(?:(\d+):)?(\d\d):(\d\d\.\d\d\d)[^\n]*\n((?:[^\n]+(?:\n|$))*)',
+  re.M
+)
+
+# inline timestamps (<00:00:01.234>): class spans (<c>, </c>) and markers are plain strings
+TIMESTAMP_TAG = re.compile(r'<\d\d:\d\d:\d\d\.\d\d\d>')
+CLASS_TAGS = ['<c>', '</c>']
+MARKERS = ['[Music]']
+
+def blocks(source):
+
+  # a string is scanned as is: files are read one block at a time
+  if isinstance(source, str):
+    yield source
+    return
+  lines = []
+  for line in source:
+    line = line.rstrip('\r\n')
+    if line == '':
+      if len(lines) > 0:
+        yield '\n'.join(lines)
+        lines = []
+    else:
+      lines.append(line)
+  if len(lines) > 0:
+    yield '\n'.join(lines)
+
+def clean(text: str) -> str:
+  if '<' in text:
+    text = TIMESTAMP_TAG.sub('', text)
+    for tag in CLASS_TAGS:
+      text = text.replace(tag, '')
+  if '[' in text:
+    for marker in MARKERS:
+      text = text.replace(marker, '')
+  return text
+
+def matches(source):
+  # tags and markers never appear in timings: clean whole blocks at once
+  for block in blocks(source):
+    yield from CUE.finditer(clean(block))
+
+def timings(match) -> tuple:
+  hours, minutes, seconds = match.group(1, 2, 3)
+  start = int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)
+  hours, minutes, seconds = match.group(4, 5, 6)
+  end = int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)
+  return start, end
+
+def cues(source):
+  for match in matches(source):
+    yield *timings(match), match.group(7)
+
+def segments(source):
+
+  # rolling captions repeat the previous line at the top of each cue
+  # and tiny transition cues repeat the current one: skip duplicates
+  # timings are only parsed for cues bringing new text
+  previous = ''
+  for match in matches(source):
+    start = None
+    for line in match.group(7).split('\n'):
+      text = line.strip()
+      if text != '' and text != previous:
+        if start is None:
+          start, end = timings(match)
+        yield Segment(start, end, text)
+        previous = text
+
+def to_text(source) -> str:
+  return ''.join(f'{segment.text} ' for segment in segments(source))
+
+def transcript(source) -> tuple:
+
+  # same text as to_text plus, for each segment, its character
+  # offset in the text and its timings (rounded to the millisecond)
+  parts = []
+  offsets = []
+  starts = []
+  ends = []
+  offset = 0
+  for segment in segments(source):
+    parts.append(f'{segment.text} ')
+    offsets.append(offset)
+    starts.append(round(segment.start, 3))
+    ends.append(round(segment.end, 3))
+    offset += len(segment.text) + 1
+
+  # done
+  return ''.join(parts), { 'offsets': offsets, 'starts': starts, 'ends': ends }
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from downloader import Downloader
+from caption_queue import CaptionQueue, DownloadJournal, STATUS_DONE, STATUS_MISSING, STATUS_FAILED
+
+# usage: ./test/bench_caption_queue.py [videos] [workers]
+#
+# runs the caption queue against a stub extractor injected through the
+# downloader ydl_factory (no network needed): each extraction costs a fixed
+# latency. checks retries with backoff, that an interrupted run resumes from
+# its journal and that no more than workers extractions run at once
+
+LATENCY = 0.02
+BACKOFF = 0.05
+CAPTIONS = 'WEBVTT\n\n00:00:00.000 --> 00:00:02.000\ncaptions of {id}\n\n'
+
+class Interrupted(BaseException):
+  pass
+
+class StubExtractor:
+
+  # shared by all instances
+  lock = threading.Lock()
+  instances = 0
+  running = 0
+  max_running = 0
+  calls = {}
+  failures = {}
+  interrupt_after = None
+
+  def __init__(self, opts):
+    with StubExtractor.lock:
+      StubExtractor.instances += 1
+    self.lang = opts['subtitleslangs'][0]
+
+  @classmethod
+  def reset(cls, failures={}, interrupt_after=None):
+    cls.instances = 0
+    cls.running = 0
+    cls.max_running = 0
+    cls.calls = {}
+    cls.failures = dict(failures)
+    cls.interrupt_after = interrupt_after
+
+  def extract_info(self, id, download=False):
+
+    # bookkeeping
+    with StubExtractor.lock:
+      StubExtractor.calls[id] = StubExtractor.calls.get(id, 0) + 1
+      if StubExtractor.interrupt_after is not None and sum(StubExtractor.calls.values()) > StubExtractor.interrupt_after:
+        raise Interrupted()
+      StubExtractor.running += 1
+      StubExtractor.max_running = max(StubExtractor.max_running, StubExtractor.running)
+
+    # extraction
+    try:
+      time.sleep(LATENCY)
+      failures = StubExtractor.failures.get(id, 0)
+      if failures != 0:
+        StubExtractor.failures[id] = failures - 1
+        raise Exception('HTTP Error 429: Too Many Requests')
+      if id.startswith('missing'):
+        return { 'requested_subtitles': None }
+      return { 'requested_subtitles': { self.lang: { 'data': CAPTIONS.format(id=id) } } }
+    finally:
+      with StubExtractor.lock:
+        StubExtractor.running -= 1
+
+def make_videos(ids):
+  return [{ 'id': { 'videoId': id }, 'snippet': { 'title': f'Video {id}' } } for id in ids]
+
+def make_queue(folder, workers, retries=2):
+  journal = DownloadJournal(os.path.join(folder, 'journal.jsonl'))
+  queue = CaptionQueue(Downloader(StubExtractor), folder, journal, workers=workers, retries=retries, backoff=BACKOFF)
+  return queue, journal
+
+def check_retries(folder):
+
+  # transient errors are retried with backoff, persistent ones recorded
+  StubExtractor.reset(failures={ 'flaky': 2, 'broken': -1 })
+  queue, journal = make_queue(folder, 1, retries=2)
+  start = time.perf_counter()
+  counts = queue.run(make_videos(['flaky', 'broken', 'missing']))
+  elapsed = time.perf_counter() - start
+  journal.close()
+  assert counts[STATUS_DONE] == 1 and counts[STATUS_FAILED] == 1 and counts[STATUS_MISSING] == 1, counts
+  assert StubExtractor.calls == { 'flaky': 3, 'broken': 3, 'missing': 1 }, StubExtractor.calls
+  assert journal.get('flaky')['attempts'] == 3 and journal.get('broken')['attempts'] == 3
+  assert '429' in journal.get('broken')['error']
+
+  # two videos waited for backoff, 1x then 2x (plus up to 50% jitter)
+  assert elapsed >= 2 * 3 * BACKOFF, f'backoff not applied: {elapsed:.2f}s'
+  assert elapsed <= 2 * 3 * BACKOFF * 1.5 + 7 * LATENCY + 1, f'backoff too long: {elapsed:.2f}s'
+  print(f'{"retries":>16}: {elapsed:.2f}s, {StubExtractor.calls}')
+
+def check_resume(folder, count):
+
+  # first run killed after some downloads, last journal line truncated
+  ids = [f'video{i}' for i in range(count)] + ['missing', 'broken']
+  StubExtractor.reset(failures={ 'broken': -1 }, interrupt_after=count // 2)
+  queue, journal = make_queue(folder, 1, retries=0)
+  try:
+    queue.run(make_videos(['missing', 'broken'] + ids[:-2]))
+    raise AssertionError('run not interrupted')
+  except Interrupted:
+    pass
+  journal.close()
+  with open(os.path.join(folder, 'journal.jsonl'), 'a') as f:
+    f.write('{"video_id": "video')
+  downloaded = [id for id in StubExtractor.calls if id.startswith('video')][:-1]
+
+  # second run: downloaded captions kept, missing skipped, failed retried
+  StubExtractor.reset()
+  queue, journal = make_queue(folder, 4)
+  counts = queue.run(make_videos(ids))
+  journal.close()
+  journal = DownloadJournal(os.path.join(folder, 'journal.jsonl'))
+  journal.close()
+  with open(os.path.join(folder, 'journal.jsonl')) as f:
+    assert sum(1 for line in f if line.startswith('{"video_id"') and line.endswith('}\n')) == len(downloaded) + 3 + count, 'journal entries lost'
+  assert not any(id in StubExtractor.calls for id in downloaded + ['missing']), StubExtractor.calls
+  assert StubExtractor.calls.get('broken') == 1, StubExtractor.calls
+  assert counts['skipped'] == 1 and counts[STATUS_DONE] == count + 1, counts
+  assert all(journal.status(id) == STATUS_DONE for id in ids if id != 'missing')
+  assert not any(name.endswith('.tmp') for name in os.listdir(folder))
+  print(f'{"resume":>16}: {len(downloaded)} kept, {len(StubExtractor.calls)} downloaded')
+
+def check_workers(folder, count, workers):
+
+  # extractions never exceed the pool size and use one extractor per thread
+  StubExtractor.reset()
+  queue, journal = make_queue(folder, workers)
+  start = time.perf_counter()
+  counts = queue.run(make_videos([f'video{i}' for i in range(count)]))
+  elapsed = time.perf_counter() - start
+  journal.close()
+  assert counts[STATUS_DONE] == count, counts
+  assert StubExtractor.max_running <= workers, f'{StubExtractor.max_running} extractions for {workers} workers'
+  assert StubExtractor.instances <= workers, f'{StubExtractor.instances} extractors for {workers} workers'
+  print(f'{f"{workers} workers":>16}: {elapsed:.2f}s, {count / elapsed:.1f} videos/sec, {StubExtractor.max_running} concurrent extractions')
+  return StubExtractor.max_running
+
+def main():
+
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+  workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+  # each check in its own captions folder
+  root = tempfile.mkdtemp()
+  try:
+    check_retries(os.path.join(root, 'retries'))
+    check_resume(os.path.join(root, 'resume'), count)
+    check_workers(os.path.join(root, 'sequential'), count, 1)
+    assert check_workers(os.path.join(root, 'parallel'), count, workers) > 1, 'workers did not run concurrently'
+  finally:
+    shutil.rmtree(root)
+  print('all checks passed')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import os
+import re
+import sys
+import glob
+import time
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import vtt_parser
+
+# usage: ./test/bench_captions.py [captions folder] [repeat]
+# without captions folder, a synthetic corpus of youtube-like auto-generated captions is used
+
+def legacy_cleanup(original_captions):
+
+  # implementation prior to vtt_parser
+  contents = original_captions
+  contents = re.sub(r'WEBVTT\n', '', contents)
+  contents = re.sub(r'Kind: captions\n', '', contents)
+  contents = re.sub(r'Language: .*?\n', '', contents)
+  contents = re.sub(r'\d\d:\d\d:\d\d\.\d\d\d --> .*\n', '', contents)
+  contents = re.sub(r'<\d\d:\d\d:\d\d\.\d\d\d><c>', '', contents)
+  contents = re.sub(r'</c>', '', contents)
+  contents = re.sub(r'\n+', '\n', contents)
+  contents = re.sub(r'\[Music\]', '', contents)
+  captions = ''
+  previous_line = ''
+  for line in contents.split('\n'):
+    line = line.strip()
+    if line != '' and previous_line != line:
+      captions += line + ' '
+      previous_line = line
+  return captions
+
+def timestamp(seconds):
+  return f'{int(seconds // 3600):02d}:{int(seconds % 3600 // 60):02d}:{seconds % 60:06.3f}'
+
+def synthetic_captions(minutes):
+
+  # youtube auto-generated format: rolling two-line cues with inline word
+  # timestamps followed by 10ms transition cues repeating the current line
+  words = ['continuous', 'delivery', 'software', 'the', 'of', 'engineering', 'test', 'deploy', 'and', 'we', 'pipeline', 'code', 'change', 'team']
+  lines = ['WEBVTT', 'Kind: captions', 'Language: en', '']
+  previous = ''
+  t = 0.0
+  while t < minutes * 60:
+    if random.random() < 0.02:
+      current = '[Music]'
+    else:
+      current = ''
+      for i in range(random.randint(4, 9)):
+        word = random.choice(words)
+        current += word if i == 0 else f'<{timestamp(t + i * 0.3)}><c> {word}</c>'
+    lines.append(f'{timestamp(t)} --> {timestamp(t + 3)} align:start position:0%')
+    lines.append(previous if previous else ' ')
+    lines.append(current)
+    lines.append('')
+    previous = re.sub(r'<[^>]+>', '', current)
+    lines.append(f'{timestamp(t + 3)} --> {timestamp(t + 3.01)} align:start position:0%')
+    lines.append(previous)
+    lines.append(' ')
+    lines.append('')
+    t += 3.01
+  return '\n'.join(lines) + '\n'
+
+def bench(name, fn, corpus, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    results = [fn(text) for text in corpus]
+  elapsed = time.perf_counter() - start
+  size = sum(len(text) for text in corpus) * repeat / 1024 / 1024
+
+  # peak memory on the largest file
+  largest = max(corpus, key=len)
+  tracemalloc.start()
+  fn(largest)
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  print(f'{name:>8}: {elapsed:.3f}s, {size / elapsed:.2f} MB/s, peak memory {peak / len(largest):.1f}x largest file')
+  return results
+
+def main():
+
+  # corpus
+  folder = sys.argv[1] if len(sys.argv) > 1 else None
+  repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+  if folder:
+    corpus = [open(path).read() for path in glob.glob(f'{folder}/*.original.vtt')]
+  else:
+    random.seed(42)
+    corpus = [synthetic_captions(random.randint(5, 60)) for _ in range(50)]
+  size = sum(len(text) for text in corpus) / 1024 / 1024
+  print(f'corpus: {len(corpus)} files, {size:.2f} MB, repeat {repeat}')
+
+  # run
+  legacy = bench('legacy', legacy_cleanup, corpus, repeat)
+  parser = bench('parser', vtt_parser.to_text, corpus, repeat)
+
+  # compare
+  different = sum(1 for a, b in zip(legacy, parser) if a != b)
+  print(f'outputs: {len(corpus) - different} identical, {different} different')
+
+if __name__ == '__main__':
+  main()
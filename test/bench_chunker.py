@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import glob
+import time
+import random
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from chunker import build_chunker
+from embeddings_engine import EmbeddingsEngine
+
+# usage: ./test/bench_chunker.py [embeddings model] [videos] [queries per video]
+#
+# offline retrieval quality vs embedding cost: for each video of the captions
+# folder (with cues), queries are built from random caption windows with some
+# words dropped. a query is a hit when one of the top k chunks retrieved among
+# all chunks covers the time of the window it comes from
+
+configurations = [
+  { 'chunk_size': 2500, 'chunk_overlap': 500 },
+  { 'chunk_size': 1500, 'chunk_overlap': 300 },
+  { 'chunk_size': 1000, 'chunk_overlap': 0 },
+  { 'type': 'transcript', 'max_tokens': 384, 'overlap_cues': 2 },
+  { 'type': 'transcript', 'max_tokens': 256, 'overlap_cues': 1 },
+  { 'type': 'transcript', 'max_tokens': 256, 'overlap_cues': 0 },
+  { 'type': 'transcript', 'max_tokens': 128, 'overlap_cues': 1 },
+]
+top_k = [1, 4]
+query_cues = 3
+query_keep = 0.7
+
+def load_videos(limit):
+  videos = []
+  for cues_path in sorted(glob.glob('captions/*.cues.json')):
+    video_id = os.path.basename(cues_path).split('.')[0]
+    cleaned_path = f'captions/{video_id}.cleaned.vtt'
+    if not os.path.exists(cleaned_path):
+      continue
+    with open(cleaned_path) as f:
+      content = f.read()
+    with open(cues_path) as f:
+      cues = json.load(f)
+    if len(cues['offsets']) > query_cues:
+      videos.append((video_id, content, cues))
+    if len(videos) == limit:
+      break
+  return videos
+
+def build_queries(videos, count):
+  queries = []
+  for video_id, content, cues in videos:
+    offsets = cues['offsets']
+    for _ in range(count):
+      first = random.randint(0, len(offsets) - query_cues - 1)
+      text = content[offsets[first]:offsets[first + query_cues]]
+      words = [word for word in text.split() if random.random() < query_keep]
+      middle = (cues['starts'][first] + cues['ends'][first + query_cues - 1]) / 2
+      queries.append((video_id, middle, ' '.join(words)))
+  return queries
+
+def main():
+
+  # init
+  model = sys.argv[1] if len(sys.argv) > 1 else 'all-mpnet-base-v2'
+  video_count = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+  query_count = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+  random.seed(42)
+
+  # data
+  videos = load_videos(video_count)
+  if len(videos) == 0:
+    print('no captions with cues found: run ./src/download_captions.py first')
+    return
+  queries = build_queries(videos, query_count)
+  engine = EmbeddingsEngine(model)
+  tokenizer = engine.model.tokenizer
+  max_seq_length = engine.model.max_seq_length
+  query_embeddings = np.array(engine.encode([query[2] for query in queries]))
+  print(f'{len(videos)} videos, {len(queries)} queries, {model} (max sequence length {max_seq_length} tokens)')
+
+  # now run
+  print('configuration | chunks | tokens | truncated | embed time | ' + ' | '.join(f'recall@{k}' for k in top_k) + ' | mrr')
+  for settings in configurations:
+
+    # split
+    settings = { **settings, 'tokenizer': model } if settings.get('type') == 'transcript' else settings
+    chunker = build_chunker(settings)
+    chunks = []
+    for video_id, content, cues in videos:
+      chunks.extend([ { **chunk, 'video_id': video_id } for chunk in chunker.split(content, cues) ])
+
+    # cost: tokens to embed and chunks truncated by the model
+    lengths = [len(ids) for ids in tokenizer([chunk['text'] for chunk in chunks], add_special_tokens=True)['input_ids']]
+    truncated = sum(1 for length in lengths if length > max_seq_length)
+
+    # embed
+    start = time.perf_counter()
+    embeddings = np.array(engine.encode([chunk['text'] for chunk in chunks]))
+    embed_time = time.perf_counter() - start
+
+    # retrieve
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    queries_norm = query_embeddings / np.linalg.norm(query_embeddings, axis=1, keepdims=True)
+    ranks = np.argsort(-queries_norm @ embeddings.T, axis=1)
+    hits = { k: 0 for k in top_k }
+    reciprocal_ranks = 0
+    for query, ranking in zip(queries, ranks):
+      for rank, index in enumerate(ranking[:max(top_k)]):
+        chunk = chunks[index]
+        if chunk['video_id'] == query[0] and chunk.get('start') is not None and chunk['start'] <= query[1] <= chunk['end']:
+          reciprocal_ranks += 1 / (rank + 1)
+          for k in top_k:
+            hits[k] += 1 if rank < k else 0
+          break
+
+    # report
+    label = ', '.join(f'{key}={value}' for key, value in settings.items() if key != 'tokenizer')
+    recalls = ' | '.join(f'{hits[k] / len(queries):.3f}' for k in top_k)
+    print(f'{label} | {len(chunks)} | {sum(lengths)} | {truncated} | {embed_time:.2f}s | {recalls} | {reciprocal_ranks / len(queries):.3f}')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+import os
+import sys
+import glob
+import time
+import random
+import shutil
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from lexical_index import LexicalIndex, tokenize
+
+# usage: ./test/bench_lexical.py [chunks] [queries]
+#
+# indexing throughput, index size and lookup latency (p50/p99, first and
+# repeated terms) of the lexical index. chunks are 200-word windows of the
+# captions folder if available, else of a synthetic zipf-distributed corpus.
+# queries are random 8-word excerpts of the chunks
+
+CHUNK_WORDS = 200
+QUERY_WORDS = 8
+BATCH_SIZE = 256
+
+def caption_chunks(count):
+  chunks = []
+  for path in sorted(glob.glob('captions/*.cleaned.vtt')):
+    with open(path) as f:
+      words = f.read().split()
+    chunks.extend(' '.join(words[i:i+CHUNK_WORDS]) for i in range(0, len(words), CHUNK_WORDS))
+    if len(chunks) >= count:
+      break
+  return chunks[:count]
+
+def synthetic_chunks(count, rng):
+  vocabulary = np.array([f'word{i}' for i in range(50000)])
+  ranks = rng.zipf(1.2, size=(count, CHUNK_WORDS)) % len(vocabulary)
+  return [' '.join(vocabulary[row]) for row in ranks]
+
+def measure(index, queries):
+  latencies = []
+  for query in queries:
+    start = time.perf_counter()
+    index.search(query, 20)
+    latencies.append(time.perf_counter() - start)
+  latencies = np.array(latencies) * 1e6
+  return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def main():
+
+  # data
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+  query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+  rng = np.random.default_rng(42)
+  random.seed(42)
+  chunks = caption_chunks(count)
+  source = 'captions'
+  if len(chunks) < count:
+    chunks = synthetic_chunks(count, rng)
+    source = 'synthetic'
+  queries = []
+  for _ in range(query_count):
+    words = tokenize(random.choice(chunks))
+    first = random.randint(0, max(0, len(words) - QUERY_WORDS))
+    queries.append(' '.join(words[first:first + QUERY_WORDS]))
+  print(f'{len(chunks)} {source} chunks, {len(queries)} queries')
+
+  folder = tempfile.mkdtemp()
+  try:
+
+    # index
+    path = os.path.join(folder, 'lexical.db')
+    index = LexicalIndex(path)
+    start = time.perf_counter()
+    for i in range(0, len(chunks), BATCH_SIZE):
+      index.add([f'chunk-{j}' for j in range(i, min(i + BATCH_SIZE, len(chunks)))], chunks[i:i+BATCH_SIZE])
+    index.persist()
+    elapsed = time.perf_counter() - start
+    print(f'indexed in {elapsed:.2f}s ({len(chunks) / elapsed:.0f} chunks/sec), {os.path.getsize(path) / 1e6:.1f} MB')
+
+    # search: new reader so that postings are read from disk first
+    reader = LexicalIndex(path)
+    p50, p99 = measure(reader, queries)
+    print(f'first lookups: p50 {p50:.0f} us, p99 {p99:.0f} us')
+    p50, p99 = measure(reader, queries)
+    print(f'cached terms: p50 {p50:.0f} us, p99 {p99:.0f} us')
+
+  finally:
+    shutil.rmtree(folder)
+
+if __name__ == '__main__':
+  main()
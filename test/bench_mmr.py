@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from mmr import maximal_marginal_relevance
+
+# usage: ./test/bench_mmr.py [dimensions] [repeat]
+#
+# mmr selection time of the stock langchain implementation (candidates
+# re-scored one at a time in python at each step) and of mmr.py for
+# several k/fetch_k combinations on clustered synthetic embeddings
+
+configurations = [(4, 20), (4, 100), (10, 100), (10, 250), (20, 250), (20, 500), (50, 500)]
+lambda_mult = 0.5
+
+def cosine_similarity(x, y):
+  x = x / np.linalg.norm(x, axis=1, keepdims=True)
+  y = y / np.linalg.norm(y, axis=1, keepdims=True)
+  return x @ y.T
+
+def legacy_mmr(query_embedding, embedding_list, lambda_mult=0.5, k=4):
+
+  # langchain_community.vectorstores.utils.maximal_marginal_relevance
+  if min(k, len(embedding_list)) <= 0:
+    return []
+  if query_embedding.ndim == 1:
+    query_embedding = np.expand_dims(query_embedding, axis=0)
+  similarity_to_query = cosine_similarity(query_embedding, embedding_list)[0]
+  most_similar = int(np.argmax(similarity_to_query))
+  idxs = [most_similar]
+  selected = np.array([embedding_list[most_similar]])
+  while len(idxs) < min(k, len(embedding_list)):
+    best_score = -np.inf
+    idx_to_add = -1
+    similarity_to_selected = cosine_similarity(embedding_list, selected)
+    for i, query_score in enumerate(similarity_to_query):
+      if i in idxs:
+        continue
+      redundant_score = max(similarity_to_selected[i])
+      equation_score = lambda_mult * query_score - (1 - lambda_mult) * redundant_score
+      if equation_score > best_score:
+        best_score = equation_score
+        idx_to_add = i
+    idxs.append(idx_to_add)
+    selected = np.append(selected, [embedding_list[idx_to_add]], axis=0)
+  return idxs
+
+def candidates(rng, fetch_k, dim):
+  # neighbours of a query: a few near-duplicate groups around it
+  query = rng.normal(size=dim).astype(np.float32)
+  centers = query + rng.normal(scale=0.8, size=(max(1, fetch_k // 10), dim)).astype(np.float32)
+  embeddings = centers[rng.integers(0, len(centers), fetch_k)] + rng.normal(scale=0.3, size=(fetch_k, dim)).astype(np.float32)
+  return query, embeddings
+
+def timeit(fn, inputs):
+  start = time.perf_counter()
+  results = [fn(query, embeddings) for query, embeddings in inputs]
+  return (time.perf_counter() - start) / len(inputs) * 1000, results
+
+def main():
+
+  # init
+  dim = int(sys.argv[1]) if len(sys.argv) > 1 else 768
+  repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+  rng = np.random.default_rng(42)
+  print(f'{dim} dimensions, {repeat} queries per configuration, lambda_mult={lambda_mult}')
+  print('k | fetch_k | legacy (ms) | mmr.py (ms) | speedup | same selection')
+
+  # now run
+  for k, fetch_k in configurations:
+    inputs = [candidates(rng, fetch_k, dim) for _ in range(repeat)]
+    legacy_time, legacy_results = timeit(lambda query, embeddings: legacy_mmr(query, embeddings, lambda_mult, k), inputs)
+    new_time, new_results = timeit(lambda query, embeddings: maximal_marginal_relevance(query, embeddings, k, lambda_mult), inputs)
+    same = sum(1 for a, b in zip(legacy_results, new_results) if a == b) / repeat
+    print(f'{k} | {fetch_k} | {legacy_time:.2f} | {new_time:.2f} | {legacy_time / new_time:.1f}x | {same:.0%}')
+
+if __name__ == '__main__':
+  main()
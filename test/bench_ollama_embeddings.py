@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import requests
+import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from ollama_embeddings import OllamaEmbeddingsClient
+
+# usage: ./test/bench_ollama_embeddings.py [texts]
+#
+# runs against a local stub of the ollama api (no ollama needed): each request
+# costs a fixed latency plus a per-text compute time. like ollama, /api/embed
+# returns unit vectors and /api/embeddings raw ones. checks that the client
+# returns the same normalized vector for each text with and without the batch
+# endpoint, that a missing model does not disable the batch endpoint, and
+# compares throughput with one request per text over new connections
+
+REQUEST_LATENCY = 0.005
+TEXT_LATENCY = 0.0005
+DIMENSIONS = 16
+
+def fake_embedding(text):
+  digest = hashlib.sha1(text.encode()).digest()
+  return [b / 255 + 0.1 for b in digest[:DIMENSIONS]]
+
+def unit_embedding(text):
+  vector = np.array(fake_embedding(text))
+  return (vector / np.linalg.norm(vector)).tolist()
+
+class StubHandler(BaseHTTPRequestHandler):
+
+  protocol_version = 'HTTP/1.1'
+  disable_nagle_algorithm = True
+  batch_supported = True
+
+  def do_POST(self):
+    payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+    known = self.path == '/api/embeddings' or (self.path == '/api/embed' and self.batch_supported)
+    if not known:
+      self.__reply(404, '404 page not found')
+    elif payload['model'] != 'stub':
+      self.__reply(404, { 'error': f'model "{payload["model"]}" not found, try pulling it first' })
+    elif self.path == '/api/embed':
+      texts = payload['input'] if isinstance(payload['input'], list) else [payload['input']]
+      time.sleep(REQUEST_LATENCY + TEXT_LATENCY * len(texts))
+      self.__reply(200, { 'model': payload['model'], 'embeddings': [unit_embedding(text) for text in texts] })
+    else:
+      time.sleep(REQUEST_LATENCY + TEXT_LATENCY)
+      self.__reply(200, { 'embedding': fake_embedding(payload['prompt']) })
+
+  def log_message(self, format, *args):
+    pass
+
+  def __reply(self, status, body):
+    data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+    self.send_response(status)
+    self.send_header('Content-Type', 'text/plain' if isinstance(body, str) else 'application/json')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+def start_stub(batch_supported):
+  handler = type('Handler', (StubHandler,), { 'batch_supported': batch_supported })
+  server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+  return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+def check(name, texts, embeddings, elapsed, expected=unit_embedding):
+  assert len(embeddings) == len(texts), f'{name}: {len(embeddings)} embeddings for {len(texts)} texts'
+  for text, embedding in zip(texts, embeddings):
+    assert np.allclose(embedding, expected(text)), f'{name}: wrong embedding for "{text}"'
+  print(f'{name:>32}: {elapsed:.2f}s, {len(texts) / elapsed:.1f} texts/sec')
+
+def main():
+
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+  texts = [f'chunk number {i} of some transcript' for i in range(count)]
+
+  # baseline: one request per text, no keep-alive
+  server, url = start_stub(True)
+  start = time.perf_counter()
+  embeddings = [requests.post(f'{url}/api/embeddings', json={ 'model': 'stub', 'prompt': text }).json()['embedding'] for text in texts]
+  check('one request per text', texts, embeddings, time.perf_counter() - start, fake_embedding)
+
+  # client on both kinds of servers: both must return the same vectors
+  results = {}
+  for batch_supported in [True, False]:
+    if not batch_supported:
+      server.shutdown()
+      server, url = start_stub(False)
+    for concurrency in [1, 4]:
+      client = OllamaEmbeddingsClient(url, 'stub', batch_size=64, concurrency=concurrency)
+      start = time.perf_counter()
+      embeddings = client.embed_documents(texts)
+      check(f'{"batch" if batch_supported else "fallback"}, concurrency {concurrency}', texts, embeddings, time.perf_counter() - start)
+      assert client.stats()['batch_supported'] == batch_supported
+      assert np.allclose(client.embed_query(texts[0]), unit_embedding(texts[0]))
+      results[batch_supported] = embeddings
+      client.close()
+  assert np.allclose(results[True], results[False]), 'batch and fallback embeddings differ'
+
+  # missing model: error surfaced, batch endpoint still used afterwards
+  server.shutdown()
+  server, url = start_stub(True)
+  client = OllamaEmbeddingsClient(url, 'missing')
+  try:
+    client.embed_documents(texts[:2])
+    raise AssertionError('error not raised')
+  except Exception as e:
+    assert 'not found' in str(e), e
+  assert client.stats()['batch_supported'] is None, 'missing model disabled the batch endpoint'
+  client.close()
+
+  # errors are surfaced
+  client = OllamaEmbeddingsClient(url + '/missing', 'stub')
+  try:
+    client.embed_documents(texts[:2])
+    raise AssertionError('error not raised')
+  except Exception as e:
+    assert 'status 404' in str(e), e
+  print('all checks passed')
+
+if __name__ == '__main__':
+  main()
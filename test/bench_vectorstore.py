@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from vectorstore_numpy import NumpyVectorStore
+
+# usage: ./test/bench_vectorstore.py [vectors] [dimensions] [queries] [hnsw ef]
+#
+# recall@k (against exact search) and latency (p50/p99) of the numpy vector
+# store (float32, float16, int8 and hnsw when hnswlib is installed) and chroma
+# on clustered synthetic normalized vectors. queries go through the same calls
+# as the retriever (vector search returning documents and scores)
+
+K = 4
+CLUSTERS = 200
+BATCH_SIZE = 5000
+
+class NoEmbeddings:
+  def embed_query(self, text):
+    raise Exception('bench uses vectors only')
+
+def make_vectors(count, dim, rng):
+  centers = rng.normal(size=(CLUSTERS, dim)).astype(np.float32)
+  vectors = centers[rng.integers(0, CLUSTERS, count)] + rng.normal(scale=0.6, size=(count, dim)).astype(np.float32)
+  return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def percentiles(latencies):
+  latencies = np.array(latencies) * 1000
+  return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def run(name, search, queries, truth):
+  latencies = []
+  hits = 0
+  for query, expected in zip(queries, truth):
+    start = time.perf_counter()
+    ids = search(query)
+    latencies.append(time.perf_counter() - start)
+    hits += len(set(ids) & expected)
+  p50, p99 = percentiles(latencies)
+  print(f'{name:>16}: recall@{K} {hits / (len(queries) * K):.3f}, p50 {p50:.2f} ms, p99 {p99:.2f} ms')
+
+def main():
+
+  # data
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+  dim = int(sys.argv[2]) if len(sys.argv) > 2 else 768
+  query_count = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+  hnsw_ef = int(sys.argv[4]) if len(sys.argv) > 4 else 128
+  rng = np.random.default_rng(42)
+  vectors = make_vectors(count, dim, rng)
+  queries = make_vectors(query_count, dim, rng)
+  ids = [f'chunk-{i}' for i in range(count)]
+  documents = [f'document {i}' for i in range(count)]
+  metadatas = [{ 'source': f'video-{i % 500}', 'chunk': i } for i in range(count)]
+  print(f'{count} vectors of {dim} dimensions, {query_count} queries')
+
+  # ground truth
+  truth = [set(ids[i] for i in np.argsort(-(vectors @ query))[:K]) for query in queries]
+  folder = tempfile.mkdtemp()
+
+  try:
+
+    # numpy store
+    configurations = [('float32', None), ('float16', None), ('int8', None)]
+    try:
+      import hnswlib
+      configurations.append(('float32', 0))
+    except ImportError:
+      print('hnswlib not installed: skipping hnsw')
+    for dtype, hnsw_threshold in configurations:
+      path = os.path.join(folder, f'numpy-{dtype}-{hnsw_threshold}')
+      store = NumpyVectorStore(path, NoEmbeddings(), dtype=dtype, hnsw_threshold=count + 1 if hnsw_threshold is None else hnsw_threshold, hnsw_ef=hnsw_ef)
+      start = time.perf_counter()
+      for i in range(0, count, BATCH_SIZE):
+        store.upsert(ids[i:i+BATCH_SIZE], vectors[i:i+BATCH_SIZE], metadatas[i:i+BATCH_SIZE], documents[i:i+BATCH_SIZE])
+      store.persist()
+      print(f'{"numpy " + dtype + (" hnsw" if hnsw_threshold is not None else ""):>16}: loaded in {time.perf_counter() - start:.2f}s')
+      search = lambda query: [doc.metadata['chunk'] for doc, _ in store.similarity_search_by_vector_with_score(query, K)]
+      run(f'numpy {dtype}{" hnsw" if hnsw_threshold is not None else ""}', lambda query: [ids[i] for i in search(query)], queries, truth)
+
+    # chroma
+    try:
+      import chromadb
+    except ImportError:
+      print('chromadb not installed: skipping chroma')
+      return
+    client = chromadb.PersistentClient(path=os.path.join(folder, 'chroma'))
+    collection = client.create_collection('bench')
+    start = time.perf_counter()
+    for i in range(0, count, BATCH_SIZE):
+      collection.add(ids=ids[i:i+BATCH_SIZE], embeddings=vectors[i:i+BATCH_SIZE].tolist(), metadatas=metadatas[i:i+BATCH_SIZE], documents=documents[i:i+BATCH_SIZE])
+    print(f'{"chroma":>16}: loaded in {time.perf_counter() - start:.2f}s')
+    search = lambda query: collection.query(query_embeddings=[query.tolist()], n_results=K, include=['documents', 'metadatas', 'distances'])['ids'][0]
+    run('chroma', search, queries, truth)
+
+  finally:
+    shutil.rmtree(folder)
+
+if __name__ == '__main__':
+  main()
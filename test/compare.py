@@ -2,10 +2,13 @@
 import requests
 
 # get tokens
-# select sum(json_extract(trace, '$.performance.input_tokens'))+ sum(json_extract(evaluation_crit_trace, '$.performance.input_tokens'))+ sum(json_extract(evaluation_qa_trace, '$.performance.input_tokens')), sum(json_extract(trace, '$.performance.output_tokens'))+ sum(json_extract(evaluation_crit_trace, '$.performance.output_tokens'))+ sum(json_extract(evaluation_qa_trace, '$.performance.output_tokens')) from runs;
+# select sum(input_tokens + eval_input_tokens), sum(output_tokens + eval_output_tokens) from config_stats;
 
 # get cost
-# select sum(json_extract(trace, '$.performance.cost'))+ sum(json_extract(evaluation_crit_trace, '$.performance.cost'))+ sum(json_extract(evaluation_qa_trace, '$.performance.cost')) from runs;
+# select sum(cost + eval_cost) from config_stats;
+
+# compare configurations (or http://localhost:5555/runs/stats)
+# select llm_model, chain_type, doc_chain_type, search_type, runs, total_time/runs, eval_crit_sum/eval_crit_count, 1.0*eval_qa_correct/eval_qa_count from config_stats order by runs desc;
 
 # 19-Jan run
 # Tokens: 488297|65375